@@ -0,0 +1,37 @@
+import argparse
+
+import pandas as pd
+
+from motor_fifo.lotes import IndiceLotes
+
+# Consultas ao diário de lotes gravado pelo motor (--lotes PASTA no v4/v5), sem o recorrer:
+#   carteira num instante, lotes abertos de uma moeda e de onde veio o custo de um lote.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas ao diário de lotes")
+    parser.add_argument('pasta', help="pasta do diário (--lotes do motor)")
+    parser.add_argument('--data', default='2100-01-01',
+                        help="instante da consulta, inclusivo (ex.: '2023-12-31 23:59:59'); por omissão o fim")
+    parser.add_argument('--moeda', help="lista os lotes abertos desta moeda em vez do resumo por moeda")
+    parser.add_argument('--lote', type=int, help="linhagem de um lote: eventos dele e dos lotes de onde herdou o custo")
+    parser.add_argument('--csv', metavar='CSV', help="grava o resultado em CSV ';' em vez de o mostrar")
+    args = parser.parse_args()
+
+    indice = IndiceLotes(args.pasta)
+    if args.lote is not None:
+        try:
+            tabela = indice.linhagem(args.lote)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            raise SystemExit(1)
+    elif args.moeda:
+        tabela = indice.lotes_abertos(args.moeda, args.data)
+    else:
+        tabela = indice.carteira(args.data)
+
+    if args.csv:
+        tabela.to_csv(args.csv, sep=';', index=False, decimal=',')
+        print(f"{len(tabela)} linhas em {args.csv}")
+    else:
+        with pd.option_context('display.max_rows', 200, 'display.width', 200):
+            print(tabela.to_string(index=False))
@@ -16,7 +16,7 @@ def clean_val_decimal(val_str):
     try: return Decimal(s)
     except: return Decimal('0')
 
-def processar_auditoria_total():
+def processar_auditoria_total(cache=None):
     binance_input = 'Binance_Novembro2019-Dezembro2025.csv'
     bt_input = 'Relatorio_FIFO_Completo_Contraparte.csv'
     
@@ -29,11 +29,16 @@ def processar_auditoria_total():
         return
 
     # 1. Carregamento com precisão decimal
-    df_bin = pd.read_csv(binance_input)
-    df_bin['UTC_Time'] = pd.to_datetime(df_bin['UTC_Time'])
-    df_bin['Val_Dec'] = df_bin['Change'].apply(clean_val_decimal)
-    df_bin['Time_Group'] = df_bin['UTC_Time'].dt.round('2s') # Agrupamento estreito para precisão
-    df_bin = df_bin.sort_values('UTC_Time')
+    if cache:
+        # Ledger já normalizado e ordenado (motor_fifo.cache)
+        from motor_fifo.cache import abrir_ledger
+        df_bin = abrir_ledger(binance_input, None if cache is True else cache).dataframe('2s')
+    else:
+        df_bin = pd.read_csv(binance_input)
+        df_bin['UTC_Time'] = pd.to_datetime(df_bin['UTC_Time'])
+        df_bin['Val_Dec'] = df_bin['Change'].apply(clean_val_decimal)
+        df_bin['Time_Group'] = df_bin['UTC_Time'].dt.round('2s') # Agrupamento estreito para precisão
+        df_bin = df_bin.sort_values('UTC_Time')
 
     bt_retiradas = pd.DataFrame()
     if os.path.exists(bt_input):
@@ -143,4 +148,9 @@ def processar_auditoria_total():
     print(f"Relatórios gerados com sucesso: {out_irs}, {out_swaps}, {out_reconciliacao}")
 
 if __name__ == "__main__":
-    processar_auditoria_total()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Motor FIFO Binance (v3)")
+    parser.add_argument('--cache', nargs='?', const=True, metavar='PASTA',
+                        help="lê o ledger do cache normalizado (criado na primeira vez; por omissão .cache_ledger/)")
+    args = parser.parse_args()
+    processar_auditoria_total(cache=args.cache)
\ No newline at end of file
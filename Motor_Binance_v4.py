@@ -1,22 +1,22 @@
 import pandas as pd
-import re
 import os
-from datetime import datetime
+import time
 from decimal import Decimal, getcontext
+from motor_fifo.correspondencia import IndiceRetiradas
+from motor_fifo.datas import dia_ordinal, status_isento
+from motor_fifo.inventario import Inventario, Lote
+from motor_fifo.metricas import NULAS
+from motor_fifo.relatorios import ESQUEMA_IRS, ESQUEMA_RECONC, ESQUEMA_SWAPS, BufferRelatorio, escrever_csv
+from motor_fifo.valores import parse_coluna
 
 # Precisão absoluta para evitar erros de inventário por arredondamento infinitesimal
 getcontext().prec = 60
 
-def clean_val_dec(val_str):
-    if pd.isna(val_str): return Decimal('0')
-    if isinstance(val_str, (float, int)): return Decimal(str(val_str))
-    s = re.sub(r'[^0-9,\.-]', '', str(val_str))
-    if ',' in s and '.' in s: s = s.replace('.', '').replace(',', '.')
-    elif ',' in s: s = s.replace(',', '.')
-    try: return Decimal(s)
-    except: return Decimal('0')
-
-def processar_motor_v7_final():
+def processar_motor_v7_final(saida_colunar=None, formato='parquet', csv=True, metricas=None, pasta_lotes=None,
+                             cache=None, decompor=False):
+    # Sem --metricas os contadores vão para o NULAS (uma chamada vazia por evento); os
+    # relógios por evento (perf_counter) ficam atrás de `metricas is not None`
+    met = metricas if metricas is not None else NULAS
     binance_input = 'Binance_Novembro2019-Dezembro2025.csv'
     bt_input = 'Relatorio_FIFO_Completo_Contraparte.csv'
     
@@ -30,162 +30,235 @@ def processar_motor_v7_final():
         return
 
     # 1. Carregamento e Preparação com precisão Decimal
-    df_bin = pd.read_csv(binance_input)
-    df_bin['UTC_Time'] = pd.to_datetime(df_bin['UTC_Time'])
-    df_bin['Val_Dec'] = df_bin['Change'].apply(clean_val_dec)
-    # Agrupamento de 2s para capturar moedas que entram/saem no mesmo segundo
-    df_bin['Time_Group'] = df_bin['UTC_Time'].dt.round('2s')
-    df_bin = df_bin.sort_values('UTC_Time')
+    if cache:
+        # Ledger já normalizado e ordenado (motor_fifo.cache), lido do disco por memmap
+        from motor_fifo.cache import abrir_ledger
+        with met.etapa('carregar_cache'):
+            df_bin = abrir_ledger(binance_input, None if cache is True else cache).dataframe('2s')
+    else:
+        with met.etapa('carregar_csv'):
+            df_bin = pd.read_csv(binance_input)
+        with met.etapa('datas'):
+            df_bin['UTC_Time'] = pd.to_datetime(df_bin['UTC_Time'])
+        with met.etapa('parse_valores'):
+            df_bin['Val_Dec'] = parse_coluna(df_bin['Change'])
+        with met.etapa('time_group_ordenacao'):
+            # Agrupamento de 2s para capturar moedas que entram/saem no mesmo segundo
+            df_bin['Time_Group'] = df_bin['UTC_Time'].dt.round('2s')
+            df_bin = df_bin.sort_values('UTC_Time')
+    met.contar('linhas', len(df_bin))
 
     bt_retiradas = pd.DataFrame()
+    indice_bt = None
+    inicio_bt = time.perf_counter()
     if os.path.exists(bt_input):
         try:
             df_bt = pd.read_csv(bt_input, sep=';', decimal=',')
             mask = df_bt['operação'].str.contains('Retirada|Withdraw', na=False, case=False)
             bt_retiradas = df_bt[mask].copy()
-            bt_retiradas['qtd_dec'] = bt_retiradas['quantidade'].apply(clean_val_dec)
-            bt_retiradas['custo_dec'] = bt_retiradas['Valor (Custo FIFO)'].apply(clean_val_dec)
+            bt_retiradas['qtd_dec'] = parse_coluna(bt_retiradas['quantidade'])
+            bt_retiradas['custo_dec'] = parse_coluna(bt_retiradas['Valor (Custo FIFO)'])
+            # Data BT convertida uma vez (dia ordinal), não a cada venda do lote
+            bt_retiradas['dia'] = pd.Series([dia_ordinal(str(d)) for d in bt_retiradas['Data']],
+                                            index=bt_retiradas.index, dtype=object)
+            indice_bt = IndiceRetiradas.de_dataframe(bt_retiradas, 'qtd_dec')
         except:
             print("Aviso: Falha ao ler BitcoinTrade. Prosseguindo como Origem Externa.")
+    met.somar_tempo('carregar_bt', time.perf_counter() - inicio_bt)
 
-    inventory = {}
-    report_irs, report_swaps, report_transf = [], [], []
+    inventory = Inventario()
+    # Linhas em colunas tipadas (tuplos na ordem de ESQUEMA_*), não um dict por linha
+    report_irs = BufferRelatorio(ESQUEMA_IRS)
+    report_swaps = BufferRelatorio(ESQUEMA_SWAPS)
+    report_transf = BufferRelatorio(ESQUEMA_RECONC)
     FIAT = ['EUR', 'BRL', 'USD', 'GBP']
+    # Diário de lotes opcional (motor_fifo.lotes): carteira num instante sem recorrer o motor
+    diario = None
+    if pasta_lotes:
+        from motor_fifo.lotes import DiarioLotes, LEVANTAMENTO, TROCA, VENDA
+        diario = DiarioLotes(pasta_lotes)
+    if decompor:
+        # Grupo decomposto por moeda, taxas no FIFO (motor_fifo.decomposicao); deixa de dar o resultado do v4
+        from motor_fifo.aritmetica import DECIMAL
+        from motor_fifo.decomposicao import decompor_grupo, negociar
 
     print("Iniciando Processamento Auditável (v7.1)...")
 
+    inicio_ciclo = time.perf_counter()
     for tg, group in df_bin.groupby('Time_Group'):
+        met.contar('grupos')
         # Extrair Data e Hora separadamente conforme solicitado
-        data_s = tg.strftime('%Y-%m-%d')
-        hora_s = tg.strftime('%H:%M:%S')
+        data_s, hora_s = tg.strftime('%Y-%m-%d %H:%M:%S').split(' ')
+        dia = tg.toordinal()
         
         entradas = group[group['Val_Dec'] > 0]
         saidas = group[group['Val_Dec'] < 0]
+        if decompor:
+            coins, vals = group['Coin'].tolist(), group['Val_Dec'].tolist()
+            grupo = decompor_grupo(coins, group['Operation'].tolist(), vals, 0, len(group), FIAT)
+            entradas, saidas = group.iloc[grupo.novos_lotes()], group.iloc[grupo.levantamentos]
 
         # --- A) ENTRADAS (Alimentar Inventário) ---
         for _, ent in entradas.iterrows():
             m = ent['Coin']
-            if m in FIAT: continue
+            if m in FIAT:
+                met.contar('entrada.fiat_ignorada')
+                continue
             
             qtd_in = ent['Val_Dec']
-            custo_in, data_aq, origem, is_ext = Decimal('0'), data_s, "Rendimento/Binance", False
+            custo_in, data_aq, dia_aq, origem, is_ext = Decimal('0'), data_s, dia, "Rendimento/Binance", False
 
             if ent['Operation'] in ['Deposit', 'Fiat Deposit']:
-                if not bt_retiradas.empty:
-                    # Match rigoroso por quantidade (margem de erro mínima para taxas de rede)
-                    match = bt_retiradas[(bt_retiradas['Moeda'] == m) & 
-                                         (bt_retiradas['qtd_dec'].apply(lambda x: abs(x - qtd_in) < Decimal('0.00001')))].head(1)
-                    if not match.empty:
-                        custo_in = match['custo_dec'].iloc[0]
-                        data_aq = str(match['Data'].iloc[0])
-                        origem = "BitcoinTrade (Histórico)"
-                        bt_retiradas = bt_retiradas.drop(match.index[0])
-                    else:
-                        origem, is_ext = "Origem Externa", True
+                # Match rigoroso por quantidade (margem de erro mínima para taxas de rede)
+                t = time.perf_counter() if metricas is not None else 0
+                match = indice_bt.casar(m, qtd_in, tolerancia_abs=Decimal('0.00001')) if indice_bt else None
+                if metricas is not None: metricas.somar_tempo('correspondencia_bt', time.perf_counter() - t)
+                if indice_bt:
+                    met.observar('varrimento_bt', indice_bt.ultimo_varrimento)
+                met.contar('entrada.deposito')
+                met.contar('bt.casado' if match is not None else 'bt.externo')
+                if match is not None:
+                    custo_in = bt_retiradas.at[match, 'custo_dec']
+                    data_aq = str(bt_retiradas.at[match, 'Data'])
+                    dia_aq = bt_retiradas.at[match, 'dia']
+                    origem = "BitcoinTrade (Histórico)"
                 else:
                     origem, is_ext = "Origem Externa", True
                 
                 # Registo na Reconciliação com Data e Hora separadas
-                report_transf.append({
-                    'Data': data_s, 'Hora': hora_s, 'Moeda': m, 'Qtd': float(qtd_in), 
-                    'Tipo': 'ENTRADA', 'Status': origem
-                })
+                report_transf.adicionar((data_s, hora_s, m, float(qtd_in), 'ENTRADA', origem))
+            else:
+                met.contar('entrada.rendimento')
 
-            if m not in inventory: inventory[m] = []
-            inventory[m].append({'qty': qtd_in, 'cost': custo_in, 'date': data_aq, 'origem': origem, 'is_ext': is_ext})
+            lote = Lote(qtd_in, custo_in, data_aq, origem, is_ext, dia_aq)
+            inventory.fila(m).adicionar(lote)
+            if diario: diario.criar(tg.value, m, lote)
+
+        if decompor and grupo.negocio:
+            vendas, trocas, taxas = negociar(grupo, coins, vals, inventory, DECIMAL, None, FIAT, data_s, hora_s, dia,
+                                             report_irs.adicionar, report_swaps.adicionar, diario, tg.value, metricas)
+            met.contar('saida.venda_fiat', vendas)
+            met.contar('saida.swap', trocas)
+            met.contar('saida.taxa_fifo', taxas)
+
+        # Entradas fiat e pernas recebidas: uma vez por grupo, não por cada saída
+        if not saidas.empty:
+            fiat_entry = entradas[entradas['Coin'].isin(FIAT)]
+            if not fiat_entry.empty:
+                moeda_fiat = fiat_entry['Coin'].iloc[0]
+                val_fiat_total = abs(fiat_entry['Val_Dec'].sum())
+            pernas = list(zip(entradas['Coin'], entradas['Val_Dec']))
 
         # --- B) SAÍDAS (Vendas Fiat, Swaps, Levantamentos) ---
         for _, s in saidas.iterrows():
-            if 'Fee' in s['Operation']: continue
+            if 'Fee' in s['Operation']:
+                met.contar('saida.taxa_ignorada')
+                continue
             m_sai = s['Coin']
             qtd_sai = abs(s['Val_Dec'])
 
             if s['Operation'] in ['Withdraw', 'Withdrawal']:
-                report_transf.append({
-                    'Data': data_s, 'Hora': hora_s, 'Moeda': m_sai, 'Qtd': float(qtd_sai), 
-                    'Tipo': 'SAÍDA', 'Status': 'Para Carteira Externa'
-                })
-                if m_sai in inventory and inventory[m_sai]: inventory[m_sai].pop(0)
+                met.contar('saida.levantamento')
+                report_transf.adicionar((data_s, hora_s, m_sai, float(qtd_sai), 'SAÍDA', 'Para Carteira Externa'))
+                if inventory.get(m_sai):
+                    lote = inventory[m_sai].retirar()
+                    if diario: diario.consumir(tg.value, m_sai, lote, lote.qty, lote.cost, LEVANTAMENTO)
                 continue
 
-            fiat_entry = entradas[entradas['Coin'].isin(FIAT)]
             if not fiat_entry.empty:
                 # VENDA PARA FIAT (Evento Tributável)
-                moeda_fiat = fiat_entry['Coin'].iloc[0]
-                val_fiat_total = abs(fiat_entry['Val_Dec'].sum())
-                
-                qtd_restante = qtd_sai
-                while qtd_restante > 0 and m_sai in inventory and inventory[m_sai]:
-                    lote = inventory[m_sai][0]
-                    vender = min(lote['qty'], qtd_restante)
-                    
+                met.contar('saida.venda_fiat')
+                t, lotes = time.perf_counter() if metricas is not None else 0, 0
+
+                for lote, vender, custo_prop in inventory.fila(m_sai).consumir(qtd_sai):
+                    lotes += 1
+                    if diario: diario.consumir(tg.value, m_sai, lote, vender, custo_prop, VENDA)
                     prop = vender / qtd_sai
-                    custo_prop = (lote['cost'] / lote['qty']) * vender if lote['qty'] > 0 else Decimal('0')
                     receita_prop = val_fiat_total * prop
-                    
-                    # Cálculo de Dias e Isenção
-                    status_isento = ""
-                    try:
-                        d_venda = pd.to_datetime(data_s)
-                        d_aq = pd.to_datetime(lote['date'])
-                        delta = (d_venda - d_aq).days
-                        if lote['is_ext']:
-                            status_isento = "TBD"
-                        else:
-                            status_isento = f"{delta} dias (ISENTO)" if delta > 365 else f"{delta} dias"
-                    except: status_isento = "TBD"
-
-                    report_irs.append({
-                        'Data_Venda': data_s,
-                        'Ativo': m_sai,
-                        'Moeda_Venda': moeda_fiat,
-                        'Valor_Venda': float(round(receita_prop, 2)),
-                        'Data_Aquisicao': lote['date'],
-                        'Custo_Aquisicao_USD': float(round(custo_prop, 2)),
-                        'Origem_Externa': lote['origem'],
-                        'Resultado': float(round(receita_prop - custo_prop, 2)),
-                        'Isento_365d': status_isento
-                    })
-                    
-                    if lote['qty'] <= qtd_restante:
-                        qtd_restante -= lote['qty']
-                        inventory[m_sai].pop(0)
-                    else:
-                        lote['qty'] -= vender
-                        lote['cost'] -= custo_prop
-                        qtd_restante = 0
+
+                    # Dias e Isenção: subtração dos dias já convertidos na criação do lote
+                    report_irs.adicionar((
+                        data_s,                                         # Data_Venda
+                        m_sai,                                          # Ativo
+                        moeda_fiat,                                     # Moeda_Venda
+                        float(round(receita_prop, 2)),                  # Valor_Venda
+                        lote.date,                                      # Data_Aquisicao
+                        float(round(custo_prop, 2)),                    # Custo_Aquisicao_USD
+                        lote.origem,                                    # Origem_Externa
+                        float(round(receita_prop - custo_prop, 2)),     # Resultado
+                        status_isento(dia, lote.dia, lote.is_ext),      # Isento_365d
+                    ))
+                if metricas is not None: metricas.somar_tempo('consumo_fifo', time.perf_counter() - t)
+                met.observar('lotes_por_venda', lotes)
             else:
                 # SWAP (Herança de Custo 0.00 ou Histórico)
-                for _, e in entradas.iterrows():
-                    if m_sai in inventory and inventory[m_sai]:
-                        lv = inventory[m_sai].pop(0)
-                        if e['Coin'] not in inventory: inventory[e['Coin']] = []
-                        inventory[e['Coin']].append({
-                            'qty': e['Val_Dec'], 'cost': lv['cost'], 'date': lv['date'], 
-                            'origem': lv['origem'], 'is_ext': lv['is_ext']
-                        })
-                        report_swaps.append({
-                            'Data': data_s, 'Hora': hora_s, 'Saiu': m_sai, 'Entrou': e['Coin'], 
-                            'Custo_Herdado': float(lv['cost']), 'Data_Orig': lv['date']
-                        })
+                met.contar('saida.swap')
+                t, lotes = time.perf_counter() if metricas is not None else 0, 0
+                for moeda_e, qtd_e in pernas:
+                    if inventory.get(m_sai):
+                        lv = inventory[m_sai].retirar()
+                        novo = Lote(qtd_e, lv.cost, lv.date, lv.origem, lv.is_ext, lv.dia)
+                        inventory.fila(moeda_e).adicionar(novo)
+                        if diario:
+                            diario.consumir(tg.value, m_sai, lv, lv.qty, lv.cost, TROCA)
+                            diario.criar(tg.value, moeda_e, novo, pai=lv)
+                        report_swaps.adicionar((data_s, hora_s, m_sai, moeda_e, float(lv.cost), lv.date))
+                        lotes += 1
+                if metricas is not None: metricas.somar_tempo('consumo_fifo', time.perf_counter() - t)
+                met.observar('lotes_por_swap', lotes)
+    met.somar_tempo('ciclo_grupos', time.perf_counter() - inicio_ciclo)
+    if diario: diario.gravar()
 
     # 3. Exportação com colunas exatas
-    df_irs = pd.DataFrame(report_irs)
-    cols_irs = ['Data_Venda', 'Ativo', 'Moeda_Venda', 'Valor_Venda', 'Data_Aquisicao', 'Custo_Aquisicao_USD', 'Origem_Externa', 'Resultado', 'Isento_365d']
-    if not df_irs.empty:
-        df_irs[cols_irs].to_csv(out_irs, sep=';', index=False, decimal=',')
-
-    pd.DataFrame(report_swaps).to_csv(out_swaps, sep=';', index=False, decimal=',')
-
-    df_reconc = pd.DataFrame(report_transf)
-    if not df_reconc.empty:
-        cols_reconc = ['Data', 'Hora', 'Moeda', 'Qtd', 'Tipo', 'Status']
-        df_reconc[cols_reconc].to_csv(out_reconciliacao, sep=';', index=False, decimal=',')
+    inicio_export = time.perf_counter()
+    relatorios = (report_irs, report_swaps, report_transf)
+    if saida_colunar:
+        # Dataset Parquet/Arrow por ano fiscal; os CSVs saem dele
+        from motor_fifo.relatorios import EscritorColunar, exportar_csv
+        EscritorColunar(saida_colunar, formato).escrever(*relatorios)
+        if csv:
+            exportar_csv(saida_colunar, out_irs, out_swaps, out_reconciliacao)
+        print(f"\nDataset colunar ({formato}, por ano): {saida_colunar}/")
+    else:
+        escrever_csv([r.para_dataframe() for r in relatorios], out_irs, out_swaps, out_reconciliacao)
+    met.somar_tempo('exportacao', time.perf_counter() - inicio_export)
     
     print(f"\nSucesso! Gerados:")
     print(f"1. {out_irs} (Com colunas personalizadas)")
     print(f"2. {out_swaps} (Com Data e Hora)")
     print(f"3. {out_reconciliacao} (Com Data e Hora separadas)")
+    if diario: print(f"4. {pasta_lotes}/ (diário de lotes: {diario.n_eventos} eventos)")
 
 if __name__ == "__main__":
-    processar_motor_v7_final()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Motor FIFO Binance (v4)")
+    parser.add_argument('--exports', metavar='PASTA_OU_GLOB',
+                        help="junta os exports parciais (um processo por ficheiro, sem as linhas repetidas) "
+                             "em Binance_Novembro2019-Dezembro2025.csv antes de correr")
+    parser.add_argument('--colunar', metavar='PASTA',
+                        help="grava os relatórios em Parquet/Arrow por ano fiscal; os CSVs saem daí")
+    parser.add_argument('--formato', choices=['parquet', 'arrow'], default='parquet')
+    parser.add_argument('--sem-csv', action='store_true', help="com --colunar, não gera os CSVs")
+    parser.add_argument('--metricas', metavar='JSON', help="tempos por etapa e contagens por ramo em JSON")
+    parser.add_argument('--perfil', metavar='FICHEIRO',
+                        help="perfil da corrida: .prof (cProfile) ou .html (pyinstrument)")
+    parser.add_argument('--lotes', metavar='PASTA', help="grava o diário de lotes (consultas com Consultar_Lotes.py)")
+    parser.add_argument('--cache', nargs='?', const=True, metavar='PASTA',
+                        help="lê o ledger do cache normalizado (criado na primeira vez; por omissão .cache_ledger/)")
+    parser.add_argument('--decompor', action='store_true',
+                        help="trata cada grupo por moeda, com as taxas no FIFO (deixa de dar o resultado do v4)")
+    args = parser.parse_args()
+
+    binance_input = 'Binance_Novembro2019-Dezembro2025.csv'
+    if args.exports:
+        from motor_fifo.ingestao import ingerir
+        ingerir(args.exports, destino=binance_input)
+
+    from motor_fifo.metricas import Metricas, perfilar
+    metricas = Metricas('v4') if args.metricas else None
+    with perfilar(args.perfil):
+        processar_motor_v7_final(args.colunar, args.formato, csv=not args.sem_csv, metricas=metricas,
+                                 pasta_lotes=args.lotes, cache=args.cache, decompor=args.decompor)
+    if metricas is not None:
+        metricas.guardar(args.metricas)
+        print(metricas.resumo())
\ No newline at end of file
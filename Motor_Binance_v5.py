@@ -0,0 +1,117 @@
+import argparse
+
+# v5: mesmo resultado do v4 (ficheiros idênticos), mas o ledger é ordenado e
+# segmentado uma vez em colunas em vez de groupby + iterrows por grupo.
+# O motor (pandas/numpy) só é importado depois de ler os argumentos: --help é imediato.
+# Ver também a linha de comandos do pacote (motor-fifo / python -m motor_fifo).
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motor FIFO Binance (v5, colunar)")
+    parser.add_argument('--exports', metavar='PASTA_OU_GLOB',
+                        help="junta os exports parciais (um processo por ficheiro, sem as linhas repetidas) "
+                             "em Binance_Novembro2019-Dezembro2025.csv antes de correr")
+    parser.add_argument('--estado', help="snapshot JSON: retoma dele e grava-o no fim (modo incremental)")
+    parser.add_argument('--bloco', type=int,
+                        help="modo fluxo: lê o export em blocos de N linhas (memória limitada)")
+    parser.add_argument('--processos', type=int,
+                        help="reparte as moedas não ligadas por swaps por N processos")
+    parser.add_argument('--colunar', metavar='PASTA',
+                        help="grava os relatórios em Parquet/Arrow por ano fiscal; os CSVs saem daí")
+    parser.add_argument('--formato', choices=['parquet', 'arrow'], default='parquet')
+    parser.add_argument('--sem-csv', action='store_true', help="com --colunar, não gera os CSVs")
+    parser.add_argument('--reconciliacao', choices=['primeira', 'otima'], default='primeira',
+                        help="depósitos x retiradas BT: primeira compatível (v4) ou em lote por moeda")
+    parser.add_argument('--taxa-max', type=float, default=0,
+                        help="com --reconciliacao otima: fração da retirada que pode faltar no depósito")
+    parser.add_argument('--correspondencias', metavar='CSV', help="com --reconciliacao otima: grava a tabela de pares")
+    parser.add_argument('--lotes', metavar='PASTA',
+                        help="grava o diário de lotes (consultas com Consultar_Lotes.py); com --estado continua-o")
+    parser.add_argument('--cache', nargs='?', const=True, metavar='PASTA',
+                        help="lê o ledger do cache normalizado (criado na primeira vez; por omissão .cache_ledger/)")
+    parser.add_argument('--lacuna', metavar='DURACAO',
+                        help="agrupa por lacuna entre linhas seguidas (ex.: 2s) em vez do dt.round('2s') do v4")
+    parser.add_argument('--por-operacao', action='store_true',
+                        help="com --lacuna: a lacuna conta só entre linhas da mesma classe de operação")
+    parser.add_argument('--decompor', action='store_true',
+                        help="trata cada grupo por moeda, com as taxas no FIFO (deixa de dar o resultado do v4)")
+    parser.add_argument('--resumo-irs', metavar='CSV',
+                        help="grava o resumo anual do IRS (ano, ativo, moeda, isento/tributável) acumulado no ciclo")
+    parser.add_argument('--estatisticas-grupos', action='store_true',
+                        help="compara tamanhos de grupo de várias janelas/lacunas neste export e sai")
+    parser.add_argument('--cenarios', nargs='?', const=True, metavar='JSON',
+                        help="simula políticas de lotes / regras (JSON; por omissão fifo, lifo, hifo, custo "
+                             "herdado, estáveis como fiat) sobre o mesmo ledger, mostra os totais IRS e sai")
+    parser.add_argument('--designados', metavar='CSV',
+                        help="com --cenarios: acrescenta a identificação específica (Ativo;Data_Aquisicao)")
+    parser.add_argument('--por-ano', action='store_true', help="com --cenarios: totais por ano de venda")
+    parser.add_argument('--saida-cenarios', metavar='PASTA',
+                        help="com --cenarios: grava o relatório IRS de cada cenário nesta pasta")
+    parser.add_argument('--ponto-fixo', action='store_true',
+                        help="aritmética inteira (quantidades em 10^-casas, custos em cêntimos escalados)")
+    parser.add_argument('--casas', type=int, default=8, help="casas decimais das quantidades em --ponto-fixo")
+    parser.add_argument('--comparar-ponto-fixo', action='store_true',
+                        help="compara os totais IRS do ponto fixo com os do Decimal e sai")
+    parser.add_argument('--verificar', action='store_true',
+                        help="confirma que incremental == recálculo completo e sai")
+    parser.add_argument('--metricas', metavar='JSON', help="tempos por etapa e contagens por ramo em JSON")
+    parser.add_argument('--perfil', metavar='FICHEIRO',
+                        help="perfil da corrida: .prof (cProfile) ou .html (pyinstrument)")
+    args = parser.parse_args()
+    from motor_fifo.aritmetica import DECIMAL, AritmeticaPontoFixo, comparar_com_decimal
+    from motor_fifo.colunar import processar_motor_colunar
+
+    binance_input = 'Binance_Novembro2019-Dezembro2025.csv'
+    bt_input = 'Relatorio_FIFO_Completo_Contraparte.csv'
+    if args.exports:
+        from motor_fifo.ingestao import ingerir
+        ingerir(args.exports, destino=binance_input)
+    aritmetica = DECIMAL
+    if args.ponto_fixo or args.comparar_ponto_fixo:
+        aritmetica = AritmeticaPontoFixo(casas=args.casas)
+
+    if args.verificar:
+        from motor_fifo.estado import verificar_incremental
+        raise SystemExit(0 if verificar_incremental(binance_input, bt_input) else 1)
+    if args.comparar_ponto_fixo:
+        raise SystemExit(0 if comparar_com_decimal(binance_input, bt_input, aritmetica) else 1)
+
+    janela = '2s'
+    if args.lacuna:
+        from motor_fifo.agrupamento import AgrupamentoLacuna
+        janela = AgrupamentoLacuna(args.lacuna, por_operacao=args.por_operacao)
+    if args.estatisticas_grupos:
+        import pandas as pd
+        from motor_fifo.agrupamento import AgrupamentoLacuna, estatisticas
+        df = pd.read_csv(binance_input, usecols=['UTC_Time', 'Operation'])
+        janelas = ['1s', '2s', '5s'] + [AgrupamentoLacuna(l, por_operacao=args.por_operacao)
+                                        for l in ('500ms', '1s', '2s', '5s')]
+        print(estatisticas(pd.to_datetime(df['UTC_Time']), df['Operation'], janelas).to_string(index=False))
+        raise SystemExit(0)
+    if args.cenarios:
+        import pandas as pd
+        from motor_fifo.cenarios import (CENARIOS_PADRAO, Cenario, carregar_cenarios, carregar_designados,
+                                         simular_cenarios)
+        cenarios = list(CENARIOS_PADRAO) if args.cenarios is True else carregar_cenarios(args.cenarios)
+        if args.designados:
+            cenarios.append(Cenario('especifica', 'especifica', designados=carregar_designados(args.designados)))
+        resumo = simular_cenarios(binance_input, bt_input, cenarios, aritmetica, processos=args.processos,
+                                  saida=args.saida_cenarios, por_ano=args.por_ano, cache=args.cache, janela=janela)
+        with pd.option_context('display.max_rows', 500, 'display.width', 250):
+            print(resumo.to_string(index=False))
+        raise SystemExit(0)
+
+    from motor_fifo.metricas import Metricas, perfilar
+    metricas = Metricas('v5') if args.metricas else None
+    if metricas is not None:
+        metricas.info.update(processos=args.processos or 1, bloco=args.bloco, aritmetica=type(aritmetica).__name__)
+    with perfilar(args.perfil):
+        processar_motor_colunar(binance_input, bt_input, estado=args.estado, bloco=args.bloco,
+                                aritmetica=aritmetica, processos=args.processos,
+                                saida_colunar=args.colunar, formato=args.formato, csv=not args.sem_csv,
+                                metricas=metricas, reconciliacao=args.reconciliacao, taxa_max=args.taxa_max,
+                                correspondencias=args.correspondencias, lotes=args.lotes,
+                                cache=args.cache, janela=janela, decompor=args.decompor,
+                                resumo_irs=args.resumo_irs)
+    if metricas is not None:
+        metricas.guardar(args.metricas)
+        print(metricas.resumo())
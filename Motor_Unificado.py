@@ -0,0 +1,48 @@
+import argparse
+import os
+
+from motor_fifo.unificado import processar_motor_unificado
+
+# Binance + BitcoinTrade + Nexo numa só passagem: um inventário FIFO global e as
+# transferências entre corretoras casadas automaticamente (ver motor_fifo.unificado).
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motor FIFO unificado (várias corretoras)")
+    parser.add_argument('--bitcointrade', default='Relatorio_FIFO_Completo_Contraparte.csv',
+                        help="relatório do motor BT ('' para não usar)")
+    parser.add_argument('--binance', default='Binance_Novembro2019-Dezembro2025.csv',
+                        help="export Binance ('' para não usar)")
+    parser.add_argument('--nexo', default='', help="export de transações da Nexo")
+    parser.add_argument('--bloco', type=int, help="lê o export Binance em blocos de N linhas")
+    parser.add_argument('--lacuna', metavar='DURACAO',
+                        help="agrupa o export Binance por lacuna entre linhas seguidas em vez do dt.round('2s')")
+    parser.add_argument('--por-operacao', action='store_true',
+                        help="com --lacuna: a lacuna conta só entre linhas da mesma classe de operação")
+    parser.add_argument('--colunar', metavar='PASTA',
+                        help="grava os relatórios em Parquet/Arrow por ano fiscal; os CSVs saem daí")
+    parser.add_argument('--formato', choices=['parquet', 'arrow'], default='parquet')
+    parser.add_argument('--sem-csv', action='store_true', help="com --colunar, não gera os CSVs")
+    parser.add_argument('--inventario', metavar='CSV', help="grava o resumo do inventário final")
+    parser.add_argument('--reconciliacao', choices=['otima', 'primeira'], default='otima',
+                        help="transferências casadas em lote por moeda (otima) ou ao primeiro compatível")
+    parser.add_argument('--taxa-max', type=float, default=0,
+                        help="fração do levantamento que pode faltar no depósito (taxa de rede), ex.: 0.01")
+    parser.add_argument('--correspondencias', metavar='CSV', help="grava a tabela de pares (com --reconciliacao otima)")
+    args = parser.parse_args()
+
+    # Por esta ordem nos empates de instante: a retirada BT vem antes do depósito Binance
+    fontes = []
+    if args.bitcointrade and os.path.exists(args.bitcointrade):
+        fontes.append(('bitcointrade', args.bitcointrade))
+    if args.binance:
+        opcoes = {'bloco': args.bloco}
+        if args.lacuna:
+            from motor_fifo.agrupamento import AgrupamentoLacuna
+            opcoes['janela'] = AgrupamentoLacuna(args.lacuna, por_operacao=args.por_operacao)
+        fontes.append(('binance', args.binance, opcoes))
+    if args.nexo:
+        fontes.append(('nexo', args.nexo))
+    processar_motor_unificado(fontes, saida_colunar=args.colunar, formato=args.formato,
+                              csv=not args.sem_csv, inventario=args.inventario,
+                              reconciliacao=args.reconciliacao, taxa_max=args.taxa_max,
+                              correspondencias=args.correspondencias)
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from motor_fifo.sintetico import VERSAO, gerar, ler_mistura
+
+# Benchmark dos motores sobre exports sintéticos (motor_fifo.sintetico).
+# Cada motor corre num processo à parte, numa pasta só dele com os ficheiros de
+# entrada com os nomes que os scripts esperam; mede-se tempo, pico de RSS e linhas/s.
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+BINANCE_INPUT = 'Binance_Novembro2019-Dezembro2025.csv'
+BT_INPUT = 'Relatorio_FIFO_Completo_Contraparte.csv'
+MOTORES = {
+    'v1': ['Backup/motor Binace_v1.py'],
+    'v3': ['Motor_Binance_v3.py'],
+    'v4': ['Motor_Binance_v4.py'],
+    'v5': ['Motor_Binance_v5.py'],
+    'matchs_v2': ['matchs_exchanges_v2.py'],
+}
+
+
+def _correr(argv, pasta, limite):
+    """(segundos, pico RSS em MB ou None, código de saída; None se passou do limite)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get('PYTHONPATH')])))
+    with open(os.path.join(pasta, 'stderr.txt'), 'wb') as erros:
+        inicio = time.perf_counter()
+        proc = subprocess.Popen(argv, cwd=pasta, env=env, stdout=subprocess.DEVNULL, stderr=erros)
+        if not hasattr(os, 'wait4'):
+            # Windows: sem wait4 não há pico de RSS do filho
+            try:
+                codigo = proc.wait(timeout=limite)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                return time.perf_counter() - inicio, None, None
+            return time.perf_counter() - inicio, None, codigo
+
+        while True:
+            pid, estado, uso = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if limite and time.perf_counter() - inicio > limite:
+                proc.kill()
+                proc.wait()
+                return time.perf_counter() - inicio, None, None
+            time.sleep(0.01)
+        segundos = time.perf_counter() - inicio
+    proc.returncode = codigo = os.waitstatus_to_exitcode(estado)
+    # ru_maxrss: KB no Linux, bytes no macOS
+    pico = uso.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return segundos, pico, codigo
+
+
+def preparar_dados(linhas, pasta, mistura=None, semente=1):
+    """Gera (ou reaproveita) o par Binance/BT para `linhas` em pasta/<linhas>/."""
+    destino = os.path.join(pasta, str(linhas))
+    binance, bt = os.path.join(destino, BINANCE_INPUT), os.path.join(destino, BT_INPUT)
+    meta = os.path.join(destino, 'gerado.json')
+    desc = {'linhas': linhas, 'mistura': mistura or {}, 'semente': semente, 'versao': VERSAO}
+    if os.path.exists(meta):
+        with open(meta, encoding='utf-8') as f:
+            if json.load(f) == desc:
+                return binance, bt
+    os.makedirs(destino, exist_ok=True)
+    inicio = time.perf_counter()
+    n_bin, n_bt = gerar(linhas, binance, bt, mistura=mistura, semente=semente)
+    print(f"Gerado {n_bin} linhas Binance / {n_bt} BT em {time.perf_counter() - inicio:.1f}s ({destino})")
+    with open(meta, 'w', encoding='utf-8') as f:
+        json.dump(desc, f)
+    return binance, bt
+
+
+def medir(motor, binance, bt, limite=None, argumentos=(), pasta=None):
+    """Corre o motor numa pasta com os dois ficheiros de entrada; devolve o mesmo que _correr.
+
+    Sem `pasta` usa uma temporária, apagada no fim; com `pasta` os relatórios ficam lá.
+    """
+    manter = pasta is not None
+    pasta = pasta if manter else tempfile.mkdtemp(prefix=f'bench_{motor}_')
+    os.makedirs(pasta, exist_ok=True)
+    try:
+        for origem in (binance, bt):
+            destino = os.path.join(pasta, os.path.basename(origem))
+            try:
+                os.symlink(origem, destino)
+            except OSError:
+                shutil.copyfile(origem, destino)
+        argv = [sys.executable, os.path.join(RAIZ, *MOTORES[motor][0].split('/')), *MOTORES[motor][1:], *argumentos]
+        segundos, pico, codigo = _correr(argv, pasta, limite)
+        if codigo:
+            with open(os.path.join(pasta, 'stderr.txt'), encoding='utf-8', errors='replace') as f:
+                print(''.join(f.readlines()[-5:]), end='', file=sys.stderr)
+        return segundos, pico, codigo
+    finally:
+        if not manter:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+def benchmark(tamanhos, motores, pasta, mistura=None, semente=1, limite=None, repeticoes=1, argumentos=None):
+    """Corre cada motor em cada tamanho; devolve uma lista de dicts (uma linha por medição)."""
+    resultados = []
+    for linhas in tamanhos:
+        binance, bt = preparar_dados(linhas, pasta, mistura, semente)
+        for motor in motores:
+            tempos, picos, estado = [], [], 'ok'
+            for _ in range(repeticoes):
+                segundos, pico, codigo = medir(motor, binance, bt, limite, (argumentos or {}).get(motor, ()))
+                if codigo is None:
+                    estado = 'limite'
+                    break
+                if codigo != 0:
+                    estado = f'erro ({codigo})'
+                    break
+                tempos.append(segundos)
+                picos.append(pico)
+            linha = {'motor': motor, 'linhas': linhas, 'estado': estado, 'segundos': None,
+                     'pico_rss_mb': None, 'linhas_s': None}
+            if estado == 'ok':
+                # Melhor das repetições: menos sensível a ruído da máquina
+                segundos = min(tempos)
+                linha.update(segundos=round(segundos, 3),
+                             pico_rss_mb=round(max(picos), 1) if picos[0] is not None else None,
+                             linhas_s=round(linhas / segundos))
+            resultados.append(linha)
+            print(_formatar(linha), flush=True)
+    return resultados
+
+
+def _formatar(linha):
+    if linha['estado'] != 'ok':
+        return f"{linha['motor']:<10} {linha['linhas']:>10}  {linha['estado']}"
+    pico = f"{linha['pico_rss_mb']:>9.1f} MB" if linha['pico_rss_mb'] is not None else '        - MB'
+    return (f"{linha['motor']:<10} {linha['linhas']:>10}  {linha['segundos']:>9.2f} s {pico}"
+            f"  {linha['linhas_s']:>10} linhas/s")
+
+
+def comparar(resultados, referencia, tolerancia=0.2):
+    """Regressões face a um benchmark gravado: tempo ou pico de RSS acima de (1+tolerancia)x."""
+    base = {(r['motor'], r['linhas']): r for r in referencia}
+    regressoes = []
+    for r in resultados:
+        b = base.get((r['motor'], r['linhas']))
+        if b is None or b['estado'] != 'ok':
+            continue
+        if r['estado'] != 'ok':
+            regressoes.append(f"{r['motor']} {r['linhas']}: {r['estado']} (antes ok)")
+            continue
+        for campo in ('segundos', 'pico_rss_mb'):
+            if r[campo] is not None and b[campo] and r[campo] > b[campo] * (1 + tolerancia):
+                regressoes.append(f"{r['motor']} {r['linhas']}: {campo} {b[campo]} -> {r[campo]}")
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos motores FIFO com dados sintéticos")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10_000, 100_000],
+                        help="tamanhos do export Binance (ex.: 10000 100000 1000000)")
+    parser.add_argument('--motores', nargs='+', default=['v4', 'v5', 'matchs_v2'], choices=sorted(MOTORES))
+    parser.add_argument('--mistura', default='',
+                        help="pesos dos eventos, ex.: swap=0.3,venda=0.2,earn=0.3 (ver motor_fifo.sintetico)")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--pasta', default=os.path.join(tempfile.gettempdir(), 'bench_motores'),
+                        help="onde ficam os dados gerados (reaproveitados entre corridas)")
+    parser.add_argument('--limite', type=float, default=1800, help="segundos por corrida antes de desistir")
+    parser.add_argument('--repeticoes', type=int, default=1)
+    parser.add_argument('--v5', default='', help="argumentos extra para o v5, ex.: \"--bloco 200000\"")
+    parser.add_argument('--so-gerar', action='store_true', help="só gera os dados e sai")
+    parser.add_argument('--guardar', help="grava os resultados em JSON")
+    parser.add_argument('--referencia', help="JSON de um benchmark anterior: sai com 1 se houver regressões")
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    args = parser.parse_args()
+    mistura = ler_mistura(args.mistura) if args.mistura else None
+
+    if args.so_gerar:
+        for n in args.linhas:
+            preparar_dados(n, args.pasta, mistura, args.semente)
+        raise SystemExit(0)
+
+    resultados = benchmark(args.linhas, args.motores, args.pasta, mistura, args.semente, args.limite,
+                           args.repeticoes, {'v5': args.v5.split()})
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=1)
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as f:
+            regressoes = comparar(resultados, json.load(f), args.tolerancia)
+        for r in regressoes:
+            print(f"REGRESSÃO: {r}")
+        raise SystemExit(1 if regressoes else 0)
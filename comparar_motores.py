@@ -0,0 +1,286 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmark_motores import MOTORES, medir, preparar_dados
+from motor_fifo.sintetico import ler_mistura
+
+# Comparação diferencial de dois motores sobre as mesmas entradas (os ficheiros reais
+# ou os exports sintéticos do benchmark_motores), para aceitar ou rejeitar uma
+# reescrita sem mudar o IRS sem ninguém reparar.
+#
+# Cada motor corre num processo à parte, numa pasta só dele (como no benchmark). Os
+# relatórios são depois normalizados para o esquema do v4:
+#  - IRS: Data_Venda, Ativo, Data_Aquisicao, Valor_Venda, Custo_Aquisicao_USD,
+#    Resultado (o v1 e o matchs_v2 chamam Moeda / Data_Aquisição / Custo_Aquisição)
+#  - Reconciliação: Data, Moeda, Tipo, Qtd e a categoria do Status (BT, HERDADO,
+#    EXTERNA ou LEVANTAMENTO), porque cada motor escreve o Status à sua maneira.
+#    O v1 não tem reconciliação.
+#
+# As linhas casam-se pela chave (IRS: Data_Venda, Ativo, Data_Aquisicao; reconciliação:
+# Data, Moeda, Tipo, Qtd a 8 casas) e pela ordem dentro da mesma chave. Linhas que só
+# existem num lado, valores que diferem mais do que a tolerância e totais por ano/ativo
+# diferentes rejeitam o motor B (código de saída 1).
+
+# Relatórios de cada motor (IRS, reconciliação), na pasta onde correu
+SAIDAS = {
+    'v1': ('RELATORIO_FINAL_TODOS_OS_ANOS.csv', None),
+    'v3': ('1_Vendas_IRS_Formatado.csv', '3_Reconciliacao_Transferencias.csv'),
+    'v4': ('1_Vendas_IRS_Formatado.csv', '3_Reconciliacao_Transferencias.csv'),
+    'v5': ('1_Vendas_IRS_Formatado.csv', '3_Reconciliacao_Transferencias.csv'),
+    'matchs_v2': ('1_IRS_Vendas_Portugal.csv', '3_Reconciliacao_Transferencias.csv'),
+}
+RENOMEAR = {'Moeda': 'Ativo', 'Data_Aquisição': 'Data_Aquisicao', 'Custo_Aquisição': 'Custo_Aquisicao_USD'}
+CHAVE_IRS = ['Data_Venda', 'Ativo', 'Data_Aquisicao']
+VALORES_IRS = ['Valor_Venda', 'Custo_Aquisicao_USD', 'Resultado']
+CHAVE_RECONC = ['Data', 'Moeda', 'Tipo', 'Qtd']
+
+
+def _ler(caminho):
+    # O pandas escreve '""' (ou nada) para um relatório sem linhas
+    if caminho is None or not os.path.exists(caminho) or os.path.getsize(caminho) <= 3:
+        return None
+    return pd.read_csv(caminho, sep=';', decimal=',', dtype=str, keep_default_na=False)
+
+
+def _numero(col):
+    return pd.to_numeric(col.str.replace(',', '.', regex=False), errors='coerce').fillna(0.0)
+
+
+def _com_ordem(df, chave):
+    # Ordem da linha dentro da mesma chave: a 2ª venda do mesmo lote no mesmo dia casa com a 2ª
+    df = df.copy()
+    df['Ordem'] = df.groupby(chave, sort=False).cumcount()
+    return df
+
+
+def normalizar_irs(caminho):
+    df = _ler(caminho)
+    if df is None:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in CHAVE_IRS}
+                            | {c: pd.Series(dtype=float) for c in VALORES_IRS} | {'Ordem': pd.Series(dtype=int)})
+    df = df.rename(columns=RENOMEAR)
+    faltam = [c for c in CHAVE_IRS + VALORES_IRS if c not in df.columns]
+    if faltam:
+        raise ValueError(f"{caminho}: faltam as colunas {', '.join(faltam)}")
+    df = df[CHAVE_IRS + VALORES_IRS].copy()
+    for c in VALORES_IRS:
+        df[c] = _numero(df[c])
+    return _com_ordem(df, CHAVE_IRS)
+
+
+def categoria(tipo, status):
+    """Status da reconciliação de qualquer motor: BT, HERDADO, EXTERNA ou LEVANTAMENTO."""
+    if tipo != 'ENTRADA':
+        return 'LEVANTAMENTO'
+    if 'BitcoinTrade' in status:
+        return 'BT'
+    if 'Herdado' in status:
+        return 'HERDADO'
+    return 'EXTERNA'
+
+
+def normalizar_reconciliacao(caminho):
+    df = _ler(caminho)
+    if df is None:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in CHAVE_RECONC + ['Categoria']}
+                            | {'Ordem': pd.Series(dtype=int)})
+    df = pd.DataFrame({
+        'Data': df['Data'], 'Moeda': df['Moeda'], 'Tipo': df['Tipo'],
+        'Qtd': _numero(df['Qtd']).map('{:.8f}'.format),
+        'Categoria': [categoria(t, s) for t, s in zip(df['Tipo'], df['Status'])],
+    })
+    return _com_ordem(df, CHAVE_RECONC)
+
+
+def _casar(a, b, chave):
+    m = a.merge(b, on=chave + ['Ordem'], how='outer', suffixes=('_a', '_b'), indicator=True, sort=True)
+    lado = m.pop('_merge').map({'left_only': 'so_a', 'right_only': 'so_b', 'both': 'ambos'})
+    m = m[chave + ['Ordem'] + [c for c in m.columns if c not in chave and c != 'Ordem']]
+    return m, lado.astype(str)
+
+
+def comparar_irs(a, b, tolerancia=0.01):
+    """(linhas diferentes, totais por ano/ativo) entre dois relatórios IRS normalizados.
+
+    Uma linha é diferente se só existe num dos lados ou se algum valor difere mais do
+    que `tolerancia`; a coluna Diferenca diz qual.
+    """
+    m, lado = _casar(a, b, CHAVE_IRS)
+    dif = pd.Series('', index=m.index)
+    dif[lado == 'so_a'] = 'só A'
+    dif[lado == 'so_b'] = 'só B'
+    fora = pd.concat({c: (lado == 'ambos') & ((m[f'{c}_b'] - m[f'{c}_a']).abs() > tolerancia + 1e-9)
+                      for c in VALORES_IRS}, axis=1)
+    valores = fora.any(axis=1)
+    # Nomes das colunas que diferem, só nas linhas com diferenças
+    dif[valores] = [', '.join(c for c, f in zip(VALORES_IRS, r) if f) for r in fora[valores].itertuples(index=False)]
+    linhas = m[dif != ''].assign(Diferenca=dif[dif != ''])
+
+    totais = []
+    for nome, df in (('a', a), ('b', b)):
+        g = df.assign(Ano=df['Data_Venda'].str[:4]).groupby(['Ano', 'Ativo'])
+        t = g[VALORES_IRS].sum()
+        t['Linhas'] = g.size()
+        totais.append(t.add_suffix(f'_{nome}'))
+    agregados = totais[0].join(totais[1], how='outer').fillna(0)
+    for c in VALORES_IRS + ['Linhas']:
+        agregados[f'{c}_dif'] = agregados[f'{c}_b'] - agregados[f'{c}_a']
+    for c in ('Linhas_a', 'Linhas_b', 'Linhas_dif'):
+        agregados[c] = agregados[c].astype('int64')
+    return linhas, agregados.reset_index()
+
+
+def comparar_reconciliacao(a, b):
+    """(linhas diferentes, contagens por Tipo/categoria) entre duas reconciliações normalizadas."""
+    m, lado = _casar(a, b, CHAVE_RECONC)
+    dif = pd.Series('', index=m.index)
+    dif[lado == 'so_a'] = 'só A'
+    dif[lado == 'so_b'] = 'só B'
+    dif[(lado == 'ambos') & (m['Categoria_a'] != m['Categoria_b'])] = 'Status'
+    linhas = m[dif != ''].assign(Diferenca=dif[dif != ''])
+    contagens = pd.concat(
+        [df.groupby(['Tipo', 'Categoria']).size().rename(nome) for nome, df in (('a', a), ('b', b))], axis=1
+    ).fillna(0).astype('int64')
+    contagens['dif'] = contagens['b'] - contagens['a']
+    return linhas, contagens.reset_index()
+
+
+class Resultado:
+    """Diferenças entre os motores A e B numa entrada; `aceite` decide o código de saída."""
+
+    def __init__(self, motor_a, motor_b, irs, agregados, reconc, contagens, tolerancia_agregada):
+        self.motores = (motor_a, motor_b)
+        self.irs = irs
+        self.agregados = agregados
+        self.reconc = reconc
+        self.contagens = contagens
+        self.totais_fora = agregados[
+            (agregados[[f'{c}_dif' for c in VALORES_IRS]].abs() > tolerancia_agregada + 1e-9).any(axis=1)
+            | (agregados['Linhas_dif'] != 0)
+        ]
+
+    @property
+    def aceite(self):
+        return not len(self.irs) and not len(self.totais_fora) and (self.reconc is None or not len(self.reconc))
+
+    def resumo(self):
+        a, b = self.motores
+        linhas = [f"IRS: {len(self.irs)} linhas diferentes "
+                  f"({(self.irs['Diferenca'] == 'só A').sum()} só em {a}, "
+                  f"{(self.irs['Diferenca'] == 'só B').sum()} só em {b}); "
+                  f"{len(self.totais_fora)} totais ano/ativo fora da tolerância"]
+        for c in VALORES_IRS:
+            linhas.append(f"  {c:<20} {a}: {self.agregados[f'{c}_a'].sum():>16.2f}  "
+                          f"{b}: {self.agregados[f'{c}_b'].sum():>16.2f}  "
+                          f"dif: {self.agregados[f'{c}_dif'].sum():>12.2f}")
+        if self.reconc is None:
+            linhas.append("Reconciliação: não comparada (um dos motores não a gera)")
+        else:
+            linhas.append(f"Reconciliação: {len(self.reconc)} linhas diferentes "
+                          f"({(self.reconc['Diferenca'] == 'Status').sum()} com outro Status)")
+            for r in self.contagens.itertuples(index=False):
+                if r.dif:
+                    linhas.append(f"  {r.Tipo:<8} {r.Categoria:<12} {a}: {r.a:>7}  {b}: {r.b:>7}  dif: {r.dif:>+6}")
+        linhas.append(f"{a} vs {b}: {'ACEITE' if self.aceite else 'REJEITADO'}")
+        return '\n'.join(linhas)
+
+    def gravar(self, pasta):
+        os.makedirs(pasta, exist_ok=True)
+        tabelas = [('diferencas_irs', self.irs), ('agregados_irs', self.agregados)]
+        if self.reconc is not None:
+            tabelas += [('diferencas_reconciliacao', self.reconc), ('contagens_reconciliacao', self.contagens)]
+        for nome, df in tabelas:
+            df.to_csv(os.path.join(pasta, f'{nome}.csv'), sep=';', index=False, decimal=',')
+
+
+def comparar_pastas(pasta_a, motor_a, pasta_b, motor_b, tolerancia=0.01, tolerancia_agregada=0.01, rotulos=None):
+    """Compara os relatórios já gerados por dois motores nas respetivas pastas.
+
+    rotulos: nomes dos dois lados no resumo (por omissão os dos motores).
+    """
+    (irs_a, rec_a), (irs_b, rec_b) = SAIDAS[motor_a], SAIDAS[motor_b]
+    irs, agregados = comparar_irs(normalizar_irs(os.path.join(pasta_a, irs_a)),
+                                  normalizar_irs(os.path.join(pasta_b, irs_b)), tolerancia)
+    reconc = contagens = None
+    if rec_a and rec_b:
+        reconc, contagens = comparar_reconciliacao(normalizar_reconciliacao(os.path.join(pasta_a, rec_a)),
+                                                   normalizar_reconciliacao(os.path.join(pasta_b, rec_b)))
+    return Resultado(*(rotulos or (motor_a, motor_b)), irs, agregados, reconc, contagens, tolerancia_agregada)
+
+
+def correr_par(motores, argumentos, binance, bt, limite=None, tolerancia=0.01, tolerancia_agregada=0.01,
+               manter=None):
+    """Corre os dois motores sobre binance/bt e compara; None se algum falhar.
+
+    motores/argumentos: pares (A, B); o mesmo motor pode aparecer duas vezes com
+    argumentos diferentes (ex.: v5 e v5 --ponto-fixo). Com `manter` as pastas de
+    cada corrida ficam em manter/A e manter/B.
+    """
+    raiz = manter or tempfile.mkdtemp(prefix='comparar_motores_')
+    pastas = [os.path.join(raiz, lado) for lado in ('A', 'B')]
+    rotulos = [' '.join([motor, *args]) for motor, args in zip(motores, argumentos)]
+    try:
+        for motor, args, pasta, rotulo in zip(motores, argumentos, pastas, rotulos):
+            shutil.rmtree(pasta, ignore_errors=True)
+            segundos, _, codigo = medir(motor, os.path.abspath(binance), os.path.abspath(bt), limite, args, pasta)
+            if codigo != 0:
+                print(f"{rotulo}: {'passou do limite' if codigo is None else f'erro ({codigo})'}")
+                return None
+            print(f"{rotulo}: {segundos:.2f} s")
+        return comparar_pastas(pastas[0], motores[0], pastas[1], motores[1], tolerancia, tolerancia_agregada, rotulos)
+    finally:
+        if not manter:
+            shutil.rmtree(raiz, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparação diferencial de dois motores FIFO (IRS e reconciliação)")
+    parser.add_argument('motor_a', choices=sorted(MOTORES), help="motor de referência")
+    parser.add_argument('motor_b', choices=sorted(MOTORES), help="motor a aceitar ou rejeitar")
+    # Com '=' (--args-b=--ponto-fixo): sozinho, um valor começado por '-' seria lido como opção
+    parser.add_argument('--args-a', default='', help="argumentos extra do motor A, ex.: --args-a=--cache")
+    parser.add_argument('--args-b', default='', help="argumentos extra do motor B, ex.: --args-b=--ponto-fixo")
+    parser.add_argument('--binance', default='Binance_Novembro2019-Dezembro2025.csv', metavar='CSV')
+    parser.add_argument('--bt', default='Relatorio_FIFO_Completo_Contraparte.csv', metavar='CSV')
+    parser.add_argument('--linhas', type=int, nargs='+',
+                        help="em vez de --binance/--bt, exports sintéticos destes tamanhos (benchmark_motores)")
+    parser.add_argument('--mistura', default='', help="pesos dos eventos sintéticos (ver motor_fifo.sintetico)")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--pasta', default=os.path.join(tempfile.gettempdir(), 'bench_motores'),
+                        help="onde ficam os dados sintéticos (partilhada com o benchmark)")
+    parser.add_argument('--limite', type=float, default=1800, help="segundos por corrida antes de desistir")
+    parser.add_argument('--tolerancia', type=float, default=0.01,
+                        help="diferença admitida por linha em Valor_Venda, Custo_Aquisicao_USD e Resultado")
+    parser.add_argument('--tolerancia-agregada', type=float, default=0.01,
+                        help="diferença admitida nos totais por ano/ativo")
+    parser.add_argument('--saida', metavar='PASTA', help="grava as tabelas de diferenças (uma subpasta por entrada)")
+    parser.add_argument('--manter', metavar='PASTA', help="guarda os relatórios de cada motor nesta pasta")
+    args = parser.parse_args()
+
+    entradas = [(os.path.basename(args.binance), args.binance, args.bt)]
+    if args.linhas:
+        mistura = ler_mistura(args.mistura) if args.mistura else None
+        entradas = [(str(n), *preparar_dados(n, args.pasta, mistura, args.semente)) for n in args.linhas]
+
+    aceite = True
+    for nome, binance, bt in entradas:
+        if not os.path.exists(binance):
+            print(f"Erro: Arquivo {binance} não encontrado.")
+            raise SystemExit(2)
+        print(f"=== {nome}")
+        resultado = correr_par((args.motor_a, args.motor_b), (args.args_a.split(), args.args_b.split()), binance, bt,
+                               args.limite, args.tolerancia, args.tolerancia_agregada,
+                               os.path.join(args.manter, nome) if args.manter else None)
+        if resultado is None:
+            aceite = False
+            continue
+        print(resultado.resumo())
+        if args.saida:
+            resultado.gravar(os.path.join(args.saida, nome))
+        aceite = aceite and resultado.aceite
+    sys.exit(0 if aceite else 1)
@@ -1,17 +1,10 @@
 import pandas as pd
-import re
 import os
+from motor_fifo.correspondencia import IndiceRetiradas
+from motor_fifo.inventario import Inventario, Lote
+from motor_fifo.valores import parse_coluna
 
-def clean_val(val_str):
-    if pd.isna(val_str): return 0.0
-    if isinstance(val_str, (float, int)): return float(val_str)
-    s = re.sub(r'[^0-9,\.-]', '', str(val_str))
-    if ',' in s and '.' in s: s = s.replace('.', '').replace(',', '.')
-    elif ',' in s: s = s.replace(',', '.')
-    try: return float(s)
-    except: return 0.0
-
-def processar_sistema_completo():
+def processar_sistema_completo(cache=None):
     # Arquivos de entrada
     binance_input = 'Binance_Novembro2019-Dezembro2025.csv'
     bt_input = 'Relatorio_FIFO_Completo_Contraparte.csv'
@@ -26,21 +19,29 @@ def processar_sistema_completo():
         print(f"Erro: Arquivo {binance_input} não encontrado.")
         return
 
-    df_bin = pd.read_csv(binance_input)
-    df_bin['UTC_Time'] = pd.to_datetime(df_bin['UTC_Time'])
-    df_bin['Val_Numeric'] = df_bin['Change'].apply(clean_val)
-    df_bin['Time_Group'] = df_bin['UTC_Time'].dt.round('5s')
-    df_bin = df_bin.sort_values('UTC_Time')
+    if cache:
+        # Ledger já normalizado e ordenado (motor_fifo.cache), valores em float
+        from motor_fifo.cache import abrir_ledger
+        df_bin = abrir_ledger(binance_input, None if cache is True else cache).dataframe(
+            '5s', valores='float', coluna='Val_Numeric')
+    else:
+        df_bin = pd.read_csv(binance_input)
+        df_bin['UTC_Time'] = pd.to_datetime(df_bin['UTC_Time'])
+        df_bin['Val_Numeric'] = parse_coluna(df_bin['Change'], tipo='float')
+        df_bin['Time_Group'] = df_bin['UTC_Time'].dt.round('5s')
+        df_bin = df_bin.sort_values('UTC_Time')
 
     bt_retiradas = []
+    indice_bt = None
     if os.path.exists(bt_input):
         df_bt = pd.read_csv(bt_input, sep=';', decimal=',')
         # Filtramos o que saiu da BitcoinTrade para casar com o que entrou na Binance
         bt_retiradas = df_bt[df_bt['operação'].str.contains('Retirada|Withdraw', na=False)].copy()
-        bt_retiradas['quantidade'] = bt_retiradas['quantidade'].apply(lambda x: abs(float(str(x).replace(',','.'))))
+        bt_retiradas['quantidade'] = parse_coluna(bt_retiradas['quantidade'], tipo='float').abs()
+        indice_bt = IndiceRetiradas.de_dataframe(bt_retiradas, 'quantidade')
 
     # 2. PROCESSAMENTO DE INVENTÁRIO E VENDAS
-    inventory = {}
+    inventory = Inventario()
     report_irs = []
     report_swaps = []
     report_transf = []
@@ -66,16 +67,13 @@ def processar_sistema_completo():
 
             if ent['Operation'] == 'Deposit':
                 # Busca na BT uma retirada da mesma moeda e valor similar (erro de 1% para taxas)
-                match = bt_retiradas[(bt_retiradas['Moeda'] == m) & 
-                                     (bt_retiradas['quantidade'] >= qtd * 0.99) & 
-                                     (bt_retiradas['quantidade'] <= qtd * 1.01)].head(1)
+                match = indice_bt.casar(m, qtd, tolerancia_rel=0.01) if indice_bt else None
                 
-                if not match.empty:
-                    custo_herdado = float(match['Valor (Custo FIFO)'].iloc[0])
-                    data_origem = match['Data'].iloc[0]
+                if match is not None:
+                    # casar() já marca a retirada como consumida, para não casar duas vezes
+                    custo_herdado = float(bt_retiradas.at[match, 'Valor (Custo FIFO)'])
+                    data_origem = bt_retiradas.at[match, 'Data']
                     status_match = f"MATCH: Vindo de BitcoinTrade ({data_origem})"
-                    # Removemos para não casar duas vezes
-                    bt_retiradas = bt_retiradas.drop(match.index[0])
                 else:
                     status_match = "DEPÓSITO SEM ORIGEM (Verificar)"
 
@@ -84,8 +82,7 @@ def processar_sistema_completo():
                     'Tipo': 'ENTRADA', 'Status': status_match
                 })
 
-            if m not in inventory: inventory[m] = []
-            inventory[m].append({'qty': qtd, 'cost': custo_herdado, 'date': data_origem})
+            inventory.fila(m).adicionar(Lote(qtd, custo_herdado, data_origem))
 
         # B) PROCESSAMENTO DE SAÍDAS (Vendas ou Swaps)
         for _, s in saidas.iterrows():
@@ -96,28 +93,28 @@ def processar_sistema_completo():
             # Se for retirada para fora da Binance
             if s['Operation'] in ['Withdraw', 'Withdrawal']:
                 report_transf.append({'Data': data_s, 'Moeda': m_sai, 'Qtd': qtd_sai, 'Tipo': 'SAÍDA', 'Status': 'Para Carteira Externa'})
-                if m_sai in inventory and inventory[m_sai]: inventory[m_sai].pop(0)
+                if inventory.get(m_sai): inventory[m_sai].retirar()
                 continue
 
             fiat_entry = entradas[entradas['Coin'].isin(FIAT)]
             if not fiat_entry.empty:
                 # VENDA TRIBUTÁVEL (IRS)
                 valor_fiat = abs(fiat_entry['Val_Numeric'].sum())
-                if m_sai in inventory and inventory[m_sai]:
-                    lote = inventory[m_sai].pop(0)
+                if inventory.get(m_sai):
+                    lote = inventory[m_sai].retirar()
                     report_irs.append({
                         'Data_Venda': data_s, 'Moeda': m_sai, 'Quantidade': qtd_sai,
-                        'Data_Aquisição': lote['date'], 'Custo_Aquisição': lote['cost'],
-                        'Valor_Venda': valor_fiat, 'Resultado': valor_fiat - lote['cost']
+                        'Data_Aquisição': lote.date, 'Custo_Aquisição': lote.cost,
+                        'Valor_Venda': valor_fiat, 'Resultado': valor_fiat - lote.cost
                     })
             else:
                 # SWAP (Permuta Isenta)
                 for _, e in entradas.iterrows():
-                    if m_sai in inventory and inventory[m_sai]:
-                        lote_v = inventory[m_sai].pop(0)
+                    if inventory.get(m_sai):
+                        lote_v = inventory[m_sai].retirar()
                         report_swaps.append({
                             'Data': data_s, 'Saiu': m_sai, 'Entrou': e['Coin'],
-                            'Custo_Transferido': lote_v['cost'], 'Data_Original': lote_v['date']
+                            'Custo_Transferido': lote_v.cost, 'Data_Original': lote_v.date
                         })
 
     # Gerar os 3 arquivos
@@ -131,4 +128,9 @@ def processar_sistema_completo():
     print(f"- {len(report_transf)} transferências reconciliadas.")
 
 if __name__ == "__main__":
-    processar_sistema_completo()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Motor de correspondência Binance x BitcoinTrade (v2)")
+    parser.add_argument('--cache', nargs='?', const=True, metavar='PASTA',
+                        help="lê o ledger do cache normalizado (criado na primeira vez; por omissão .cache_ledger/)")
+    args = parser.parse_args()
+    processar_sistema_completo(cache=args.cache)
\ No newline at end of file
@@ -0,0 +1 @@
+# Componentes partilhados pelos motores FIFO (Binance / BitcoinTrade)
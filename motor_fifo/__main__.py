@@ -0,0 +1,3 @@
+from motor_fifo.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,52 @@
+import importlib
+from typing import NamedTuple, Optional
+
+# Esquema comum dos exports das corretoras (motor_fifo.unificado).
+#
+# Cada adaptador lê o export de uma corretora e gera Operacoes por ordem cronológica:
+# uma operação consolidada (as linhas do mesmo instante que formam uma troca, venda,
+# depósito...) com as suas pernas. O motor unificado funde os fluxos pela chave
+# e aplica as regras do v4 sobre as pernas, sem saber de que corretora vieram.
+#
+# Tipos de perna:
+#   deposito      entrada vinda de fora da corretora (pode casar com um levantamento)
+#   levantamento  saída para fora da corretora
+#   taxa          ignorada no FIFO, como no v4
+#   troca         perna de uma compra, venda ou swap
+#   rendimento    Earn / juros / cashback
+
+
+class Perna(NamedTuple):
+    moeda: str
+    qtd: object                     # Decimal com sinal: > 0 entra, < 0 sai
+    tipo: str
+    custo: Optional[object] = None  # custo já conhecido (compra BT, custo FIFO da retirada BT)
+    data_custo: Optional[str] = None
+
+
+class Operacao(NamedTuple):
+    chave: int                      # instante em ns desde a época: a ordem da fusão
+    corretora: str
+    data: str
+    hora: str
+    pernas: tuple
+
+
+# corretora -> módulo com operacoes(caminho, **opcoes); importado só quando usado
+ADAPTADORES = {
+    'binance': 'motor_fifo.adaptadores.binance',
+    'bitcointrade': 'motor_fifo.adaptadores.bitcointrade',
+    'nexo': 'motor_fifo.adaptadores.nexo',
+}
+
+
+def operacoes(corretora, caminho, **opcoes):
+    """Operações do export `caminho` da corretora, por ordem cronológica."""
+    if corretora not in ADAPTADORES:
+        raise ValueError(f"Corretora desconhecida: {corretora} (válidas: {', '.join(ADAPTADORES)})")
+    return importlib.import_module(ADAPTADORES[corretora]).operacoes(caminho, **opcoes)
+
+
+def chaves_ns(tempos):
+    """Série datetime64 -> lista de int (ns), a chave da fusão."""
+    return tempos.to_numpy(dtype='datetime64[ns]').astype('int64').tolist()
@@ -0,0 +1,40 @@
+from motor_fifo.adaptadores import Operacao, Perna
+from motor_fifo.colunar import OPS_DEPOSITO, OPS_LEVANTAMENTO, carregar_ledger
+
+# Export Binance (UTC_Time, Operation, Coin, Change): os grupos são os Time_Group do
+# motor colunar (dt.round de 2s, ou um AgrupamentoLacuna em `janela`), por isso as
+# regras do v4 continuam a valer por grupo.
+
+CORRETORA = 'Binance'
+
+
+def _tipo(op):
+    if op in OPS_DEPOSITO:
+        return 'deposito'
+    if op in OPS_LEVANTAMENTO:
+        return 'levantamento'
+    if 'Fee' in op:
+        return 'taxa'
+    return 'troca'
+
+
+def operacoes(caminho, janela='2s', bloco=None):
+    """bloco: lê o export em blocos de N linhas (motor_fifo.fluxo) em vez de todo de uma vez."""
+    if bloco:
+        from motor_fifo.fluxo import ledgers_em_blocos
+        ledgers = ledgers_em_blocos(caminho, bloco, janela)
+    else:
+        ledgers = [carregar_ledger(caminho, janela)]
+
+    tipos = {}
+    for ledger in ledgers:
+        coin, op, val, inicios = ledger.coin, ledger.op, ledger.val, ledger.inicios
+        chaves = ledger.chaves.astype('int64').tolist()
+        for g in range(ledger.n_grupos):
+            pernas = []
+            for i in range(inicios[g], inicios[g + 1]):
+                t = tipos.get(op[i])
+                if t is None:
+                    t = tipos[op[i]] = _tipo(op[i])
+                pernas.append(Perna(coin[i], val[i], t))
+            yield Operacao(chaves[g], CORRETORA, ledger.data_s[g], ledger.hora_s[g], tuple(pernas))
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from motor_fifo.adaptadores import Operacao, Perna, chaves_ns
+from motor_fifo.valores import parse_coluna
+
+# Relatório do motor BT (Relatorio_FIFO_Completo_Contraparte.csv, ';' e vírgula
+# decimal), com as colunas descritas em "Logico motor BT.md":
+#   operação;Data;hora;Moeda;quantidade;Valor (Custo FIFO);Ativo_Contraparte;
+#   Valor_Recebido_Contraparte;Fees
+# Cada linha já é uma operação consolidada pelo motor BT, por isso não se agrupa por
+# instante (duas vendas no mesmo segundo somariam o fiat recebido uma à outra).
+#
+#   Compra                          entrada com o custo pago
+#   Venda                           saída + entrada da contraparte (fiat: venda; cripto: swap)
+#   Retirada para carteira externa  levantamento com o custo FIFO já calculado pelo motor BT
+#   Depósito Cripto                 depósito (custo zero se não casar com outra corretora)
+#   Entrada Fiat                    ignorada (fiat não entra no inventário)
+
+CORRETORA = 'BitcoinTrade'
+
+# A BT usa nomes por extenso; o inventário global usa os tickers da Binance
+NOMES = {
+    'Bitcoin': 'BTC', 'Ethereum': 'ETH', 'Litecoin': 'LTC', 'Bitcoin Cash': 'BCH',
+    'XRP': 'XRP', 'Ripple': 'XRP', 'USD Coin': 'USDC', 'cReal': 'CREAL', 'Real': 'BRL',
+}
+
+
+def _coluna(df, nome, padrao=''):
+    return df[nome].tolist() if nome in df.columns else [padrao] * len(df)
+
+
+def operacoes(caminho, nomes=None):
+    nomes = NOMES if nomes is None else nomes
+    df = pd.read_csv(caminho, sep=';', decimal=',')
+    horas = df['hora'].fillna('00:00:00').astype(str) if 'hora' in df.columns else '00:00:00'
+    df['Timestamp'] = pd.to_datetime(df['Data'].astype(str) + ' ' + horas, errors='coerce')
+    df = df[df['Timestamp'].notna()].sort_values('Timestamp', kind='stable')
+
+    ops = df['operação'].fillna('').astype(str).tolist()
+    moedas = [nomes.get(m, m) for m in df['Moeda'].astype(str).tolist()]
+    qtds = parse_coluna(df['quantidade']).tolist()
+    custos = parse_coluna(df['Valor (Custo FIFO)']).tolist()
+    contrapartes = [nomes.get(m, m) for m in _coluna(df, 'Ativo_Contraparte')]
+    recebidos = parse_coluna(pd.Series(_coluna(df, 'Valor_Recebido_Contraparte', None))).tolist()
+    chaves = chaves_ns(df['Timestamp'])
+    datas = df['Timestamp'].dt.strftime('%Y-%m-%d').tolist()
+    horas = df['Timestamp'].dt.strftime('%H:%M:%S').tolist()
+
+    for k, op in enumerate(ops):
+        o = op.lower()
+        m, q = moedas[k], abs(qtds[k])
+        if 'retirada' in o or 'withdraw' in o:
+            pernas = (Perna(m, -q, 'levantamento', custos[k], datas[k]),)
+        elif 'depósito' in o or 'deposito' in o or 'deposit' in o:
+            pernas = (Perna(m, q, 'deposito'),)
+        elif 'compra' in o:
+            pernas = (Perna(m, q, 'troca', custos[k]),)
+        elif 'venda' in o:
+            pernas = (Perna(m, -q, 'troca'), Perna(contrapartes[k], abs(recebidos[k]), 'troca'))
+        else:
+            # Entrada Fiat e operações sem efeito no inventário
+            continue
+        yield Operacao(chaves[k], CORRETORA, datas[k], horas[k], pernas)
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from motor_fifo.adaptadores import Operacao, Perna, chaves_ns
+from motor_fifo.valores import parse_coluna
+
+# Export de transações da Nexo (formato com Input/Output):
+#   Transaction,Type,Input Currency,Input Amount,Output Currency,Output Amount,
+#   USD Equivalent,Fee,Fee Currency,Details,Date / Time (UTC)
+# Uma linha por operação; numa Exchange o Input é o que sai e o Output o que entra.
+# Vem do mais recente para o mais antigo: é reordenado por data.
+
+CORRETORA = 'Nexo'
+
+TIPOS = {
+    'Deposit': 'deposito',
+    'Top up Crypto': 'deposito',
+    'Withdrawal': 'levantamento',
+    'Interest': 'rendimento',
+    'Fixed Term Interest': 'rendimento',
+    'Cashback': 'rendimento',
+    'Exchange Cashback': 'rendimento',
+    'Referral Bonus': 'rendimento',
+    'Dividend': 'rendimento',
+    'Exchange': 'troca',
+}
+# Movimentos entre carteiras da própria Nexo (Savings/Credit Line/Term): não mexem no FIFO
+IGNORADOS = {
+    'Locking Term Deposit', 'Unlocking Term Deposit', 'Transfer In', 'Transfer Out',
+    'Deposit To Exchange', 'Exchange To Withdraw', 'Transfer To Pro Wallet', 'Transfer From Pro Wallet',
+}
+# Tickers internos da Nexo -> tickers do inventário
+MOEDAS = {'NEXONEXO': 'NEXO', 'NEXOBEP2': 'NEXO', 'NEXOBNB': 'BNB', 'EURX': 'EUR', 'USDX': 'USD', 'GBPX': 'GBP'}
+COLUNAS = ('Type', 'Input Currency', 'Input Amount', 'Output Currency', 'Output Amount')
+
+
+def operacoes(caminho, moedas=None):
+    moedas = MOEDAS if moedas is None else moedas
+    df = pd.read_csv(caminho)
+    faltam = [c for c in COLUNAS if c not in df.columns]
+    if faltam:
+        raise ValueError(f"{caminho}: export Nexo sem as colunas {', '.join(faltam)} "
+                         "(só o formato com Input/Output é suportado)")
+    col_data = 'Date / Time (UTC)' if 'Date / Time (UTC)' in df.columns else 'Date / Time'
+    df['Timestamp'] = pd.to_datetime(df[col_data], errors='coerce')
+    df = df[df['Timestamp'].notna()]
+    if 'Details' in df.columns:
+        # Pedidos rejeitados ou pendentes não chegaram a movimentar saldo
+        estado = df['Details'].fillna('').astype(str).str.lower()
+        df = df[~estado.str.startswith(('rejected', 'pending'))]
+    df = df.sort_values('Timestamp', kind='stable')
+
+    tipos = df['Type'].astype(str).tolist()
+    entra_m = [moedas.get(m, m) for m in df['Output Currency'].astype(str).tolist()]
+    sai_m = [moedas.get(m, m) for m in df['Input Currency'].astype(str).tolist()]
+    entra_q = parse_coluna(df['Output Amount']).tolist()
+    sai_q = parse_coluna(df['Input Amount']).tolist()
+    chaves = chaves_ns(df['Timestamp'])
+    datas = df['Timestamp'].dt.strftime('%Y-%m-%d').tolist()
+    horas = df['Timestamp'].dt.strftime('%H:%M:%S').tolist()
+
+    desconhecidos = {}
+    for k, tipo_nexo in enumerate(tipos):
+        tipo = TIPOS.get(tipo_nexo)
+        if tipo is None:
+            if tipo_nexo not in IGNORADOS:
+                desconhecidos[tipo_nexo] = desconhecidos.get(tipo_nexo, 0) + 1
+            continue
+        if tipo == 'troca':
+            pernas = (Perna(sai_m[k], -abs(sai_q[k]), tipo), Perna(entra_m[k], abs(entra_q[k]), tipo))
+        elif tipo == 'levantamento':
+            pernas = (Perna(sai_m[k], -abs(sai_q[k]), tipo),)
+        else:
+            pernas = (Perna(entra_m[k], abs(entra_q[k]), tipo),)
+        yield Operacao(chaves[k], CORRETORA, datas[k], horas[k], pernas)
+
+    for tipo_nexo, n in sorted(desconhecidos.items()):
+        print(f"Aviso: Nexo: {n} linha(s) do tipo '{tipo_nexo}' ignoradas.")
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+# Agrupamento das linhas do export em operações (os "grupos" do motor).
+#
+# O v4 usa dt.round('2s'): baldes fixos no relógio. Duas pernas do mesmo trade a
+# 0,4s uma da outra caem em grupos diferentes se o limite de um balde passar entre
+# elas, e alargar a janela para o evitar só faz grupos maiores.
+#
+# AgrupamentoLacuna percorre as linhas por ordem de UTC_Time e abre um grupo novo
+# quando a distância à linha anterior passa de `lacuna`: linhas encadeadas a menos
+# de `lacuna` ficam sempre juntas, seja qual for o relógio. Com por_operacao a
+# lacuna conta só entre linhas da mesma classe de operação (ver CLASSES), e um
+# depósito nunca entra no grupo de um trade que calhe no mesmo segundo.
+#
+# A chave de cada grupo é o instante da sua primeira linha; os grupos seguem a
+# ordem dessa primeira linha.
+
+# Classes de operação para por_operacao; as restantes contam como negociação
+CLASSES = {
+    'Deposit': 'transferencia', 'Fiat Deposit': 'transferencia',
+    'Withdraw': 'transferencia', 'Withdrawal': 'transferencia',
+    'Simple Earn Flexible Interest': 'rendimento', 'Simple Earn Locked Rewards': 'rendimento',
+    'Staking Rewards': 'rendimento', 'Savings Interest': 'rendimento', 'Distribution': 'rendimento',
+    'Airdrop Assets': 'rendimento', 'Commission Rebate': 'rendimento', 'Cashback Voucher': 'rendimento',
+}
+NEGOCIACAO = 'negociacao'
+
+
+class AgrupamentoLacuna:
+    """Grupos por lacuna máxima entre linhas consecutivas (ver o topo do módulo).
+
+    Usa-se onde o motor aceita `janela` (carregar_ledger, modo fluxo, adaptador
+    Binance) em vez do texto de dt.round.
+    """
+
+    __slots__ = ('lacuna', 'por_operacao', 'classes', '_ns')
+
+    def __init__(self, lacuna='2s', por_operacao=False, classes=None):
+        self.lacuna = lacuna
+        self.por_operacao = por_operacao
+        self.classes = CLASSES if classes is None else classes
+        self._ns = pd.Timedelta(lacuna).value
+
+    def __repr__(self):
+        return f"AgrupamentoLacuna({self.lacuna!r}{', por_operacao=True' if self.por_operacao else ''})"
+
+    def _classes(self, ops):
+        codigos, nomes = pd.factorize(pd.Series(ops, dtype=object).map(self.classes).fillna(NEGOCIACAO))
+        return codigos
+
+    def agrupar(self, ns, ops=None):
+        """ns: instantes em ns já ordenados (sem NaT); ops: Operation de cada linha.
+
+        Devolve (ordem, inicios): ordem é a permutação estável que deixa cada grupo
+        contíguo (None quando as linhas já estão assim) e o grupo g ocupa
+        inicios[g]:inicios[g+1] depois de a aplicar.
+        """
+        ns = np.asarray(ns, dtype=np.int64)
+        n = len(ns)
+        if n == 0:
+            return None, np.array([0])
+        if not self.por_operacao:
+            # Uma passagem: grupo novo onde a distância à linha anterior passa da lacuna
+            novo = np.empty(n, dtype=bool)
+            novo[0] = True
+            np.greater(np.diff(ns), self._ns, out=novo[1:])
+            return None, np.append(np.flatnonzero(novo), n)
+
+        # Mesma passagem dentro de cada classe (a ordenação estável mantém o tempo)
+        classes = self._classes(ops)
+        por_classe = np.argsort(classes, kind='stable')
+        c = classes[por_classe]
+        t = ns[por_classe]
+        novo = np.empty(n, dtype=bool)
+        novo[0] = True
+        novo[1:] = (c[1:] != c[:-1]) | (np.diff(t) > self._ns)
+        grupo = np.empty(n, dtype=np.int64)
+        grupo[por_classe] = np.cumsum(novo) - 1
+        # Os grupos passam à ordem da sua primeira linha
+        primeira = por_classe[novo]
+        posto = np.empty(len(primeira), dtype=np.int64)
+        posto[np.argsort(primeira, kind='stable')] = np.arange(len(primeira))
+        grupo = posto[grupo]
+        ordem = np.argsort(grupo, kind='stable')
+        inicios = np.searchsorted(grupo[ordem], np.arange(len(primeira) + 1))
+        if (ordem == np.arange(n)).all():
+            ordem = None
+        return ordem, inicios
+
+    def em_aberto(self, ns, ops=None):
+        """Linhas que ainda não podem seguir para o motor no modo fluxo: as dos grupos a
+        menos de `lacuna` do fim do bloco (podem crescer com o bloco seguinte) e as de
+        todos os grupos que começam depois do primeiro desses, pela ordem de entrada."""
+        ordem, inicios = self.agrupar(ns, ops)
+        ns = np.asarray(ns, dtype=np.int64)
+        aberto = np.zeros(len(ns), dtype=bool)
+        if not len(ns):
+            return aberto
+        ordenado = ns if ordem is None else ns[ordem]
+        ultimo = np.maximum.reduceat(ordenado, inicios[:-1])
+        k = int(np.argmax(ns[-1] - ultimo <= self._ns))
+        aberto[inicios[k]:] = True
+        if ordem is None:
+            return aberto
+        por_linha = np.empty_like(aberto)
+        por_linha[ordem] = aberto
+        return por_linha
+
+    def chaves(self, ns, ops=None):
+        """Chave (ns da primeira linha do grupo) de cada linha, pela ordem de entrada."""
+        ordem, inicios = self.agrupar(ns, ops)
+        ns = np.asarray(ns, dtype=np.int64)
+        ordenado = ns if ordem is None else ns[ordem]
+        por_linha = np.repeat(ordenado[inicios[:-1]], np.diff(inicios))
+        if ordem is None:
+            return por_linha
+        chaves = np.empty_like(por_linha)
+        chaves[ordem] = por_linha
+        return chaves
+
+
+def chaves_por_linha(utc, ops, janela):
+    """Time_Group de cada linha (Series alinhada com utc): dt.round(janela) para um texto,
+    o início do grupo para AgrupamentoLacuna. NaT fica NaT."""
+    if not isinstance(janela, AgrupamentoLacuna):
+        return utc.dt.round(janela)
+    validos = utc.notna().to_numpy()
+    ns = utc[validos].to_numpy(dtype='datetime64[ns]').view('int64')
+    ordem = np.argsort(ns, kind='stable')
+    chaves = np.empty(len(ns), dtype=np.int64)
+    chaves[ordem] = janela.chaves(ns[ordem], np.asarray(ops, dtype=object)[validos][ordem])
+    todas = np.full(len(utc), np.iinfo(np.int64).min, dtype=np.int64)
+    todas[validos] = chaves
+    return pd.Series(todas.view('datetime64[ns]'), index=utc.index)
+
+
+def _grupos(ns, ops, janela):
+    # (ordem, inicios) para as linhas ordenadas, em qualquer dos dois modos
+    if isinstance(janela, AgrupamentoLacuna):
+        return janela.agrupar(ns, ops)
+    tg = pd.Series(ns.view('datetime64[ns]')).dt.round(janela).to_numpy().view('int64')
+    return None, np.append(np.flatnonzero(np.r_[True, tg[1:] != tg[:-1]]), len(tg))
+
+
+def estatisticas(utc, ops, janelas):
+    """Compara agrupamentos sobre o mesmo ledger, para afinar a janela/lacuna.
+
+    utc, ops: colunas UTC_Time e Operation. janelas: textos de dt.round ('2s') e/ou
+    AgrupamentoLacuna. Por cada um: nº de grupos, linhas por grupo (média, p95,
+    máximo), duração máxima de um grupo e linhas separadas da linha anterior (da
+    mesma classe) por menos de 1s mas postas noutro grupo — pernas partidas por
+    um limite de balde.
+    """
+    utc = pd.to_datetime(pd.Series(utc)).reset_index(drop=True)
+    validos = utc.notna().to_numpy()
+    ordem0 = np.argsort(utc[validos].to_numpy(dtype='datetime64[ns]').view('int64'), kind='stable')
+    ns = utc[validos].to_numpy(dtype='datetime64[ns]').view('int64')[ordem0]
+    ops = np.asarray(pd.Series(ops, dtype=object).reset_index(drop=True)[validos], dtype=object)[ordem0]
+    classes = AgrupamentoLacuna(por_operacao=True)._classes(ops)
+    # Linha anterior da mesma classe a menos de 1s
+    por_classe = np.argsort(classes, kind='stable')
+    t, c = ns[por_classe], classes[por_classe]
+    perto = np.zeros(len(ns), dtype=bool)
+    perto[por_classe[1:]] = (c[1:] == c[:-1]) & (np.diff(t) < 10 ** 9)
+    anterior = np.full(len(ns), -1, dtype=np.int64)
+    anterior[por_classe[1:]] = por_classe[:-1]
+
+    linhas = []
+    for janela in janelas:
+        ordem, inicios = _grupos(ns, ops, janela)
+        tamanhos = np.diff(inicios)
+        t_ord = ns if ordem is None else ns[ordem]
+        duracao = (np.maximum.reduceat(t_ord, inicios[:-1]) - t_ord[inicios[:-1]]) if len(t_ord) else np.zeros(0)
+        grupo = np.empty(len(ns), dtype=np.int64)
+        grupo[np.arange(len(ns)) if ordem is None else ordem] = np.repeat(np.arange(len(tamanhos)), tamanhos)
+        partidas = int((perto & (grupo != grupo[anterior])).sum())
+        linhas.append((
+            str(janela) if isinstance(janela, AgrupamentoLacuna) else f"round('{janela}')",
+            len(tamanhos),
+            round(float(tamanhos.mean()), 3) if len(tamanhos) else 0.0,
+            int(np.percentile(tamanhos, 95, method='higher')) if len(tamanhos) else 0,
+            int(tamanhos.max()) if len(tamanhos) else 0,
+            round(float(duracao.max()) / 1e9, 3) if len(duracao) else 0.0,
+            partidas,
+        ))
+    return pd.DataFrame(linhas, columns=['Agrupamento', 'Grupos', 'Linhas_Media', 'Linhas_P95', 'Linhas_Max',
+                                         'Duracao_Max_s', 'Pernas_Partidas'])
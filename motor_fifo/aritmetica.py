@@ -0,0 +1,183 @@
+"""Backends numéricos do motor colunar.
+
+AritmeticaDecimal reproduz o v4 (Decimal com prec=60). AritmeticaPontoFixo trabalha só
+com inteiros Python:
+
+- quantidades em unidades de 10**-casas da moeda (8 por omissão, tipo satoshi;
+  configurável por moeda em casas_por_ativo)
+- custos e receitas em unidades de 10**-casas_custo da moeda fiat (8 por omissão,
+  ou seja "cêntimos escalados" por 10**6)
+
+Regras de arredondamento (todas ROUND_HALF_EVEN, o mesmo do round() sobre Decimal):
+1. Leitura: células com mais casas que a moeda admite são arredondadas a `casas`.
+2. Custo proporcional de um lote parcial: cost * vender / qty arredondado à unidade
+   de custo; o resto fica no lote, e quem consome o lote inteiro leva o custo que
+   sobra, por isso a soma dos custos consumidos é sempre igual ao custo original.
+3. Receita proporcional: total_fiat * vender / qtd_sai arredondado à unidade de custo.
+4. Relatórios: arredondamento a cêntimos só no fim, como o round(x, 2) do v4.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+
+
+def div_meio_par(a, b):
+    """a / b arredondado ao inteiro mais próximo, empates para o par (b > 0)."""
+    q, r = divmod(a, b)
+    dobro = 2 * r
+    if dobro > b or (dobro == b and q & 1):
+        q += 1
+    return q
+
+
+def _escalar_decimal(d, casas):
+    return int(Decimal(d).scaleb(casas).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+class AritmeticaDecimal:
+    nome = 'decimal'
+    zero = Decimal('0')
+
+    def descricao(self):
+        return {'nome': self.nome}
+
+    def parse(self, col, moedas=None):
+        from motor_fifo.valores import parse_coluna
+        return parse_coluna(col)
+
+    def qtd_de_decimal(self, d, moeda):
+        return d
+
+    def custo_de_decimal(self, d):
+        return d
+
+    def custo(self, cost, qty, vender):
+        return (cost / qty) * vender if qty > 0 else self.zero
+
+    def receita(self, total_fiat, moeda_fiat, vender, qtd_sai):
+        return total_fiat * (vender / qtd_sai)
+
+    def dinheiro(self, x):
+        return float(round(x, 2))
+
+    def qtd_float(self, x, moeda):
+        return float(x)
+
+    def custo_float(self, x):
+        return float(x)
+
+    def de_texto(self, s):
+        return Decimal(s)
+
+    def __reduce__(self):
+        # Singleton: nos processos do pool continua a ser DECIMAL (o motor testa `is DECIMAL`)
+        return 'DECIMAL'
+
+
+class AritmeticaPontoFixo:
+    nome = 'ponto_fixo'
+    zero = 0
+
+    def __init__(self, casas=8, casas_por_ativo=None, casas_custo=8):
+        if casas_custo < 2:
+            raise ValueError("casas_custo tem de ser >= 2 (cêntimos)")
+        self.casas = casas
+        self.casas_por_ativo = dict(casas_por_ativo or {})
+        self.casas_custo = casas_custo
+        self._cent = 10 ** (casas_custo - 2)
+        self._div_custo = 10 ** casas_custo
+
+    def descricao(self):
+        return {'nome': self.nome, 'casas': self.casas, 'casas_por_ativo': self.casas_por_ativo,
+                'casas_custo': self.casas_custo}
+
+    def casas_de(self, moeda):
+        return self.casas_por_ativo.get(moeda, self.casas)
+
+    def parse(self, col, moedas=None):
+        import numpy as np
+        import pandas as pd
+        from motor_fifo.valores import parse_coluna
+
+        maximo = max([self.casas, *self.casas_por_ativo.values()])
+        v = parse_coluna(col, 'escalado', casas=maximo)
+        if moedas is None or maximo == self.casas and not self.casas_por_ativo:
+            return v
+        # Moedas com menos casas que o máximo: reescalar (regra 1)
+        casas = pd.Series(moedas, index=v.index).map(self.casas_por_ativo).fillna(self.casas)
+        divisor = 10 ** (maximo - casas.astype('int64'))
+        reescalar = (divisor > 1).to_numpy()
+        if reescalar.any():
+            v = v.astype(object)
+            for i in np.flatnonzero(reescalar):
+                v.iat[i] = div_meio_par(int(v.iat[i]), int(divisor.iat[i]))
+        return v
+
+    def qtd_de_decimal(self, d, moeda):
+        return _escalar_decimal(d, self.casas_de(moeda))
+
+    def custo_de_decimal(self, d):
+        return _escalar_decimal(d, self.casas_custo)
+
+    def custo(self, cost, qty, vender):
+        return div_meio_par(cost * vender, qty) if qty > 0 else 0
+
+    def receita(self, total_fiat, moeda_fiat, vender, qtd_sai):
+        # total_fiat vem em unidades da moeda fiat; passa para unidades de custo
+        dif = self.casas_custo - self.casas_de(moeda_fiat)
+        total = total_fiat * 10 ** dif if dif >= 0 else div_meio_par(total_fiat, 10 ** -dif)
+        return div_meio_par(total * vender, qtd_sai)
+
+    def dinheiro(self, x):
+        return div_meio_par(int(x), self._cent) / 100
+
+    def qtd_float(self, x, moeda):
+        return int(x) / 10 ** self.casas_de(moeda)
+
+    def custo_float(self, x):
+        return x / self._div_custo
+
+    def de_texto(self, s):
+        return int(s)
+
+
+DECIMAL = AritmeticaDecimal()
+
+
+def de_descricao(descricao):
+    """Backend a partir do descricao() gravado num snapshot ou diário de lotes."""
+    if descricao.get('nome') == DECIMAL.nome:
+        return DECIMAL
+    if descricao.get('nome') == AritmeticaPontoFixo.nome:
+        return AritmeticaPontoFixo(descricao['casas'], descricao['casas_por_ativo'], descricao['casas_custo'])
+    raise ValueError(f"Aritmética desconhecida: {descricao}")
+
+
+def comparar_com_decimal(binance_input, bt_input, aritmetica=None):
+    """Teste diferencial: totais IRS do backend de ponto fixo vs Decimal, ao cêntimo.
+
+    Compara, por ano e no total, Valor_Venda, Custo_Aquisicao_USD e Resultado.
+    Devolve True se todos os totais coincidem ao cêntimo.
+    """
+    import pandas as pd
+    from motor_fifo.colunar import carregar_ledger, carregar_retiradas_bt, processar_eventos, COLS_IRS
+    from motor_fifo.relatorios import centimos
+
+    aritmetica = aritmetica or AritmeticaPontoFixo()
+    totais = {}
+    for nome, arit in (('decimal', DECIMAL), ('ponto_fixo', aritmetica)):
+        ledger = carregar_ledger(binance_input, aritmetica=arit)
+        irs, _, _ = processar_eventos(ledger, carregar_retiradas_bt(bt_input, arit), aritmetica=arit)
+        df = pd.DataFrame(irs, columns=COLS_IRS)
+        df['Ano'] = df['Data_Venda'].str[:4]
+        # Soma exata dos valores já arredondados a cêntimos
+        cent = centimos(df)
+        cent['Ano'] = df['Ano']
+        por_ano = cent.groupby('Ano').sum()
+        por_ano.loc['TOTAL'] = por_ano.sum()
+        totais[nome] = por_ano
+
+    dif = (totais['ponto_fixo'] - totais['decimal']).fillna(0)
+    ok = bool((dif == 0).all().all())
+    print("Diferenças em cêntimos (ponto fixo - decimal):")
+    print(dif.to_string())
+    print(f"Comparação ponto fixo vs decimal: {'OK' if ok else 'DIFERENTE'}")
+    return ok
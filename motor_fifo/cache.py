@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from motor_fifo.valores import parse_coluna
+
+# Cache do export Binance já normalizado. A primeira leitura de um ficheiro faz o que
+# todos os motores faziam em cada corrida (read_csv, to_datetime, limpeza do Change,
+# sort_values('UTC_Time')) e grava o resultado em arrays .npy:
+#
+#     <pasta>/<hash do conteúdo>-p<VERSAO_PARSER>/
+#         meta.json      nº de linhas, moedas e operações (os códigos apontam para aqui)
+#         utc.npy        UTC_Time em ns, já pela ordem do sort_values do v4
+#         moeda.npy      código da moeda (int32; -1 = vazio)
+#         operacao.npy   código da operação
+#         valor.npy      str() do Decimal de cada Change (exato, incluindo o expoente)
+#         valor_f8.npy   o mesmo em float64 (matchs_exchanges_v2)
+#         tg_2s.npy      Time_Group por janela, gravado na primeira vez que é pedido
+#
+# As corridas seguintes abrem os arrays por memmap. A chave é o conteúdo do ficheiro,
+# não o nome nem a data: um export substituído gera outra entrada. Mudar as regras de
+# leitura obriga a subir VERSAO_PARSER.
+#
+# Datas, códigos e valor_f8 abrem sem parse nenhum. O caminho Decimal (decimais())
+# continua a criar um Decimal por linha a partir do texto gravado: poupa o read_csv,
+# a limpeza do Change e a ordenação, mas não a construção dos objetos. Gravar o
+# coeficiente int64 e o expoente não ajuda: Decimal(int).scaleb(exp) mediu-se mais
+# lento do que Decimal(str).
+
+VERSAO_PARSER = 1
+PASTA_PADRAO = '.cache_ledger'
+_BLOCO_HASH = 1 << 20
+
+
+def hash_conteudo(caminho):
+    h = hashlib.blake2b(digest_size=20)
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(_BLOCO_HASH), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _ns(datas):
+    # Naive ou com fuso, em qualquer resolução: ns UTC, NaT como o mínimo do int64
+    return datas.dt.as_unit('ns').to_numpy().view('int64') if datas.dt.tz is None else \
+        datas.dt.tz_convert('UTC').dt.tz_localize(None).dt.as_unit('ns').to_numpy().view('int64')
+
+
+def _construir(caminho, destino):
+    df = pd.read_csv(caminho)
+    df['UTC_Time'] = pd.to_datetime(df['UTC_Time'])
+    tz = df['UTC_Time'].dt.tz
+    # A mesma ordenação dos motores (quicksort): a ordem dos empates fica gravada
+    df = df.sort_values('UTC_Time')
+
+    moedas, nomes_moedas = pd.factorize(df['Coin'])
+    operacoes, nomes_ops = pd.factorize(df['Operation'])
+    valores = parse_coluna(df['Change'])
+    np.save(os.path.join(destino, 'utc.npy'), _ns(df['UTC_Time']))
+    np.save(os.path.join(destino, 'moeda.npy'), moedas.astype(np.int32))
+    np.save(os.path.join(destino, 'operacao.npy'), operacoes.astype(np.int32))
+    np.save(os.path.join(destino, 'valor.npy'), np.array([str(v) for v in valores], dtype='S'))
+    np.save(os.path.join(destino, 'valor_f8.npy'), parse_coluna(df['Change'], tipo='float').to_numpy(np.float64))
+    with open(os.path.join(destino, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'versao_parser': VERSAO_PARSER,
+            'origem': os.path.abspath(caminho),
+            'linhas': len(df),
+            'fuso': str(tz) if tz is not None else None,
+            'moedas': [str(m) for m in nomes_moedas],
+            'operacoes': [str(o) for o in nomes_ops],
+        }, f, ensure_ascii=False)
+
+
+class LedgerNormalizado:
+    """Uma entrada do cache, aberta por memmap. As linhas já vêm ordenadas por UTC_Time."""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        with open(os.path.join(pasta, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        carregar = lambda nome: np.load(os.path.join(pasta, nome), mmap_mode='r')
+        self.utc_ns = carregar('utc.npy')
+        self.moeda = carregar('moeda.npy')
+        self.operacao = carregar('operacao.npy')
+        self.valor = carregar('valor.npy')
+        self.valor_f8 = carregar('valor_f8.npy')
+        # Código -1 (célula vazia) cai no último elemento: NaN, como no read_csv
+        self.moedas = np.array(self.meta['moedas'] + [np.nan], dtype=object)
+        self.operacoes = np.array(self.meta['operacoes'] + [np.nan], dtype=object)
+
+    def __len__(self):
+        return self.meta['linhas']
+
+    def datas(self):
+        """UTC_Time de todas as linhas (Series), pela ordem do cache."""
+        return self._datas(self.utc_ns)
+
+    def _datas(self, ns):
+        datas = pd.Series(np.asarray(ns).view('datetime64[ns]'))
+        fuso = self.meta['fuso']
+        return datas.dt.tz_localize('UTC').dt.tz_convert(fuso) if fuso else datas
+
+    def time_group(self, janela='2s'):
+        """Time_Group em ns para a janela (dt.round), calculado e gravado uma vez por janela."""
+        caminho = os.path.join(self.pasta, f'tg_{janela}.npy')
+        if not os.path.exists(caminho):
+            tg = _ns(self._datas(self.utc_ns).dt.round(janela))
+            fd, tmp = tempfile.mkstemp(dir=self.pasta, suffix='.npy')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, tg)
+            os.replace(tmp, caminho)
+        return np.load(caminho, mmap_mode='r')
+
+    def decimais(self, linhas=None):
+        """Change de cada linha como Decimal (um Decimal(str) por linha; ver o topo do módulo)."""
+        texto = self.valor if linhas is None else self.valor[linhas]
+        return [Decimal(b.decode()) for b in texto.tolist()]
+
+    def dataframe(self, janela='2s', valores='decimal', coluna='Val_Dec', linhas=None):
+        """DataFrame como os motores o montavam depois do sort_values: UTC_Time, Operation,
+        Coin, a coluna de valores e Time_Group. valores: 'decimal', 'float' ou None.
+        linhas: máscara / índices para ler só parte do ledger."""
+        sel = slice(None) if linhas is None else linhas
+        df = pd.DataFrame({
+            'UTC_Time': self._datas(self.utc_ns[sel]),
+            'Operation': self.operacoes[self.operacao[sel]],
+            'Coin': self.moedas[self.moeda[sel]],
+        })
+        if valores == 'decimal':
+            df[coluna] = pd.Series(self.decimais(linhas), dtype=object)
+        elif valores == 'float':
+            df[coluna] = np.asarray(self.valor_f8[sel])
+        elif valores is not None:
+            raise ValueError(f"valores desconhecidos: {valores} (válidos: decimal, float)")
+        if janela:
+            df['Time_Group'] = self._datas(self.time_group(janela)[sel])
+        return df
+
+
+def abrir_ledger(caminho, pasta=None):
+    """Entrada do cache para o export `caminho`, criada na primeira vez.
+
+    pasta: onde ficam as entradas; por omissão PASTA_PADRAO ao lado do export.
+    """
+    if pasta is None:
+        pasta = os.path.join(os.path.dirname(os.path.abspath(caminho)), PASTA_PADRAO)
+    entrada = os.path.join(pasta, f'{hash_conteudo(caminho)}-p{VERSAO_PARSER}')
+    if not os.path.exists(os.path.join(entrada, 'meta.json')):
+        os.makedirs(pasta, exist_ok=True)
+        # Montada numa pasta temporária e renomeada no fim: nunca fica meia entrada
+        tmp = tempfile.mkdtemp(dir=pasta, prefix='.tmp-')
+        try:
+            _construir(caminho, tmp)
+            os.rename(tmp, entrada)
+        except OSError:
+            # Outra corrida criou a mesma entrada entretanto
+            if not os.path.exists(os.path.join(entrada, 'meta.json')):
+                raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return LedgerNormalizado(entrada)
@@ -0,0 +1,205 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.colunar import COLS_IRS, FIAT, RetiradasBT, carregar_ledger, carregar_retiradas_bt, processar_eventos
+from motor_fifo.inventario import FilaPrioridade, Inventario
+from motor_fifo.relatorios import centimos
+
+# Simulação de cenários ("e se?") para planeamento fiscal.
+#
+# O ledger é lido e agrupado uma vez; cada cenário corre o processar_eventos sobre
+# as mesmas listas, só com outras regras:
+#   politica       ordem de consumo dos lotes nas vendas, swaps e levantamentos:
+#                  fifo (v4), lifo, hifo (maior custo unitário primeiro) ou
+#                  especifica (lotes designados por moeda e data de aquisição
+#                  primeiro, pela ordem dada; os restantes em FIFO)
+#   fiat           moedas cujas entradas fazem do grupo uma venda tributável
+#   custo_externo  'zero' (v4) ou 'herdado': um depósito sem retirada BT herda custo
+#                  e data dos lotes levantados antes da mesma moeda
+#
+# Os cenários correm em processos. Com fork (Linux) os processos herdam o ledger já
+# carregado sem o copiar; noutros sistemas vai uma vez para cada processo, no
+# initializer, e não por cenário. Cada processo devolve só os totais.
+
+POLITICAS = ('fifo', 'lifo', 'hifo', 'especifica')
+CUSTOS_EXTERNOS = ('zero', 'herdado')
+ESTAVEIS = ('USDT', 'USDC', 'BUSD', 'FDUSD', 'DAI')
+
+TOTAIS = ['Vendas', 'Valor_Venda', 'Custo_Aquisicao', 'Resultado', 'Resultado_Tributavel',
+          'Resultado_Isento', 'Resultado_TBD']
+
+
+class Cenario:
+    """Um conjunto de regras a simular (ver o topo do módulo).
+
+    designados: {(moeda, Data_Aquisicao): ordem} para a política 'especifica'; a data
+    é o texto da coluna Data_Aquisicao do relatório IRS.
+    """
+
+    __slots__ = ('nome', 'politica', 'fiat', 'custo_externo', 'designados')
+
+    def __init__(self, nome, politica='fifo', fiat=FIAT, custo_externo='zero', designados=None):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconhecida: {politica} (válidas: {', '.join(POLITICAS)})")
+        if custo_externo not in CUSTOS_EXTERNOS:
+            raise ValueError(f"Custo externo desconhecido: {custo_externo} (válidos: {', '.join(CUSTOS_EXTERNOS)})")
+        if politica == 'especifica' and not designados:
+            raise ValueError(f"Cenário {nome}: a política 'especifica' precisa de lotes designados")
+        self.nome = nome
+        self.politica = politica
+        self.fiat = tuple(fiat)
+        self.custo_externo = custo_externo
+        self.designados = dict(designados or {})
+
+    def __repr__(self):
+        return f"Cenario({self.nome!r}, {self.politica!r}, custo_externo={self.custo_externo!r})"
+
+
+CENARIOS_PADRAO = (
+    Cenario('fifo'),
+    Cenario('lifo', 'lifo'),
+    Cenario('hifo', 'hifo'),
+    Cenario('fifo_herdado', custo_externo='herdado'),
+    Cenario('fifo_estaveis_fiat', fiat=FIAT + ESTAVEIS),
+)
+
+
+def carregar_designados(caminho):
+    """CSV ';' com Ativo e Data_Aquisicao: os lotes a consumir primeiro, por esta ordem."""
+    df = pd.read_csv(caminho, sep=';', dtype=str)
+    return {(a, d): k for k, (a, d) in enumerate(zip(df['Ativo'], df['Data_Aquisicao']))}
+
+
+def carregar_cenarios(caminho):
+    """Lista de cenários em JSON: [{"nome": ..., "politica": ..., "fiat": [...],
+    "custo_externo": ..., "designados": "lotes.csv"}]; os campos em falta ficam por omissão."""
+    with open(caminho, encoding='utf-8') as f:
+        especificacoes = json.load(f)
+    cenarios = []
+    for esp in especificacoes:
+        esp = dict(esp)
+        if isinstance(esp.get('designados'), str):
+            esp['designados'] = carregar_designados(
+                os.path.join(os.path.dirname(os.path.abspath(caminho)), esp['designados']))
+        cenarios.append(Cenario(**esp))
+    return cenarios
+
+
+class _InventarioPolitica(Inventario):
+    # Filas com a ordem do cenário em vez da FIFO
+    def __init__(self, cenario):
+        super().__init__()
+        self._cenario = cenario
+
+    def fila(self, moeda):
+        fila = self.get(moeda)
+        if fila is None:
+            fila = self[moeda] = FilaPrioridade(_chave(self._cenario, moeda), lifo=self._cenario.politica == 'lifo')
+        return fila
+
+
+def _chave(cenario, moeda):
+    if cenario.politica == 'lifo':
+        return None
+    if cenario.politica == 'hifo':
+        return lambda lote: -(lote.cost / lote.qty) if lote.qty > 0 else 0
+    designados, resto = cenario.designados, len(cenario.designados)
+    return lambda lote: designados.get((moeda, lote.date), resto)
+
+
+def _totais(irs):
+    # Soma exata em cêntimos dos valores já arredondados, por ano de venda
+    df = pd.DataFrame(irs, columns=COLS_IRS)
+    cent = centimos(df)
+    cent.columns = ['Valor_Venda', 'Custo_Aquisicao', 'Resultado']
+    isento = df['Isento_365d'].str.endswith('(ISENTO)')
+    tbd = df['Isento_365d'] == 'TBD'
+    cent['Resultado_Tributavel'] = cent['Resultado'].where(~isento & ~tbd, 0)
+    cent['Resultado_Isento'] = cent['Resultado'].where(isento, 0)
+    cent['Resultado_TBD'] = cent['Resultado'].where(tbd, 0)
+    cent['Vendas'] = 1
+    cent['Ano'] = df['Data_Venda'].str[:4]
+    return cent.groupby('Ano')[TOTAIS].sum()
+
+
+def correr_cenario(cenario, ledger, bt=None, aritmetica=DECIMAL, saida=None):
+    """Corre um cenário e devolve os totais por ano (em cêntimos). Não altera ledger nem bt."""
+    # Cada cenário casa depósitos com as retiradas BT desde o início
+    bt = RetiradasBT(bt.moedas, bt.qtds, bt.custos, bt.datas) if bt is not None else None
+    inventario = Inventario() if cenario.politica == 'fifo' else _InventarioPolitica(cenario)
+    transito = Inventario() if cenario.custo_externo == 'herdado' else None
+    irs, _, _ = processar_eventos(ledger, bt, fiat=cenario.fiat, inventory=inventario, aritmetica=aritmetica,
+                                  transito=transito)
+    if saida:
+        pd.DataFrame(irs, columns=COLS_IRS).to_csv(os.path.join(saida, f'{cenario.nome}_Vendas_IRS.csv'),
+                                                   sep=';', index=False, decimal=',')
+    return _totais(irs)
+
+
+_PARTILHADO = {}
+
+
+def _iniciar(ledger, bt, aritmetica, saida):
+    _PARTILHADO.update(ledger=ledger, bt=bt, aritmetica=aritmetica, saida=saida)
+
+
+def _correr_partilhado(cenario):
+    return correr_cenario(cenario, **_PARTILHADO)
+
+
+def simular(ledger, bt, cenarios=CENARIOS_PADRAO, aritmetica=DECIMAL, processos=None, saida=None, por_ano=False):
+    """Corre os cenários sobre o mesmo ledger e devolve o resumo lado a lado.
+
+    Uma linha por cenário (por cenário e ano com por_ano), com os totais IRS em
+    euros/dólares e Dif_Tributavel: Resultado_Tributavel menos o do primeiro cenário.
+    processos: > 1 corre os cenários em paralelo. saida: pasta onde cada cenário
+    grava o seu <nome>_Vendas_IRS.csv.
+    """
+    nomes = [c.nome for c in cenarios]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError("Nomes de cenário repetidos")
+    if saida:
+        os.makedirs(saida, exist_ok=True)
+    if processos and processos > 1 and len(cenarios) > 1:
+        contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=min(processos, len(cenarios)), mp_context=contexto,
+                                 initializer=_iniciar, initargs=(ledger, bt, aritmetica, saida)) as executor:
+            totais = list(executor.map(_correr_partilhado, cenarios))
+    else:
+        totais = [correr_cenario(c, ledger, bt, aritmetica, saida) for c in cenarios]
+    return resumir(cenarios, totais, por_ano)
+
+
+def resumir(cenarios, totais, por_ano=False):
+    partes = []
+    for cenario, t in zip(cenarios, totais):
+        t = t if por_ano else t.sum().to_frame('TOTAL').T
+        t = t.reset_index(names='Ano')
+        t.insert(0, 'Custo_Externo', cenario.custo_externo)
+        t.insert(0, 'Politica', cenario.politica)
+        t.insert(0, 'Cenario', cenario.nome)
+        partes.append(t)
+    resumo = pd.concat(partes, ignore_index=True)
+    resumo['Vendas'] = resumo['Vendas'].astype('int64')
+    # Diferença para o cenário de referência (o primeiro), no mesmo ano
+    ref = resumo[resumo['Cenario'] == cenarios[0].nome].set_index('Ano')['Resultado_Tributavel']
+    resumo['Dif_Tributavel'] = resumo['Resultado_Tributavel'] - resumo['Ano'].map(ref).fillna(0)
+    for col in TOTAIS[1:] + ['Dif_Tributavel']:
+        resumo[col] = resumo[col].astype('int64') / 100
+    if not por_ano:
+        resumo = resumo.drop(columns='Ano')
+    return resumo
+
+
+def simular_cenarios(binance_input, bt_input, cenarios=CENARIOS_PADRAO, aritmetica=DECIMAL, processos=None,
+                     saida=None, por_ano=False, cache=None, janela='2s'):
+    """Lê o export e as retiradas BT uma vez e simula os cenários (ver simular)."""
+    ledger = carregar_ledger(binance_input, janela=janela, aritmetica=aritmetica, cache=cache)
+    bt = carregar_retiradas_bt(bt_input, aritmetica)
+    print(f"Simulando {len(cenarios)} cenários sobre {len(ledger)} linhas, {ledger.n_grupos} grupos...")
+    return simular(ledger, bt, cenarios, aritmetica, processos, saida, por_ano)
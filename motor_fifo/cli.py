@@ -0,0 +1,204 @@
+import argparse
+import os
+import sys
+
+# Linha de comandos do pacote (motor-fifo, ou python -m motor_fifo), com os
+# subcomandos run, reconcile, snapshot, benchmark e compare.
+#
+# Ao arrancar só se importa o argparse: cada subcomando importa o que precisa quando
+# corre, e o run de um export pequeno com as opções por omissão vai pelo
+# motor_fifo.rapido, sem pandas nem numpy. --help e verificações rápidas ficam nas
+# dezenas de ms; o resto corre exatamente como no Motor_Binance_v5.py.
+
+BINANCE_INPUT = 'Binance_Novembro2019-Dezembro2025.csv'
+BT_INPUT = 'Relatorio_FIFO_Completo_Contraparte.csv'
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Opções do run que só o motor colunar trata: com alguma delas fora do valor por
+# omissão o caminho rápido não se aplica
+OPCOES_MOTOR = ('estado', 'bloco', 'processos', 'colunar', 'sem_csv', 'reconciliacao', 'lotes', 'cache',
+                'lacuna', 'decompor', 'ponto_fixo', 'metricas', 'resumo_irs')
+
+
+def _entradas(p):
+    p.add_argument('--binance', default=BINANCE_INPUT, metavar='CSV', help="export Binance")
+    p.add_argument('--bt', default=BT_INPUT, metavar='CSV', help="relatório FIFO BitcoinTrade (retiradas)")
+
+
+def _aritmetica(p):
+    p.add_argument('--ponto-fixo', action='store_true',
+                   help="aritmética inteira (quantidades em 10^-casas, custos em cêntimos escalados)")
+    p.add_argument('--casas', type=int, default=8, help="casas decimais das quantidades em --ponto-fixo")
+
+
+def _agrupamento(p):
+    p.add_argument('--lacuna', metavar='DURACAO',
+                   help="agrupa por lacuna entre linhas seguidas (ex.: 2s) em vez do dt.round('2s') do v4")
+    p.add_argument('--por-operacao', action='store_true',
+                   help="com --lacuna: a lacuna conta só entre linhas da mesma classe de operação")
+
+
+def _criar_aritmetica(args):
+    from motor_fifo.aritmetica import DECIMAL, AritmeticaPontoFixo
+    return AritmeticaPontoFixo(casas=args.casas) if args.ponto_fixo else DECIMAL
+
+
+def _criar_janela(args):
+    if not args.lacuna:
+        return '2s'
+    from motor_fifo.agrupamento import AgrupamentoLacuna
+    return AgrupamentoLacuna(args.lacuna, por_operacao=args.por_operacao)
+
+
+def parser():
+    raiz = argparse.ArgumentParser(prog='motor-fifo', description="Motor FIFO Binance / BitcoinTrade")
+    sub = raiz.add_subparsers(dest='comando', required=True, metavar='COMANDO')
+
+    run = sub.add_parser('run', help="corre o motor e gera os 3 relatórios CSV",
+                         description="Corre o motor colunar (v5). Um export pequeno com as opções por omissão "
+                                     "vai pelo caminho rápido sem pandas, com os mesmos ficheiros.")
+    _entradas(run)
+    run.add_argument('--out-irs', default='1_Vendas_IRS_Formatado.csv', metavar='CSV')
+    run.add_argument('--out-swaps', default='2_Historico_Swaps_Audit.csv', metavar='CSV')
+    run.add_argument('--out-reconciliacao', default='3_Reconciliacao_Transferencias.csv', metavar='CSV')
+    run.add_argument('--estado', help="snapshot JSON: retoma dele e grava-o no fim (modo incremental)")
+    run.add_argument('--bloco', type=int, help="modo fluxo: lê o export em blocos de N linhas (memória limitada)")
+    run.add_argument('--processos', type=int, help="reparte as moedas não ligadas por swaps por N processos")
+    run.add_argument('--colunar', metavar='PASTA',
+                     help="grava os relatórios em Parquet/Arrow por ano fiscal; os CSVs saem daí")
+    run.add_argument('--formato', choices=['parquet', 'arrow'], default='parquet')
+    run.add_argument('--sem-csv', action='store_true', help="com --colunar, não gera os CSVs")
+    run.add_argument('--reconciliacao', choices=['primeira', 'otima'], default='primeira',
+                     help="depósitos x retiradas BT: primeira compatível (v4) ou em lote por moeda")
+    run.add_argument('--taxa-max', type=float, default=0,
+                     help="com --reconciliacao otima: fração da retirada que pode faltar no depósito")
+    run.add_argument('--correspondencias', metavar='CSV', help="com --reconciliacao otima: grava a tabela de pares")
+    run.add_argument('--lotes', metavar='PASTA', help="grava o diário de lotes; com --estado continua-o")
+    run.add_argument('--cache', nargs='?', const=True, metavar='PASTA',
+                     help="lê o ledger do cache normalizado (por omissão .cache_ledger/)")
+    _agrupamento(run)
+    run.add_argument('--decompor', action='store_true',
+                     help="trata cada grupo por moeda, com as taxas no FIFO (deixa de dar o resultado do v4)")
+    run.add_argument('--resumo-irs', metavar='CSV',
+                     help="grava o resumo anual do IRS (ano, ativo, moeda, isento/tributável) acumulado no ciclo")
+    _aritmetica(run)
+    run.add_argument('--metricas', metavar='JSON', help="tempos por etapa e contagens por ramo em JSON")
+    run.add_argument('--sem-rapido', action='store_true', help="usa sempre o motor colunar (pandas)")
+    run.set_defaults(funcao=comando_run, omissao={k: run.get_default(k) for k in OPCOES_MOTOR})
+
+    rec = sub.add_parser('reconcile', help="casa os depósitos do export com as retiradas BT e grava os pares",
+                         description="Reconciliação ótima (em lote, por moeda) dos depósitos Binance com as "
+                                     "retiradas BitcoinTrade, sem correr o motor.")
+    _entradas(rec)
+    rec.add_argument('--saida', default='Correspondencias_BT.csv', metavar='CSV', help="tabela de pares")
+    rec.add_argument('--taxa-max', type=float, default=0,
+                     help="fração da retirada que pode faltar no depósito (taxa de rede)")
+    _agrupamento(rec)
+    _aritmetica(rec)
+    rec.set_defaults(funcao=comando_reconcile)
+
+    snap = sub.add_parser('snapshot', help="resumo de um snapshot do modo incremental (--estado)")
+    snap.add_argument('caminho', help="snapshot JSON")
+    snap.add_argument('--csv', metavar='CSV', help="grava o inventário por moeda em CSV ';' (Moeda, Quantidade, "
+                                                   "Custo_Total)")
+    snap.set_defaults(funcao=comando_snapshot)
+
+    # Os argumentos seguem tal e qual para os scripts da raiz (ver main)
+    bench = sub.add_parser('benchmark', help="benchmark dos motores com dados sintéticos (benchmark_motores.py)",
+                           add_help=False)
+    bench.set_defaults(funcao=comando_script, script='benchmark_motores.py')
+    comp = sub.add_parser('compare', help="comparação diferencial de dois motores (comparar_motores.py)",
+                          add_help=False)
+    comp.set_defaults(funcao=comando_script, script='comparar_motores.py')
+    return raiz
+
+
+def comando_run(args):
+    por_omissao = all(getattr(args, k) == v for k, v in args.omissao.items())
+    if por_omissao and not args.sem_rapido:
+        from motor_fifo.rapido import correr
+        if correr(args.binance, args.bt, args.out_irs, args.out_swaps, args.out_reconciliacao):
+            return 0
+
+    from motor_fifo.colunar import processar_motor_colunar
+    from motor_fifo.metricas import Metricas
+    aritmetica = _criar_aritmetica(args)
+    metricas = Metricas('v5') if args.metricas else None
+    if metricas is not None:
+        metricas.info.update(processos=args.processos or 1, bloco=args.bloco, aritmetica=type(aritmetica).__name__)
+    processar_motor_colunar(args.binance, args.bt, args.out_irs, args.out_swaps, args.out_reconciliacao,
+                            estado=args.estado, bloco=args.bloco, aritmetica=aritmetica, processos=args.processos,
+                            saida_colunar=args.colunar, formato=args.formato, csv=not args.sem_csv,
+                            metricas=metricas, reconciliacao=args.reconciliacao, taxa_max=args.taxa_max,
+                            correspondencias=args.correspondencias, lotes=args.lotes, cache=args.cache,
+                            janela=_criar_janela(args), decompor=args.decompor, resumo_irs=args.resumo_irs)
+    if metricas is not None:
+        metricas.guardar(args.metricas)
+        print(metricas.resumo())
+    return 0
+
+
+def comando_reconcile(args):
+    from motor_fifo.colunar import carregar_retiradas_bt
+    from motor_fifo.reconciliacao import casar_depositos_bt, exportar_correspondencias
+
+    if not os.path.exists(args.binance):
+        print(f"Erro: Arquivo {args.binance} não encontrado.")
+        return 1
+    aritmetica = _criar_aritmetica(args)
+    bt = carregar_retiradas_bt(args.bt, aritmetica)
+    if bt is None:
+        print(f"Erro: sem retiradas BitcoinTrade em {args.bt}.")
+        return 1
+    casamentos = casar_depositos_bt(args.binance, bt, janela=_criar_janela(args), aritmetica=aritmetica,
+                                    taxa_max=args.taxa_max)
+    exportar_correspondencias(casamentos, bt, args.saida, aritmetica)
+    print(f"{len(casamentos.tabela)} depósitos casados com {len(bt.moedas)} retiradas BT; pares em {args.saida}")
+    return 0
+
+
+def comando_snapshot(args):
+    import json
+    from motor_fifo.aritmetica import de_descricao
+    from motor_fifo.estado import inventario_de_texto
+
+    with open(args.caminho, encoding='utf-8') as f:
+        dados = json.load(f)
+    aritmetica = de_descricao(dados['aritmetica'])
+    inventory = inventario_de_texto(dados['inventario'], aritmetica)
+    pendentes = dados['bt_pendentes']
+    print(f"Snapshot {args.caminho} (versão {dados.get('versao')}, aritmética {aritmetica.nome})")
+    print(f"Último grupo processado: {dados['ultimo_grupo']}")
+    print(f"Retiradas BT por casar: {'-' if pendentes is None else len(pendentes)}")
+    print(f"{'Moeda':<8} {'Lotes':>6} {'Quantidade':>22} {'Custo_Total':>16}")
+    for m, fila in sorted(inventory.items()):
+        if fila:
+            print(f"{m:<8} {len(fila):>6} {aritmetica.qtd_float(fila.qtd_total, m):>22} "
+                  f"{aritmetica.custo_float(fila.custo_total):>16.2f}")
+    if args.csv:
+        from motor_fifo.estado import exportar_resumo_inventario
+        exportar_resumo_inventario(inventory, args.csv, aritmetica)
+        print(f"Inventário em {args.csv}")
+    return 0
+
+
+def comando_script(args):
+    import runpy
+    script = os.path.join(RAIZ, args.script)
+    if not os.path.exists(script):
+        # Os motores medidos são os scripts da raiz do repositório, não o pacote instalado
+        print(f"Erro: {script} não encontrado; o {args.comando} corre a partir de uma cópia do repositório.")
+        return 1
+    sys.argv = [script] + args.argumentos
+    sys.path.insert(0, RAIZ)
+    runpy.run_path(script, run_name='__main__')
+    return 0
+
+
+def main(argv=None):
+    p = parser()
+    args, resto = p.parse_known_args(argv)
+    if args.comando not in ('benchmark', 'compare') and resto:
+        p.error(f"argumentos desconhecidos: {' '.join(resto)}")
+    args.argumentos = resto
+    return args.funcao(args)
@@ -0,0 +1,344 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from motor_fifo.agrupamento import AgrupamentoLacuna, chaves_por_linha
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.inventario import Inventario
+from motor_fifo.metricas import NULAS
+# O ciclo de eventos vive no núcleo sem pandas; os nomes continuam a importar-se daqui
+from motor_fifo.nucleo import (COLS_IRS, COLS_RECONC, COLS_SWAPS, FIAT, OPS_DEPOSITO, OPS_LEVANTAMENTO,
+                               ORIGEM_HERDADA, TOLERANCIA_BT, Ledger, RetiradasBT, processar_eventos)
+from motor_fifo.valores import parse_coluna
+
+
+def segmentar(df, janela='2s', ordenacao='quicksort'):
+    """Ordena por UTC_Time, calcula o Time_Group e devolve o Ledger (df já com Val_Dec).
+
+    ordenacao='quicksort' é a do v4 (sort_values por omissão); o modo fluxo usa
+    'stable' para os empates seguirem a ordem do ficheiro de bloco para bloco.
+    janela: texto de dt.round ('2s', como o v4) ou motor_fifo.agrupamento.AgrupamentoLacuna.
+    """
+    df = df.sort_values('UTC_Time', kind=ordenacao)
+    if isinstance(janela, AgrupamentoLacuna):
+        df = df[df['UTC_Time'].notna()]
+        return _ledger_agrupado(df['Coin'].tolist(), df['Operation'].tolist(), df['Val_Dec'].tolist(),
+                                df['UTC_Time'].to_numpy(dtype='datetime64[ns]').view('int64'), janela)
+    tg = df['UTC_Time'].dt.round(janela)
+    # groupby() descarta chaves NaT; aqui também
+    validos = tg.notna().to_numpy()
+    if not validos.all():
+        df, tg = df[validos], tg[validos]
+
+    return _ledger_ordenado(df['Coin'].tolist(), df['Operation'].tolist(), df['Val_Dec'].tolist(),
+                            tg.to_numpy(dtype='datetime64[ns]'))
+
+
+def _ledger_ordenado(coin, op, val, chaves):
+    # dt.round é monotónico, logo o Time_Group já vem ordenado: basta achar as fronteiras
+    cortes = np.flatnonzero(chaves[1:] != chaves[:-1]) + 1
+    inicios = np.concatenate(([0], cortes, [len(chaves)])) if len(chaves) else np.array([0])
+
+    # Uma só conversão para texto (em C) em vez de dois strftime por grupo
+    grupos = np.datetime_as_string(chaves[inicios[:-1]], unit='s').tolist()
+    return Ledger(
+        coin,
+        op,
+        val,
+        inicios.tolist(),
+        [g[:10] for g in grupos],
+        [g[11:] for g in grupos],
+        chaves[inicios[:-1]],
+    )
+
+
+def _ledger_agrupado(coin, op, val, ns, janela):
+    # Linhas já ordenadas por UTC_Time; os grupos do AgrupamentoLacuna podem intercalar-se
+    # (por_operacao), por isso as linhas passam primeiro à ordem dos grupos
+    ordem, inicios = janela.agrupar(ns, op)
+    if ordem is not None:
+        ordem = ordem.tolist()
+        coin, op, val = [coin[i] for i in ordem], [op[i] for i in ordem], [val[i] for i in ordem]
+        ns = ns[ordem]
+    chaves = ns[inicios[:-1]].view('datetime64[ns]')
+    grupos = np.datetime_as_string(chaves, unit='s').tolist()
+    return Ledger(coin, op, val, inicios.tolist(), [g[:10] for g in grupos], [g[11:] for g in grupos], chaves)
+
+
+def carregar_ledger(caminho, janela='2s', depois_de=None, ate=None, aritmetica=DECIMAL, metricas=None,
+                    cache=None):
+    """Lê o export Binance. depois_de/ate filtram por Time_Group (exclusivo/inclusivo),
+    antes de converter o Change, para o modo incremental não pagar pelas linhas antigas.
+    cache: pasta do cache normalizado (motor_fifo.cache); True usa a pasta por omissão."""
+    met = metricas if metricas is not None else NULAS
+    if cache:
+        return _ledger_do_cache(caminho, None if cache is True else cache, janela, depois_de, ate, aritmetica, met)
+    with met.etapa('carregar_csv'):
+        df = pd.read_csv(caminho)
+    with met.etapa('datas'):
+        df['UTC_Time'] = pd.to_datetime(df['UTC_Time'])
+    if depois_de is not None or ate is not None:
+        tg = chaves_por_linha(df['UTC_Time'], df['Operation'], janela)
+        mask = tg.notna()
+        if depois_de is not None:
+            mask &= tg > depois_de
+        if ate is not None:
+            mask &= tg <= ate
+        df = df[mask].copy()
+    with met.etapa('parse_valores'):
+        df['Val_Dec'] = aritmetica.parse(df['Change'], df['Coin'])
+    with met.etapa('time_group_ordenacao'):
+        return segmentar(df, janela)
+
+
+def _ledger_do_cache(caminho, pasta, janela, depois_de, ate, aritmetica, met):
+    from motor_fifo.cache import abrir_ledger
+    with met.etapa('carregar_cache'):
+        norm = abrir_ledger(caminho, pasta)
+        lacuna = isinstance(janela, AgrupamentoLacuna)
+        tg = norm.time_group(janela) if not lacuna else \
+            chaves_por_linha(norm.datas(), norm.operacoes[norm.operacao], janela).to_numpy().view('int64')
+    # NaT (mínimo do int64) fica de fora, como no groupby
+    mask = tg != np.iinfo(np.int64).min
+    if depois_de is not None:
+        mask &= tg > pd.Timestamp(depois_de).value
+    if ate is not None:
+        mask &= tg <= pd.Timestamp(ate).value
+    linhas = np.flatnonzero(mask)
+    coin = norm.moedas[norm.moeda[linhas]].tolist()
+    with met.etapa('parse_valores'):
+        val = norm.decimais(linhas)
+        if aritmetica is not DECIMAL:
+            val = aritmetica.parse(pd.Series([format(v, 'f') for v in val], dtype=object), coin).tolist()
+    op = norm.operacoes[norm.operacao[linhas]].tolist()
+    if lacuna:
+        return _ledger_agrupado(coin, op, val, np.asarray(norm.utc_ns[linhas]), janela)
+    return _ledger_ordenado(coin, op, val, np.asarray(tg[linhas]).view('datetime64[ns]'))
+
+
+def carregar_retiradas_bt(caminho, aritmetica=DECIMAL):
+    if not os.path.exists(caminho):
+        return None
+    try:
+        df_bt = pd.read_csv(caminho, sep=';', decimal=',')
+        mask = df_bt['operação'].str.contains('Retirada|Withdraw', na=False, case=False)
+        bt = df_bt[mask]
+        moedas = bt['Moeda'].tolist()
+        qtds = parse_coluna(bt['quantidade']).tolist()
+        custos = parse_coluna(bt['Valor (Custo FIFO)']).tolist()
+        return RetiradasBT(
+            moedas,
+            [aritmetica.qtd_de_decimal(q, m) for q, m in zip(qtds, moedas)],
+            [aritmetica.custo_de_decimal(c) for c in custos],
+            [str(d) for d in bt['Data'].tolist()],
+        )
+    except Exception:
+        print("Aviso: Falha ao ler BitcoinTrade. Prosseguindo como Origem Externa.")
+        return None
+
+
+def _escrever(df, caminho, anexar):
+    # Em modo incremental as linhas novas vão para o fim do ficheiro já existente;
+    # '""\n' é o que o pandas escreve para um DataFrame vazio (swaps sem linhas)
+    if anexar and os.path.exists(caminho) and os.path.getsize(caminho) > 3:
+        df.to_csv(caminho, sep=';', index=False, decimal=',', mode='a', header=False)
+    else:
+        df.to_csv(caminho, sep=';', index=False, decimal=',')
+
+
+class EscritorRelatorios:
+    """Escreve os 3 CSVs aos bocados (modo fluxo / incremental), no mesmo formato do v4.
+
+    A primeira escrita de cada ficheiro substitui-o (ou acrescenta, com anexar=True);
+    as seguintes acrescentam linhas sem cabeçalho.
+    """
+
+    def __init__(self, out_irs, out_swaps, out_reconciliacao, anexar=False):
+        self._destinos = ((out_irs, COLS_IRS), (out_swaps, COLS_SWAPS), (out_reconciliacao, COLS_RECONC))
+        self._anexar_inicial = anexar
+        self._escrito = [False, False, False]
+
+    def escrever(self, report_irs, report_swaps, report_transf):
+        for k, linhas in enumerate((report_irs, report_swaps, report_transf)):
+            if linhas:
+                caminho, cols = self._destinos[k]
+                _escrever(pd.DataFrame(linhas, columns=cols), caminho, self._escrito[k] or self._anexar_inicial)
+                self._escrito[k] = True
+
+    def fechar(self):
+        # O v4 cria sempre o ficheiro de swaps, mesmo sem linhas; IRS e reconciliação não
+        out_swaps = self._destinos[1][0]
+        if not self._escrito[1] and not (self._anexar_inicial and os.path.exists(out_swaps)):
+            pd.DataFrame().to_csv(out_swaps, sep=';', index=False, decimal=',')
+
+
+def exportar(report_irs, report_swaps, report_transf, out_irs, out_swaps, out_reconciliacao, anexar=False):
+    escritor = EscritorRelatorios(out_irs, out_swaps, out_reconciliacao, anexar)
+    escritor.escrever(report_irs, report_swaps, report_transf)
+    escritor.fechar()
+
+
+def _cronometrar(ledgers, metricas, nome):
+    # Modo fluxo: o tempo de leitura de cada bloco passa-se dentro do gerador
+    ledgers = iter(ledgers)
+    while True:
+        inicio = time.perf_counter()
+        ledger = next(ledgers, None)
+        if ledger is None:
+            return
+        metricas.somar_tempo(nome, time.perf_counter() - inicio)
+        yield ledger
+
+
+def processar_motor_colunar(binance_input='Binance_Novembro2019-Dezembro2025.csv',
+                            bt_input='Relatorio_FIFO_Completo_Contraparte.csv',
+                            out_irs='1_Vendas_IRS_Formatado.csv',
+                            out_swaps='2_Historico_Swaps_Audit.csv',
+                            out_reconciliacao='3_Reconciliacao_Transferencias.csv',
+                            estado=None, bloco=None, aritmetica=DECIMAL, processos=None,
+                            saida_colunar=None, formato='parquet', csv=True, metricas=None,
+                            reconciliacao='primeira', taxa_max=0, correspondencias=None, lotes=None,
+                            cache=None, janela='2s', decompor=False, resumo_irs=None):
+    """Corre o motor.
+
+    estado: retoma do snapshot (se existir), processa só as linhas posteriores ao último
+            Time_Group processado, acrescenta-as aos 3 CSVs e grava o novo snapshot no fim.
+    bloco:  modo fluxo; lê o export em blocos de `bloco` linhas com memória limitada
+            (ver motor_fifo.fluxo).
+    aritmetica: backend numérico (motor_fifo.aritmetica); DECIMAL reproduz o v4.
+    processos: > 1 reparte as moedas independentes (não ligadas por swaps) por
+               vários processos (ver motor_fifo.paralelo); o resultado é o mesmo.
+    saida_colunar: pasta do dataset Parquet/Arrow por ano fiscal (motor_fifo.relatorios);
+               os CSVs passam a ser derivados dele no fim (csv=False para não os gerar).
+    metricas: motor_fifo.metricas.Metricas a preencher (tempo por etapa, contagens por ramo).
+    reconciliacao: 'primeira' casa cada depósito com a primeira retirada BT compatível (v4);
+               'otima' emparelha todos de uma vez por moeda (motor_fifo.reconciliacao),
+               com taxa_max de diferença admitida e a tabela de pares em `correspondencias`.
+    lotes: pasta do diário de lotes (motor_fifo.lotes) para consultas à carteira num
+           instante; com `estado` continua o diário da corrida anterior.
+    cache: lê o ledger do cache normalizado (motor_fifo.cache): pasta, ou True para a
+           pasta por omissão. Não se aplica ao modo fluxo.
+    janela: agrupamento das linhas em grupos; '2s' é o dt.round do v4, ou um
+            motor_fifo.agrupamento.AgrupamentoLacuna (lacuna entre linhas seguidas).
+    decompor: cada grupo é tratado por moeda e as taxas entram no FIFO
+              (motor_fifo.decomposicao); o resultado deixa de ser o do v4.
+    resumo_irs: CSV do resumo anual do IRS (motor_fifo.resumo_irs), acumulado durante o
+                ciclo; com `estado` soma as vendas novas ao resumo da corrida anterior.
+    """
+    from motor_fifo.estado import carregar_estado, guardar_estado
+    met = metricas if metricas is not None else NULAS
+
+    if not os.path.exists(binance_input):
+        print(f"Erro: Arquivo {binance_input} não encontrado.")
+        return
+
+    inventory, bt, depois_de = Inventario(), None, None
+    if estado and os.path.exists(estado):
+        inventory, bt, depois_de = carregar_estado(estado, aritmetica)
+        print(f"Retomando do snapshot {estado} (último grupo: {depois_de})")
+    if depois_de is None:
+        with met.etapa('carregar_bt'):
+            bt = carregar_retiradas_bt(bt_input, aritmetica)
+
+    casamentos = None
+    if reconciliacao == 'otima' and bt is not None:
+        from motor_fifo.reconciliacao import casar_depositos_bt, exportar_correspondencias
+        with met.etapa('reconciliacao'):
+            casamentos = casar_depositos_bt(binance_input, bt, janela=janela, depois_de=depois_de,
+                                            aritmetica=aritmetica, taxa_max=taxa_max)
+        if correspondencias:
+            exportar_correspondencias(casamentos, bt, correspondencias, aritmetica)
+    elif reconciliacao not in ('primeira', 'otima'):
+        raise ValueError(f"Reconciliação desconhecida: {reconciliacao} (válidas: primeira, otima)")
+
+    if bloco:
+        from motor_fifo.fluxo import ledgers_em_blocos
+        ledgers = ledgers_em_blocos(binance_input, bloco, janela=janela, depois_de=depois_de, aritmetica=aritmetica)
+        if metricas is not None:
+            ledgers = _cronometrar(ledgers, metricas, 'carregar_bloco')
+        print(f"Iniciando Processamento Colunar em fluxo (blocos de {bloco} linhas)...")
+    else:
+        ledger = carregar_ledger(binance_input, janela=janela, depois_de=depois_de, aritmetica=aritmetica,
+                                 metricas=metricas, cache=cache)
+        ledgers = [ledger]
+        print(f"Iniciando Processamento Colunar ({len(ledger)} linhas, {ledger.n_grupos} grupos)...")
+
+    diario = None
+    if lotes:
+        from motor_fifo.lotes import DiarioLotes
+        diario = DiarioLotes(lotes, aritmetica, anexar=depois_de is not None)
+        if processos and processos > 1:
+            # Os ids de lote seguem a ordem global dos eventos: o diário corre em série
+            print("Aviso: com o diário de lotes o processamento é sequencial.")
+            processos = None
+
+    if decompor and processos and processos > 1:
+        # As taxas ligam a moeda da taxa (BNB) ao trade: as componentes do paralelo não servem
+        print("Aviso: com --decompor o processamento é sequencial.")
+        processos = None
+
+    resumo = None
+    if resumo_irs:
+        from motor_fifo.resumo_irs import ResumoIRS
+        resumo = ResumoIRS.ler(resumo_irs) if depois_de is not None else ResumoIRS()
+
+    executor = None
+    if processos and processos > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from motor_fifo.paralelo import processar_paralelo
+        executor = ProcessPoolExecutor(max_workers=processos)
+
+    if saida_colunar:
+        from motor_fifo.relatorios import EscritorColunar
+        escritor = EscritorColunar(saida_colunar, formato, anexar=depois_de is not None)
+    else:
+        escritor = EscritorRelatorios(out_irs, out_swaps, out_reconciliacao, anexar=depois_de is not None)
+    ultimo = depois_de
+    try:
+        for ledger in ledgers:
+            with met.etapa('ciclo_grupos'):
+                if executor is not None:
+                    relatorios = processar_paralelo(ledger, bt, processos, inventory=inventory,
+                                                    aritmetica=aritmetica, executor=executor, metricas=metricas,
+                                                    casamentos=casamentos, resumo=resumo)
+                else:
+                    relatorios = processar_eventos(ledger, bt, inventory=inventory, aritmetica=aritmetica,
+                                                   metricas=metricas, casamentos=casamentos, diario=diario,
+                                                   decompor=decompor, resumo=resumo)
+            with met.etapa('exportacao'):
+                escritor.escrever(*relatorios)
+            if ledger.ultimo_grupo is not None:
+                ultimo = ledger.ultimo_grupo
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if diario is not None:
+        with met.etapa('diario_lotes'):
+            diario.gravar()
+    with met.etapa('exportacao'):
+        escritor.fechar()
+        if saida_colunar and csv:
+            from motor_fifo.relatorios import exportar_csv
+            exportar_csv(saida_colunar, out_irs, out_swaps, out_reconciliacao)
+        if resumo is not None:
+            resumo.gravar(resumo_irs)
+
+    if estado:
+        with met.etapa('guardar_estado'):
+            guardar_estado(estado, inventory, bt, ultimo, aritmetica)
+
+    print(f"\nSucesso! Gerados:")
+    if saida_colunar:
+        print(f"- {saida_colunar}/ (irs, swaps, reconciliacao em {formato}, por ano)")
+    if csv or not saida_colunar:
+        print(f"1. {out_irs}")
+        print(f"2. {out_swaps}")
+        print(f"3. {out_reconciliacao}")
+    if estado:
+        print(f"4. {estado} (snapshot do inventário)")
+    if lotes:
+        print(f"- {lotes}/ (diário de lotes: {diario.n_eventos} eventos)")
+    if resumo is not None:
+        print(f"- {resumo_irs} (resumo anual do IRS: {len(resumo)} linhas)")
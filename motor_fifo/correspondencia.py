@@ -0,0 +1,78 @@
+from bisect import bisect_left, bisect_right
+
+
+class IndiceRetiradas:
+    """Índice das retiradas BitcoinTrade por moeda, ordenado por quantidade.
+
+    Cada depósito Binance passa a ser uma pesquisa por intervalo (bisect) em vez de
+    um filtro sobre o DataFrame inteiro. Retiradas já casadas ficam marcadas como
+    consumidas (tombstone) em vez de se reconstruir o DataFrame com drop().
+    Entre vários candidatos no intervalo ganha o primeiro pela ordem do ficheiro,
+    tal como o .head(1) dos motores originais.
+    """
+
+    def __init__(self, moedas, quantidades, rotulos=None):
+        moedas = list(moedas)
+        quantidades = list(quantidades)
+        self._rotulos = list(rotulos) if rotulos is not None else list(range(len(moedas)))
+        self._consumido = bytearray(len(moedas))
+        self._restantes = len(moedas)
+        # Candidatos percorridos (livres ou já consumidos) na última pesquisa, para as métricas
+        self.ultimo_varrimento = 0
+
+        por_moeda = {}
+        for pos, (m, q) in enumerate(zip(moedas, quantidades)):
+            por_moeda.setdefault(m, []).append((q, pos))
+        # moeda -> (quantidades ordenadas, posições no ficheiro alinhadas)
+        self._indice = {}
+        for m, pares in por_moeda.items():
+            pares.sort()
+            self._indice[m] = ([q for q, _ in pares], [p for _, p in pares])
+
+    @classmethod
+    def de_dataframe(cls, df, col_qtd, col_moeda='Moeda'):
+        return cls(df[col_moeda].tolist(), df[col_qtd].tolist(), df.index.tolist())
+
+    def __len__(self):
+        return self._restantes
+
+    def candidatos(self, moeda, qtd, tolerancia_abs=None, tolerancia_rel=None):
+        """Posições ainda livres cuja quantidade casa com `qtd`.
+
+        tolerancia_abs: |x - qtd| < tol   (v4, ex.: Decimal('0.00001'))
+        tolerancia_rel: qtd*(1-tol) <= x <= qtd*(1+tol)   (matchs_exchanges_v2, 0.01)
+        """
+        entrada = self._indice.get(moeda)
+        if entrada is None:
+            self.ultimo_varrimento = 0
+            return []
+        qtds, posicoes = entrada
+
+        if tolerancia_abs is not None:
+            i = bisect_right(qtds, qtd - tolerancia_abs)
+            j = bisect_left(qtds, qtd + tolerancia_abs)
+        elif tolerancia_rel is not None:
+            i = bisect_left(qtds, qtd * (1 - tolerancia_rel))
+            j = bisect_right(qtds, qtd * (1 + tolerancia_rel))
+        else:
+            i = bisect_left(qtds, qtd)
+            j = bisect_right(qtds, qtd)
+
+        self.ultimo_varrimento = j - i
+        return [p for p in posicoes[i:j] if not self._consumido[p]]
+
+    def livres(self):
+        """Posições ainda não casadas, pela ordem do ficheiro."""
+        return [p for p, c in enumerate(self._consumido) if not c]
+
+    def consumir(self, pos):
+        self._consumido[pos] = 1
+        self._restantes -= 1
+        return self._rotulos[pos]
+
+    def casar(self, moeda, qtd, tolerancia_abs=None, tolerancia_rel=None):
+        """Casa e consome a primeira retirada (ordem do ficheiro) compatível. Devolve o rótulo ou None."""
+        livres = self.candidatos(moeda, qtd, tolerancia_abs, tolerancia_rel)
+        if not livres:
+            return None
+        return self.consumir(min(livres))
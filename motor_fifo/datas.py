@@ -0,0 +1,58 @@
+import re
+from datetime import date
+from functools import lru_cache
+
+# Datas dos lotes como número de dia (date.toordinal()), calculado uma vez quando o
+# lote é criado; o prazo de detenção na venda passa a ser uma subtração de inteiros
+# em vez de dois pd.to_datetime por lote consumido.
+#
+# A Data_Venda é sempre só data (meia-noite), logo
+#     (pd.to_datetime(venda) - pd.to_datetime(aq)).days == dia_venda - dia_ordinal(aq)
+# desde que uma aquisição com horas conte como o dia seguinte (o .days arredonda
+# para baixo).
+
+_ISO = re.compile(r'\d{4}-\d{2}-\d{2}')
+_EPOCA = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=None)
+def dia_ordinal(texto):
+    """Dia de uma data em texto, ou None se o pandas não a conseguir subtrair ("TBD").
+
+    Texto vazio/'nan' dá NaT no pandas: devolve nan, para o resultado ser o mesmo
+    do v4 ("nan dias").
+    """
+    try:
+        # AAAA-MM-DD (o caso normal) dá o mesmo que pd.to_datetime, sem o parser do pandas
+        if _ISO.fullmatch(texto):
+            return date.fromisoformat(texto).toordinal()
+        import pandas as pd
+        t = pd.to_datetime(texto)
+    except Exception:
+        return None
+    if t is pd.NaT:
+        return float('nan')
+    if t.tzinfo is not None:
+        # Data com fuso menos data sem fuso: TypeError no v4
+        return None
+    dia = t.toordinal()
+    return dia + 1 if t != t.normalize() else dia
+
+
+_NS_DIA = 86400 * 10 ** 9
+
+
+def dias_de_chaves(chaves):
+    """Dia de cada Time_Group: datetime64 (vetorizado) ou lista de ns em int (motor_fifo.rapido)."""
+    if isinstance(chaves, list):
+        return [c // _NS_DIA + _EPOCA for c in chaves]
+    import numpy as np
+    return (np.asarray(chaves).astype('datetime64[D]').astype(np.int64) + _EPOCA).tolist()
+
+
+@lru_cache(maxsize=None)
+def status_isento(dia_venda, dia_aq, is_ext):
+    if dia_aq is None or is_ext:
+        return "TBD"
+    delta = dia_venda - dia_aq
+    return f"{delta} dias (ISENTO)" if delta > 365 else f"{delta} dias"
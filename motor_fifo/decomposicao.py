@@ -0,0 +1,186 @@
+from motor_fifo.datas import status_isento
+from motor_fifo.inventario import Lote
+from motor_fifo.lotes import TAXA, TROCA, VENDA
+from motor_fifo.nucleo import OPS_DEPOSITO, OPS_LEVANTAMENTO
+from motor_fifo.resumo_irs import classe_detencao
+
+# Decomposição de cada grupo (Time_Group) em pernas, para o modo decompor=True.
+#
+# O v4 percorre as saídas linha a linha: cada saída de um swap tira um lote por cada
+# entrada do grupo (k saídas x k entradas num trade executado em k partes, como os
+# grupos TUSD do Backup/teste1.csv), cada saída de uma venda recebe o valor fiat do
+# grupo inteiro, e as taxas são deitadas fora.
+#
+# Aqui o grupo é lido uma vez para um índice moeda -> pernas (Grupo) e o trade é
+# tratado por moeda:
+#  - Venda: cada moeda vendida consome do FIFO a soma das suas pernas, uma vez; o
+#    valor fiat reparte-se pelas moedas vendidas pelo nº de pernas de cada uma.
+#  - Swap: cada moeda que sai consome a soma das suas pernas; cada pedaço de lote
+#    consumido passa às moedas recebidas (quantidade na proporção do pedaço, custo
+#    repartido pelo nº de pernas de cada moeda recebida), com a data e a origem do
+#    lote. As entradas de um swap já não criam também um lote de custo zero.
+#  - Taxas (pernas com 'Fee'), ligadas ao trade do grupo: em fiat abatem ao valor da
+#    venda; na moeda recebida num swap abatem à quantidade recebida; nas restantes
+#    moedas (BNB) consomem lotes do FIFO e esse custo junta-se ao custo do trade
+#    (das linhas da venda, pelo valor de cada uma; dos lotes recebidos, pela
+#    quantidade). Sem trade no grupo o custo da taxa não vai para lado nenhum.
+#    Taxas em fiat fora disso (noutra moeda fiat que não a da venda, ou num grupo
+#    sem venda, como quando o limite de 2s separa as pernas de uma venda) são
+#    ignoradas: não há câmbio para as passar à moeda da venda.
+#
+# Tudo isto é linear no nº de pernas e de lotes tocados. Depósitos e levantamentos
+# seguem as regras do v4.
+
+
+class Grupo:
+    """Pernas de um grupo por papel: listas de linhas e dicts moeda -> linhas."""
+
+    __slots__ = ('fiat', 'depositos', 'entradas', 'saidas', 'taxas', 'levantamentos')
+
+    def __init__(self):
+        self.fiat = []              # entradas fiat que não são depósitos: o valor da venda
+        self.depositos = []
+        self.entradas = {}          # restantes entradas (compras, swaps, rendimentos)
+        self.saidas = {}            # saídas de trade (sem taxas, levantamentos nem fiat)
+        self.taxas = {}
+        self.levantamentos = []
+
+    @property
+    def troca(self):
+        return bool(self.saidas) and bool(self.entradas) and not self.fiat
+
+    def novos_lotes(self):
+        """Linhas que criam lote como entrada simples: depósitos e, fora de um swap, as
+        restantes entradas não fiat. Pela ordem do ledger."""
+        if self.troca or not self.entradas:
+            return self.depositos
+        if not self.depositos and len(self.entradas) == 1:
+            return next(iter(self.entradas.values()))
+        return sorted(self.depositos + [i for linhas in self.entradas.values() for i in linhas])
+
+    @property
+    def negocio(self):
+        """Há alguma coisa para negociar(): saídas de trade ou taxas."""
+        return bool(self.saidas) or bool(self.taxas)
+
+
+def decompor_grupo(coin, op, val, a, b, fiat):
+    """Uma passagem pelas linhas a:b do grupo."""
+    g = Grupo()
+    for i in range(a, b):
+        v, m, o = val[i], coin[i], op[i]
+        if v > 0:
+            if o in OPS_DEPOSITO:
+                if m not in fiat:
+                    g.depositos.append(i)
+            elif m in fiat:
+                g.fiat.append(i)
+            else:
+                g.entradas.setdefault(m, []).append(i)
+        elif v < 0:
+            if 'Fee' in o:
+                g.taxas.setdefault(m, []).append(i)
+            elif o in OPS_LEVANTAMENTO:
+                g.levantamentos.append(i)
+            elif m not in fiat:
+                g.saidas.setdefault(m, []).append(i)
+    return g
+
+
+def _soma(val, linhas):
+    # Quase sempre uma perna só: evita o sum() sobre um gerador
+    return val[linhas[0]] if len(linhas) == 1 else sum(val[i] for i in linhas)
+
+
+def negociar(g, coin, val, inventory, arit, custo_de, fiat, data_s, hora_s, dia, nova_venda, nova_troca,
+             diario=None, chave=None, metricas=None, resumo=None):
+    """Venda, swap e taxas do grupo `g` (ver o topo do módulo).
+
+    nova_venda / nova_troca recebem as linhas dos relatórios IRS e de swaps; as do IRS
+    somam-se também ao `resumo` (motor_fifo.resumo_irs), se houver.
+    Devolve o nº de pernas de venda, de swap e de taxa tratadas.
+    """
+    zero = arit.zero
+    proporcao = arit.custo          # x * parte / todo, no ponto fixo com arredondamento
+    troca = g.troca
+    venda = bool(g.saidas) and bool(g.fiat)
+    moeda_fiat = coin[g.fiat[0]] if g.fiat else None
+    n_saidas = sum(map(len, g.saidas.values()))
+
+    # 1. Consumo das moedas que saem, uma vez por moeda
+    pedacos = []
+    if venda or troca:
+        for m, linhas in g.saidas.items():
+            qtd = -_soma(val, linhas)
+            k = len(linhas)
+            coberto, lotes = zero, 0
+            fila = inventory.fila(m) if venda else inventory.get(m)
+            for lote, vender, custo in (fila.consumir(qtd, custo_de) if fila else ()):
+                if diario is not None:
+                    diario.consumir(chave, m, lote, vender, custo, VENDA if venda else TROCA)
+                # (moeda, parte, todo, custo, lote): o pedaço vale parte/todo das pernas recebidas
+                pedacos.append((m, vender * k, qtd * n_saidas, custo, lote))
+                coberto += vender
+                lotes += 1
+            if troca and coberto < qtd:
+                # Sem lotes para o resto: o que se recebe por ele entra com custo zero
+                pedacos.append((m, (qtd - coberto) * k, qtd * n_saidas, zero, None))
+            if metricas is not None:
+                metricas.observar('lotes_por_venda' if venda else 'lotes_por_swap', lotes)
+
+    # 2. Taxas
+    total_fiat = abs(_soma(val, g.fiat)) if venda else None
+    receber = {d: _soma(val, linhas) for d, linhas in g.entradas.items()} if troca else {}
+    custo_taxas, n_taxas = zero, 0
+    for m, linhas in g.taxas.items():
+        n_taxas += len(linhas)
+        qtd = -_soma(val, linhas)
+        if m in fiat:
+            # Só há valor a abater se o grupo é uma venda nessa mesma moeda fiat
+            if venda and m == moeda_fiat:
+                total_fiat -= qtd
+            continue
+        if m in receber:
+            receber[m] -= qtd
+            continue
+        fila = inventory.get(m)
+        for lote, vender, custo in (fila.consumir(qtd, custo_de) if fila else ()):
+            if diario is not None:
+                diario.consumir(chave, m, lote, vender, custo, TAXA)
+            custo_taxas += custo
+
+    # 3. Linhas do IRS / lotes recebidos, já com a parte das taxas
+    if venda:
+        dinheiro = arit.dinheiro
+        receitas = [arit.receita(total_fiat, moeda_fiat, parte, todo) for _, parte, todo, _, _ in pedacos]
+        soma = sum(receitas)
+        for (m, _, _, custo, lote), receita in zip(pedacos, receitas):
+            if custo_taxas:
+                custo = custo + proporcao(custo_taxas, soma, receita)
+            linha = (
+                data_s, m, moeda_fiat, dinheiro(receita), lote.date, dinheiro(custo), lote.origem,
+                dinheiro(receita - custo), status_isento(dia, lote.dia, lote.is_ext),
+            )
+            nova_venda(linha)
+            if resumo is not None:
+                resumo.somar(linha, classe_detencao(dia, lote.dia, lote.is_ext))
+    elif troca:
+        n_entradas = sum(map(len, g.entradas.values()))
+        for m, parte, todo, custo, lv in pedacos:
+            for d, linhas in g.entradas.items():
+                qtd = proporcao(receber[d], todo, parte)
+                if qtd <= 0:
+                    continue
+                custo_d = proporcao(custo, n_entradas, len(linhas))
+                if custo_taxas:
+                    custo_d = custo_d + proporcao(custo_taxas, n_entradas * todo, len(linhas) * parte)
+                if lv is None:
+                    novo = Lote(qtd, custo_d, data_s, "Rendimento/Binance", False, dia)
+                else:
+                    novo = Lote(qtd, custo_d, lv.date, lv.origem, lv.is_ext, lv.dia)
+                    nova_troca((data_s, hora_s, m, d, arit.custo_float(custo_d), lv.date))
+                inventory.fila(d).adicionar(novo)
+                if diario is not None:
+                    diario.criar(chave, d, novo, pai=lv)
+
+    return (n_saidas if venda else 0), (n_saidas if troca else 0), n_taxas
@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.datas import dia_ordinal
+from motor_fifo.inventario import Inventario, Lote
+
+# Snapshot completo do motor no fim de uma corrida, para a corrida seguinte processar
+# só o mês novo em vez de todo o histórico desde 2018:
+# - lotes FIFO por moeda (qty/cost em texto, sem perda de precisão, no backend numérico
+#   com que foram calculados)
+# - retiradas BitcoinTrade ainda não casadas (pela ordem original do ficheiro)
+# - último Time_Group processado
+# Com o diário de lotes (motor_fifo.lotes) cada lote leva ainda o seu id, no fim.
+VERSAO_ESTADO = 1
+
+
+def inventario_para_texto(inventory):
+    return {
+        m: [[str(l.qty), str(l.cost), l.date, l.origem, l.is_ext] + ([l.id] if l.id is not None else [])
+            for l in fila]
+        for m, fila in inventory.items()
+    }
+
+
+def inventario_de_texto(dados, aritmetica=DECIMAL):
+    num = aritmetica.de_texto
+    inventory = Inventario()
+    for m, lotes in dados.items():
+        fila = inventory.fila(m)
+        for qty, cost, date, origem, is_ext, *id_lote in lotes:
+            fila.adicionar(Lote(num(qty), num(cost), date, origem, is_ext, dia_ordinal(date), *id_lote))
+    return inventory
+
+
+def capturar_estado(inventory, bt, ultimo_grupo, aritmetica=DECIMAL):
+    import pandas as pd
+    return {
+        'versao': VERSAO_ESTADO,
+        'aritmetica': aritmetica.descricao(),
+        'ultimo_grupo': pd.Timestamp(ultimo_grupo).isoformat() if ultimo_grupo is not None else None,
+        'inventario': inventario_para_texto(inventory),
+        'bt_pendentes': (
+            [[m, str(q), str(c), d] for m, q, c, d in bt.pendentes()] if bt is not None else None
+        ),
+    }
+
+
+def restaurar_estado(dados, aritmetica=DECIMAL):
+    import pandas as pd
+    from motor_fifo.nucleo import RetiradasBT
+
+    if dados.get('versao') != VERSAO_ESTADO:
+        raise ValueError(f"Versão de snapshot não suportada: {dados.get('versao')}")
+    if dados.get('aritmetica') != aritmetica.descricao():
+        raise ValueError(f"Snapshot gravado com aritmética {dados.get('aritmetica')}, "
+                         f"não {aritmetica.descricao()}")
+    num = aritmetica.de_texto
+    inventory = inventario_de_texto(dados['inventario'], aritmetica)
+
+    bt = None
+    if dados['bt_pendentes'] is not None:
+        pend = dados['bt_pendentes']
+        bt = RetiradasBT([p[0] for p in pend], [num(p[1]) for p in pend],
+                         [num(p[2]) for p in pend], [p[3] for p in pend])
+
+    ultimo = pd.Timestamp(dados['ultimo_grupo']) if dados['ultimo_grupo'] else None
+    return inventory, bt, ultimo
+
+
+def guardar_estado(caminho, inventory, bt, ultimo_grupo, aritmetica=DECIMAL):
+    dados = capturar_estado(inventory, bt, ultimo_grupo, aritmetica)
+    # Escrita atómica: um snapshot meio escrito estragaria a corrida seguinte
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    fd, tmp = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+
+def carregar_estado(caminho, aritmetica=DECIMAL):
+    with open(caminho, encoding='utf-8') as f:
+        return restaurar_estado(json.load(f), aritmetica)
+
+
+def exportar_resumo_inventario(inventory, caminho='Estado_Inventario_Final.csv', aritmetica=DECIMAL):
+    # Mesmo formato do Estado_Inventario_Final_BT.csv descrito em "Logico motor BT.md"
+    import pandas as pd
+    linhas = [(m, aritmetica.qtd_float(f.qtd_total, m), aritmetica.custo_float(f.custo_total))
+              for m, f in inventory.items() if f]
+    pd.DataFrame(linhas, columns=['Moeda', 'Quantidade', 'Custo_Total']).to_csv(
+        caminho, sep=';', index=False, decimal=',')
+
+
+def verificar_incremental(binance_input, bt_input, corte=None):
+    """Prova que corrida incremental == recálculo completo.
+
+    Processa o ledger todo de uma vez; depois processa até `corte` (por omissão o
+    grupo do meio), grava e relê o snapshot, e retoma a partir dele. Os relatórios
+    concatenados e o estado final têm de ser iguais. Devolve True/False.
+    """
+    import pandas as pd
+    from motor_fifo.colunar import carregar_ledger, carregar_retiradas_bt, processar_eventos
+
+    completo = carregar_ledger(binance_input)
+    inv_full = Inventario()
+    bt_full = carregar_retiradas_bt(bt_input)
+    rel_full = processar_eventos(completo, bt_full, inventory=inv_full)
+
+    if corte is None:
+        if completo.n_grupos < 2:
+            print("Ledger pequeno demais para verificar.")
+            return True
+        corte = completo.chaves[completo.n_grupos // 2]
+    corte = pd.Timestamp(corte)
+
+    inv_a = Inventario()
+    bt_a = carregar_retiradas_bt(bt_input)
+    rel_a = processar_eventos(carregar_ledger(binance_input, ate=corte), bt_a, inventory=inv_a)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        snap = os.path.join(pasta, 'estado.json')
+        guardar_estado(snap, inv_a, bt_a, corte)
+        inv_b, bt_b, depois_de = carregar_estado(snap)
+    rel_b = processar_eventos(carregar_ledger(binance_input, depois_de=depois_de), bt_b, inventory=inv_b)
+
+    ok = True
+    for nome, full, a, b in zip(('IRS', 'Swaps', 'Reconciliação'), rel_full, rel_a, rel_b):
+        if full != a + b:
+            n = next((i for i, (x, y) in enumerate(zip(full, a + b)) if x != y), min(len(full), len(a + b)))
+            print(f"DIFERENÇA em {nome}: linha {n} ({len(full)} completo vs {len(a) + len(b)} incremental)")
+            ok = False
+
+    fim_full = capturar_estado(inv_full, bt_full, completo.ultimo_grupo)
+    fim_inc = capturar_estado(inv_b, bt_b, completo.ultimo_grupo)
+    if fim_full != fim_inc:
+        print("DIFERENÇA no estado final do inventário / retiradas BT pendentes")
+        ok = False
+
+    print(f"Verificação incremental (corte {corte}): {'OK' if ok else 'FALHOU'}")
+    return ok
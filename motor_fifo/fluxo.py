@@ -0,0 +1,122 @@
+import csv
+import heapq
+import os
+import tempfile
+
+import pandas as pd
+
+from motor_fifo.agrupamento import AgrupamentoLacuna, chaves_por_linha
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.colunar import segmentar
+
+# Leitura em fluxo do export Binance: blocos de tamanho fixo, só as colunas que o
+# motor usa, com dtype explícito nas colunas de texto. O Change fica com a inferência
+# do read_csv (float64 no export normal), tal como no v4: lido como texto, valores
+# em notação científica ('1e-05') seriam estragados pelas regras do clean_val_decimal.
+# O último Time_Group de cada bloco pode continuar no bloco seguinte, por isso fica
+# pendente e é juntado ao bloco seguinte antes de ir para o motor.
+# Empates de UTC_Time seguem a ordem do ficheiro (ordenação estável). Com um
+# AgrupamentoLacuna ficam pendentes os grupos a menos de uma lacuna do fim do bloco.
+COLUNAS = ['UTC_Time', 'Operation', 'Coin', 'Change']
+DTYPES = {'UTC_Time': str, 'Operation': str, 'Coin': str}
+BLOCO_PADRAO = 200_000
+
+
+def _blocos(caminho, bloco):
+    return pd.read_csv(caminho, usecols=COLUNAS, dtype=DTYPES, chunksize=bloco)
+
+
+def esta_ordenado(caminho, bloco=BLOCO_PADRAO):
+    """Passagem rápida só pela coluna UTC_Time para confirmar ordem cronológica."""
+    ultimo = None
+    for df in pd.read_csv(caminho, usecols=['UTC_Time'], dtype=str, chunksize=bloco):
+        t = pd.to_datetime(df['UTC_Time']).dropna()
+        if t.empty:
+            continue
+        if not t.is_monotonic_increasing or (ultimo is not None and t.iloc[0] < ultimo):
+            return False
+        ultimo = t.iloc[-1]
+    return True
+
+
+def ordenar_externo(caminho, destino, bloco=BLOCO_PADRAO):
+    """Merge sort externo por UTC_Time com memória limitada a um bloco.
+
+    Cada bloco é ordenado e gravado como uma 'run' temporária; as runs são depois
+    fundidas com heapq.merge (estável: empates mantêm a ordem do ficheiro).
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        runs = []
+        for k, df in enumerate(_blocos(caminho, bloco)):
+            t = pd.to_datetime(df['UTC_Time'])
+            df = df[t.notna()].assign(_ns=t[t.notna()].astype('int64'))
+            df = df.sort_values('_ns', kind='stable')
+            run = os.path.join(pasta, f'run_{k:05d}.csv')
+            df[['_ns'] + COLUNAS].to_csv(run, index=False, header=False)
+            runs.append(run)
+
+        ficheiros = [open(r, newline='', encoding='utf-8') for r in runs]
+        try:
+            leitores = [((int(l[0]), l[1:]) for l in csv.reader(f)) for f in ficheiros]
+            with open(destino, 'w', newline='', encoding='utf-8') as out:
+                w = csv.writer(out)
+                w.writerow(COLUNAS)
+                for _, linha in heapq.merge(*leitores, key=lambda x: x[0]):
+                    w.writerow(linha)
+        finally:
+            for f in ficheiros:
+                f.close()
+    return destino
+
+
+def ledgers_em_blocos(caminho, bloco=BLOCO_PADRAO, janela='2s', depois_de=None, aritmetica=DECIMAL):
+    """Gera Ledgers consecutivos, cada um com grupos completos, para o motor colunar.
+
+    Se o ficheiro não estiver ordenado por UTC_Time, ordena-o primeiro com
+    ordenar_externo() para um ficheiro temporário.
+    """
+    if esta_ordenado(caminho, bloco):
+        yield from _ledgers_ordenados(caminho, bloco, janela, depois_de, aritmetica)
+        return
+
+    print(f"Aviso: {caminho} não está ordenado por UTC_Time; a ordenar em disco...")
+    with tempfile.TemporaryDirectory() as pasta:
+        ordenado = ordenar_externo(caminho, os.path.join(pasta, 'ordenado.csv'), bloco)
+        yield from _ledgers_ordenados(ordenado, bloco, janela, depois_de, aritmetica)
+
+
+def _ledgers_ordenados(caminho, bloco, janela, depois_de, aritmetica):
+    pendente = None
+    for df in _blocos(caminho, bloco):
+        df['UTC_Time'] = pd.to_datetime(df['UTC_Time'])
+        df = df[df['UTC_Time'].notna()]
+        if pendente is not None:
+            df = pd.concat([pendente, df], ignore_index=True)
+        if df.empty:
+            continue
+
+        tg = chaves_por_linha(df['UTC_Time'], df['Operation'], janela)
+        if depois_de is not None:
+            df, tg = df[tg > depois_de], tg[tg > depois_de]
+            if df.empty:
+                pendente = None
+                continue
+
+        if isinstance(janela, AgrupamentoLacuna):
+            # Grupos a menos de uma lacuna do fim do bloco ainda podem crescer
+            aberto = janela.em_aberto(df['UTC_Time'].to_numpy(dtype='datetime64[ns]').view('int64'),
+                                      df['Operation'].to_numpy(dtype=object))
+        else:
+            aberto = (tg == tg.iloc[-1]).to_numpy()
+        pendente = df[aberto]
+        pronto = df[~aberto]
+        if len(pronto):
+            yield _ledger(pronto, janela, aritmetica)
+
+    if pendente is not None and len(pendente):
+        yield _ledger(pendente, janela, aritmetica)
+
+
+def _ledger(df, janela, aritmetica):
+    df = df.assign(Val_Dec=aritmetica.parse(df['Change'], df['Coin']))
+    return segmentar(df, janela, ordenacao='stable')
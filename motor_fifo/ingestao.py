@@ -0,0 +1,111 @@
+import glob
+import heapq
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from motor_fifo.valores import parse_coluna
+
+# Junta exports parciais da Binance (a Binance só deixa descarregar o ledger por
+# intervalos de datas) num único export por ordem cronológica, em vez de os colar à mão.
+#
+# Cada ficheiro é lido num processo: valores em texto tal como vêm, UTC_Time em ns,
+# ordenação estável por UTC_Time e uma impressão digital de cada linha (hash de 64
+# bits de todas as colunas, com o instante em ns e o Change normalizado, para a
+# mesma linha bater certo em dois downloads). Os ficheiros já ordenados são depois
+# fundidos (heapq.merge, k-way) e as linhas repetidas onde os intervalos se
+# sobrepõem ficam só uma vez.
+#
+# Uma linha repetida dentro do mesmo ficheiro é legítima (dois juros iguais no mesmo
+# segundo): a chave de deduplicação é (impressão, nº da ocorrência no ficheiro), e a
+# linha fica tantas vezes quantas aparece no ficheiro que a tem mais vezes.
+#
+# Nos empates de UTC_Time ganha o ficheiro que vem primeiro por nome, e dentro dele a
+# ordem do ficheiro: partes de um export ordenado voltam a dar esse export.
+
+
+def listar_exports(origem, excluir=None):
+    """Ficheiros de `origem`: uma pasta (todos os .csv) ou um glob, por ordem de nome."""
+    padrao = os.path.join(origem, '*.csv') if os.path.isdir(origem) else origem
+    excluir = os.path.abspath(excluir) if excluir else None
+    return [f for f in sorted(glob.glob(padrao)) if os.path.abspath(f) != excluir]
+
+
+def _ns(utc):
+    # Com ou sem fuso: ns UTC; NaT fica no mínimo do int64 (vai para o início)
+    if utc.dt.tz is not None:
+        utc = utc.dt.tz_convert('UTC').dt.tz_localize(None)
+    return utc.dt.as_unit('ns').to_numpy().view('int64')
+
+
+def ler_parte(caminho):
+    """Lê um export parcial. Devolve (colunas, DataFrame em texto ordenado por UTC_Time,
+    ns, impressões, ocorrências), as três últimas em arrays pela ordem do DataFrame."""
+    df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    ns = _ns(pd.to_datetime(df['UTC_Time'].replace('', None)))
+    normal = df.copy()
+    normal['UTC_Time'] = ns
+    normal['Change'] = [str(v.normalize()) for v in parse_coluna(df['Change'].replace('', None))]
+    impressao = pd.util.hash_pandas_object(normal, index=False).to_numpy()
+    ocorrencia = pd.Series(impressao).groupby(impressao).cumcount().to_numpy()
+    ordem = np.argsort(ns, kind='stable')
+    return list(df.columns), df.take(ordem).reset_index(drop=True), ns[ordem], impressao[ordem], ocorrencia[ordem]
+
+
+def fundir(partes):
+    """k-way merge das partes já ordenadas, sem as linhas repetidas. Devolve (df, repetidas)."""
+    if not partes:
+        return pd.DataFrame(), 0
+    fluxos = [zip(ns.tolist(), [k] * len(ns), range(len(ns))) for k, (_, _, ns, _, _) in enumerate(partes)]
+    chaves = [list(zip(imp.tolist(), oc.tolist())) for _, _, _, imp, oc in partes]
+    inicio = np.cumsum([0] + [len(df) for _, df, _, _, _ in partes]).tolist()
+    vistas, posicoes, repetidas = set(), [], 0
+    for _, k, i in heapq.merge(*fluxos):
+        chave = chaves[k][i]
+        if chave in vistas:
+            repetidas += 1
+            continue
+        vistas.add(chave)
+        posicoes.append(inicio[k] + i)
+    todas = pd.concat([df for _, df, _, _, _ in partes], ignore_index=True)
+    return todas.take(posicoes).reset_index(drop=True), repetidas
+
+
+def ingerir(origem, destino=None, processos=None):
+    """Junta os exports parciais de `origem` (pasta ou glob) num só, por ordem de UTC_Time.
+
+    processos: nº de processos de leitura (um ficheiro por processo); por omissão um
+    por CPU. destino: grava o export junto neste CSV (substituído de uma vez no fim);
+    é excluído da origem se lá estiver. Devolve o DataFrame junto (valores em texto).
+    """
+    ficheiros = listar_exports(origem, excluir=destino)
+    if not ficheiros:
+        raise FileNotFoundError(f"Nenhum export encontrado em {origem}")
+    processos = min(processos or os.cpu_count() or 1, len(ficheiros))
+    if processos > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            partes = list(executor.map(ler_parte, ficheiros))
+    else:
+        partes = [ler_parte(f) for f in ficheiros]
+
+    colunas = partes[0][0]
+    for caminho, (cols, _, _, _, _) in zip(ficheiros, partes):
+        if cols != colunas:
+            raise ValueError(f"{caminho}: colunas {cols} diferentes das de {ficheiros[0]} ({colunas})")
+    df, repetidas = fundir(partes)
+    print(f"Ingestão: {len(ficheiros)} exports, {len(df)} linhas ({repetidas} repetidas por sobreposição removidas)")
+
+    if destino:
+        pasta = os.path.dirname(os.path.abspath(destino))
+        fd, tmp = tempfile.mkstemp(dir=pasta, suffix='.csv')
+        os.close(fd)
+        try:
+            df.to_csv(tmp, index=False)
+            os.replace(tmp, destino)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return df
@@ -0,0 +1,162 @@
+import heapq
+from collections import deque
+
+
+class Lote:
+    # __slots__ em vez de dict por lote: milhares de lotes de Earn/Staking por moeda
+    # date é o texto que vai para os relatórios; dia o mesmo dia já convertido
+    # (motor_fifo.datas.dia_ordinal), para o prazo de detenção ser uma subtração.
+    # id só é preenchido quando a corrida grava o diário de lotes (motor_fifo.lotes)
+    __slots__ = ('qty', 'cost', 'date', 'origem', 'is_ext', 'dia', 'id')
+
+    def __init__(self, qty, cost, date, origem='', is_ext=False, dia=None, id=None):
+        self.qty = qty
+        self.cost = cost
+        self.date = date
+        self.origem = origem
+        self.is_ext = is_ext
+        self.dia = dia
+        self.id = id
+
+    def __repr__(self):
+        return f"Lote(qty={self.qty!r}, cost={self.cost!r}, date={self.date!r}, origem={self.origem!r})"
+
+
+class FilaLotes:
+    """Fila FIFO de lotes de uma moeda, com totais de quantidade e custo sempre atualizados."""
+
+    __slots__ = ('_lotes', 'qtd_total', 'custo_total')
+
+    def __init__(self, lotes=()):
+        self._lotes = deque()
+        self.qtd_total = 0
+        self.custo_total = 0
+        for lote in lotes:
+            self.adicionar(lote)
+
+    def __len__(self):
+        return len(self._lotes)
+
+    def __bool__(self):
+        return bool(self._lotes)
+
+    def __iter__(self):
+        return iter(self._lotes)
+
+    def adicionar(self, lote):
+        self._lotes.append(lote)
+        self.qtd_total += lote.qty
+        self.custo_total += lote.cost
+
+    def inserir_por_data(self, lote):
+        # Lote que volta de uma transferência: entra antes do primeiro lote mais recente,
+        # para a fila continuar por ordem de aquisição (dia None conta como o mais recente)
+        if lote.dia is not None:
+            for k, atual in enumerate(self._lotes):
+                if atual.dia is None or atual.dia > lote.dia:
+                    self._lotes.insert(k, lote)
+                    self.qtd_total += lote.qty
+                    self.custo_total += lote.cost
+                    return
+        self.adicionar(lote)
+
+    def primeiro(self):
+        return self._lotes[0]
+
+    def retirar(self):
+        # O(1): substitui o list.pop(0)
+        lote = self._lotes.popleft()
+        self.qtd_total -= lote.qty
+        self.custo_total -= lote.cost
+        return lote
+
+    def reduzir_primeiro(self, qtd, custo):
+        # Consumo parcial: o lote da cabeça fica com o que sobra
+        lote = self._lotes[0]
+        lote.qty -= qtd
+        lote.cost -= custo
+        self.qtd_total -= qtd
+        self.custo_total -= custo
+
+    def consumir(self, qtd, custo_de=None):
+        """Consome `qtd` pela ordem FIFO.
+
+        Gera (lote, qtd_consumida, custo_consumido) para cada lote tocado, ANTES de o
+        retirar/reduzir, para o chamador poder ler a data e a origem do lote.
+        custo_de(cost, qty, vender) substitui o custo proporcional (ex.: ponto fixo).
+        """
+        restante = qtd
+        while restante > 0 and self._lotes:
+            lote = self.primeiro()
+            vender = min(lote.qty, restante)
+            if custo_de is not None:
+                custo = custo_de(lote.cost, lote.qty, vender)
+            else:
+                custo = (lote.cost / lote.qty) * vender if lote.qty > 0 else lote.cost * 0
+            yield lote, vender, custo
+            if lote.qty <= restante:
+                restante -= lote.qty
+                self.retirar()
+            else:
+                self.reduzir_primeiro(vender, custo)
+                restante = 0
+
+
+class FilaPrioridade(FilaLotes):
+    """Fila de lotes pela ordem de uma chave (HIFO, lotes designados) em vez da ordem
+    de chegada, num heap. chave(lote) é calculada uma vez, quando o lote entra; empates
+    seguem a chegada, ou a ordem inversa com lifo=True (chave=None e lifo=True é LIFO
+    puro). Um consumo parcial mantém o lote na mesma posição."""
+
+    __slots__ = ('_chave', '_seq', '_passo')
+
+    def __init__(self, chave=None, lotes=(), lifo=False):
+        self._lotes = []
+        self.qtd_total = 0
+        self.custo_total = 0
+        self._chave = chave
+        self._seq = 0
+        self._passo = -1 if lifo else 1
+        for lote in lotes:
+            self.adicionar(lote)
+
+    def __iter__(self):
+        return (lote for _, _, lote in sorted(self._lotes))
+
+    def adicionar(self, lote):
+        heapq.heappush(self._lotes, (self._chave(lote) if self._chave else 0, self._seq, lote))
+        self._seq += self._passo
+        self.qtd_total += lote.qty
+        self.custo_total += lote.cost
+
+    def inserir_por_data(self, lote):
+        self.adicionar(lote)
+
+    def primeiro(self):
+        return self._lotes[0][2]
+
+    def retirar(self):
+        lote = heapq.heappop(self._lotes)[2]
+        self.qtd_total -= lote.qty
+        self.custo_total -= lote.cost
+        return lote
+
+    def reduzir_primeiro(self, qtd, custo):
+        lote = self._lotes[0][2]
+        lote.qty -= qtd
+        lote.cost -= custo
+        self.qtd_total -= qtd
+        self.custo_total -= custo
+
+
+class Inventario(dict):
+    """moeda -> FilaLotes"""
+
+    def fila(self, moeda):
+        fila = self.get(moeda)
+        if fila is None:
+            fila = self[moeda] = FilaLotes()
+        return fila
+
+    def totais(self):
+        return {m: (f.qtd_total, f.custo_total) for m, f in self.items()}
@@ -0,0 +1,290 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from motor_fifo.aritmetica import DECIMAL
+
+# Diário de lotes: cada criação, consumo (total ou parcial) e herança por swap fica
+# registado num log só de acréscimo, para responder depois a "que lotes de BTC tinha
+# abertos a 31/12/2023 e com que custo?" sem voltar a correr o motor.
+#
+#     <pasta>/eventos.bin   registos de largura fixa (EVENTO), pela ordem do motor
+#     <pasta>/nomes.txt     moedas, datas e origens; os eventos guardam o número da linha
+#     <pasta>/meta.json     versão, aritmética, nº de eventos e próximo id de lote
+#     <pasta>/indice.npz    índice por moeda/instante e por lote (refeito se o log cresceu)
+#
+# Cada evento leva o estado do lote DEPOIS dele (resta_qtd/resta_custo), já em float:
+# o estado de um lote num instante é o do seu último evento até lá, sem somar
+# consumos. Os valores exatos continuam no snapshot (motor_fifo.estado).
+
+VERSAO_DIARIO = 1
+
+CRIACAO, HERANCA, VENDA, LEVANTAMENTO, TROCA, TAXA = range(6)
+TIPOS = ('criacao', 'heranca', 'venda', 'levantamento', 'troca', 'taxa')
+
+EVENTO = np.dtype([
+    ('chave', '<i8'),        # Time_Group do evento (ns desde 1970)
+    ('lote', '<i8'),
+    ('pai', '<i8'),          # lote consumido no swap que deu origem a este (-1 se nenhum)
+    ('moeda', '<i4'),
+    ('data', '<i4'),         # data de aquisição do lote (texto dos relatórios)
+    ('origem', '<i4'),
+    ('tipo', 'i1'),
+    ('externo', 'i1'),
+    ('qtd', '<f8'),          # criada ou consumida neste evento
+    ('custo', '<f8'),
+    ('resta_qtd', '<f8'),    # o que fica no lote depois do evento
+    ('resta_custo', '<f8'),
+])
+
+# Eventos guardados em memória antes de ir para o disco (modo fluxo)
+LIMITE_BUFFER = 200_000
+
+
+def _ler_meta(pasta):
+    with open(os.path.join(pasta, 'meta.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_json(caminho, dados):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(caminho)), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+
+def _ler_nomes(pasta):
+    with open(os.path.join(pasta, 'nomes.txt'), encoding='utf-8') as f:
+        return f.read().split('\n')[:-1]
+
+
+class DiarioLotes:
+    """Escreve o diário de lotes de uma corrida (ver o topo do módulo).
+
+    anexar=True continua o diário existente (modo incremental, com os ids de lote
+    vindos do snapshot); senão começa um novo.
+    """
+
+    def __init__(self, pasta, aritmetica=DECIMAL, anexar=False):
+        self.pasta = pasta
+        self.aritmetica = aritmetica
+        os.makedirs(pasta, exist_ok=True)
+        self._eventos = []
+        self._nomes = {}
+        self._nomes_novos = []
+        self.n_eventos = 0
+        self.proximo_id = 0
+        if anexar and os.path.exists(os.path.join(pasta, 'meta.json')):
+            meta = _ler_meta(pasta)
+            if meta.get('versao') != VERSAO_DIARIO:
+                raise ValueError(f"Versão de diário não suportada: {meta.get('versao')}")
+            if meta.get('aritmetica') != aritmetica.descricao():
+                raise ValueError(f"Diário gravado com aritmética {meta.get('aritmetica')}, "
+                                 f"não {aritmetica.descricao()}")
+            self.n_eventos, self.proximo_id = meta['eventos'], meta['proximo_id']
+            self._nomes = {s: k for k, s in enumerate(_ler_nomes(pasta))}
+            # Um diário interrompido a meio pode ter eventos para além do meta: descartados
+            with open(os.path.join(pasta, 'eventos.bin'), 'r+b') as f:
+                f.truncate(self.n_eventos * EVENTO.itemsize)
+        else:
+            for nome in ('eventos.bin', 'nomes.txt'):
+                open(os.path.join(pasta, nome), 'wb').close()
+            self._gravar_meta()
+
+    def _nome(self, texto):
+        k = self._nomes.get(texto)
+        if k is None:
+            k = self._nomes[texto] = len(self._nomes)
+            self._nomes_novos.append(texto)
+        return k
+
+    def criar(self, chave, moeda, lote, pai=None):
+        """Novo lote no inventário; recebe aqui o seu id. pai: lote trocado num swap."""
+        lote.id = self.proximo_id
+        self.proximo_id += 1
+        arit = self.aritmetica
+        qtd, custo = arit.qtd_float(lote.qty, moeda), arit.custo_float(lote.cost)
+        self._eventos.append((
+            chave, lote.id, -1 if pai is None else pai.id, self._nome(moeda), self._nome(lote.date),
+            self._nome(lote.origem), CRIACAO if pai is None else HERANCA, lote.is_ext, qtd, custo, qtd, custo,
+        ))
+        if len(self._eventos) >= LIMITE_BUFFER:
+            self.gravar()
+
+    def consumir(self, chave, moeda, lote, qtd, custo, tipo):
+        """Consumo de qtd/custo do lote, com o lote ainda no estado de ANTES do consumo."""
+        if lote.id is None:
+            # Lote de um snapshot anterior ao diário: passa a existir a partir daqui
+            self.criar(chave, moeda, lote)
+        arit = self.aritmetica
+        self._eventos.append((
+            chave, lote.id, -1, self._nome(moeda), self._nome(lote.date), self._nome(lote.origem), tipo,
+            lote.is_ext, arit.qtd_float(qtd, moeda), arit.custo_float(custo),
+            arit.qtd_float(lote.qty - qtd, moeda), arit.custo_float(lote.cost - custo),
+        ))
+        if len(self._eventos) >= LIMITE_BUFFER:
+            self.gravar()
+
+    def gravar(self):
+        # Primeiro os nomes e os eventos, o meta por último: é ele que diz até onde o log vale
+        if self._nomes_novos:
+            with open(os.path.join(self.pasta, 'nomes.txt'), 'a', encoding='utf-8') as f:
+                f.write(''.join(f"{s}\n" for s in self._nomes_novos))
+            self._nomes_novos = []
+        if self._eventos:
+            with open(os.path.join(self.pasta, 'eventos.bin'), 'ab') as f:
+                f.write(np.array(self._eventos, dtype=EVENTO).tobytes())
+            self.n_eventos += len(self._eventos)
+            self._eventos = []
+        self._gravar_meta()
+
+    def _gravar_meta(self):
+        _gravar_json(os.path.join(self.pasta, 'meta.json'), {
+            'versao': VERSAO_DIARIO,
+            'aritmetica': self.aritmetica.descricao(),
+            'eventos': self.n_eventos,
+            'proximo_id': self.proximo_id,
+        })
+
+
+def _instante(quando):
+    return pd.Timestamp(quando).value
+
+
+class IndiceLotes:
+    """Consultas sobre o diário: carteira num instante, lotes abertos e linhagem de um lote.
+
+    Os eventos são lidos por memmap; o índice (ordem por moeda/instante, ordem por
+    lote e posição de criação de cada lote) fica em indice.npz e só é refeito quando
+    o diário tem mais eventos do que os indexados.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        meta = _ler_meta(pasta)
+        n = meta['eventos']
+        self.eventos = (np.memmap(os.path.join(pasta, 'eventos.bin'), dtype=EVENTO, mode='r', shape=(n,))
+                        if n else np.zeros(0, dtype=EVENTO))
+        self.nomes = np.array(_ler_nomes(pasta), dtype=object)
+        self._moeda_id = {s: k for k, s in enumerate(self.nomes)}
+
+        caminho = os.path.join(pasta, 'indice.npz')
+        indice = None
+        if os.path.exists(caminho):
+            with np.load(caminho) as z:
+                if int(z['n']) == n:
+                    indice = {k: z[k] for k in z.files}
+        if indice is None:
+            indice = self._indexar(n, meta['proximo_id'])
+            fd, tmp = tempfile.mkstemp(dir=pasta, suffix='.npz')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **indice)
+            os.replace(tmp, caminho)
+        self._por_moeda = indice['por_moeda']
+        self._inicio_moeda = indice['inicio_moeda']
+        self._por_lote = indice['por_lote']
+        self._inicio_lote = indice['inicio_lote']
+
+    def _indexar(self, n, n_lotes):
+        ev = self.eventos
+        # lexsort é estável: dentro do mesmo instante mantém a ordem do motor
+        por_moeda = np.lexsort((ev['chave'], ev['moeda']))
+        inicio_moeda = np.searchsorted(ev['moeda'][por_moeda], np.arange(len(self.nomes) + 1))
+        por_lote = np.argsort(ev['lote'], kind='stable')
+        inicio_lote = np.searchsorted(ev['lote'][por_lote], np.arange(n_lotes + 1))
+        return {'n': np.int64(n), 'por_moeda': por_moeda, 'inicio_moeda': inicio_moeda,
+                'por_lote': por_lote, 'inicio_lote': inicio_lote}
+
+    def _ultimos(self, pos):
+        # Último evento de cada lote entre as posições dadas (já por ordem do log)
+        lotes = self.eventos['lote'][pos]
+        _, k = np.unique(lotes[::-1], return_index=True)
+        return np.sort(pos[len(pos) - 1 - k])
+
+    def _tabela(self, pos, colunas):
+        ev = self.eventos[pos]
+        dados = {}
+        for nome, campo in colunas:
+            if campo in ('moeda', 'data', 'origem'):
+                dados[nome] = self.nomes[ev[campo]] if len(ev) else np.array([], dtype=object)
+            elif campo == 'chave':
+                dados[nome] = pd.to_datetime(ev['chave'])
+            elif campo == 'tipo':
+                dados[nome] = np.array(TIPOS, dtype=object)[ev['tipo']]
+            elif campo == 'externo':
+                dados[nome] = ev['externo'].astype(bool)
+            else:
+                dados[nome] = np.asarray(ev[campo])
+        return pd.DataFrame(dados)
+
+    def lotes_abertos(self, moeda, quando):
+        """Lotes da moeda com saldo no instante `quando` (inclusivo), pela ordem FIFO."""
+        k = self._moeda_id.get(moeda)
+        if k is None or k + 1 >= len(self._inicio_moeda):
+            return self._tabela(np.zeros(0, dtype=np.int64), _COLS_LOTES)
+        a, b = self._inicio_moeda[k], self._inicio_moeda[k + 1]
+        pos = self._por_moeda[a:b]
+        pos = pos[:np.searchsorted(self.eventos['chave'][pos], _instante(quando), side='right')]
+        ultimos = self._ultimos(np.sort(pos))
+        abertos = ultimos[self.eventos['resta_qtd'][ultimos] > 0]
+        # Ordem FIFO = ordem de criação = ordem dos ids
+        return self._tabela(abertos[np.argsort(self.eventos['lote'][abertos], kind='stable')], _COLS_LOTES)
+
+    def carteira(self, quando):
+        """Quantidade e custo por moeda no instante `quando` (formato do Estado_Inventario_Final)."""
+        ev = self.eventos
+        pos = np.flatnonzero(ev['chave'] <= _instante(quando))
+        ultimos = self._ultimos(pos)
+        ultimos = ultimos[ev['resta_qtd'][ultimos] > 0]
+        moedas = ev['moeda'][ultimos]
+        n = len(self.nomes)
+        qtd = np.bincount(moedas, weights=ev['resta_qtd'][ultimos], minlength=n)
+        custo = np.bincount(moedas, weights=ev['resta_custo'][ultimos], minlength=n)
+        usadas = np.flatnonzero(np.bincount(moedas, minlength=n))
+        return pd.DataFrame({'Moeda': self.nomes[usadas], 'Quantidade': qtd[usadas], 'Custo_Total': custo[usadas]})
+
+    def _validar_lote(self, lote):
+        n_lotes = len(self._inicio_lote) - 1
+        if not 0 <= lote < n_lotes:
+            raise ValueError(f"Lote {lote} não existe no diário (ids de 0 a {n_lotes - 1})")
+
+    def eventos_do_lote(self, lote):
+        self._validar_lote(lote)
+        pos = self._por_lote[self._inicio_lote[lote]:self._inicio_lote[lote + 1]]
+        return self._tabela(pos, _COLS_EVENTOS)
+
+    def linhagem(self, lote):
+        """Eventos do lote e dos lotes de onde herdou o custo por swaps, do mais antigo ao próprio."""
+        self._validar_lote(lote)
+        cadeia = []
+        while lote >= 0:
+            cadeia.append(lote)
+            criacao = self._por_lote[self._inicio_lote[lote]]
+            lote = int(self.eventos['pai'][criacao])
+        pos = np.concatenate([self._por_lote[self._inicio_lote[l]:self._inicio_lote[l + 1]] for l in reversed(cadeia)])
+        return self._tabela(pos, _COLS_EVENTOS)
+
+    def descendentes(self, lote):
+        """Lotes criados (direta ou indiretamente) por swaps a partir deste."""
+        self._validar_lote(lote)
+        pai = self.eventos['pai']
+        filhos = {}
+        for p, l in zip(pai[pai >= 0].tolist(), self.eventos['lote'][pai >= 0].tolist()):
+            filhos.setdefault(p, []).append(l)
+        fila, vistos = [lote], []
+        while fila:
+            for l in filhos.get(fila.pop(), ()):
+                vistos.append(l)
+                fila.append(l)
+        return sorted(vistos)
+
+
+_COLS_LOTES = (('Lote', 'lote'), ('Moeda', 'moeda'), ('Data_Aquisicao', 'data'), ('Origem', 'origem'),
+               ('Externo', 'externo'), ('Quantidade', 'resta_qtd'), ('Custo', 'resta_custo'),
+               ('Ultimo_Evento', 'chave'))
+_COLS_EVENTOS = (('Instante', 'chave'), ('Lote', 'lote'), ('Pai', 'pai'), ('Moeda', 'moeda'), ('Tipo', 'tipo'),
+                 ('Qtd', 'qtd'), ('Custo', 'custo'), ('Resta_Qtd', 'resta_qtd'), ('Resta_Custo', 'resta_custo'),
+                 ('Data_Aquisicao', 'data'), ('Origem', 'origem'))
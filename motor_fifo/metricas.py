@@ -0,0 +1,155 @@
+import cProfile
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Instrumentação do motor: tempo por etapa, contagem de eventos por ramo e
+# distribuições (lotes consumidos por venda, candidatos varridos por depósito),
+# gravadas num JSON; e captura opcional de perfil (cProfile ou pyinstrument).
+#
+# Sem --metricas o motor recebe metricas=None. No v5 (motor_fifo.nucleo) o ciclo
+# principal conta em inteiros locais e não paga nada; o v4 usa o NULAS, que custa
+# quase nada: uma chamada vazia por evento, sem relógio.
+
+
+class Metricas:
+    def __init__(self, motor=''):
+        self.motor = motor
+        self.etapas = {}
+        self.contadores = Counter()
+        self.distribuicoes = {}
+        self.info = {}
+        self._inicio = time.perf_counter()
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.somar_tempo(nome, time.perf_counter() - inicio)
+
+    def somar_tempo(self, nome, segundos, chamadas=1):
+        e = self.etapas.get(nome)
+        if e is None:
+            e = self.etapas[nome] = [0.0, 0]
+        e[0] += segundos
+        e[1] += chamadas
+
+    def contar(self, nome, n=1):
+        self.contadores[nome] += n
+
+    def observar(self, nome, valor):
+        """Valor inteiro de uma distribuição (guardado como histograma)."""
+        d = self.distribuicoes.get(nome)
+        if d is None:
+            d = self.distribuicoes[nome] = Counter()
+        d[valor] += 1
+
+    def juntar(self, outra):
+        """Acrescenta as métricas de outro processo (modo paralelo) a estas."""
+        for nome, (s, c) in outra.etapas.items():
+            self.somar_tempo(nome, s, c)
+        self.contadores.update(outra.contadores)
+        for nome, hist in outra.distribuicoes.items():
+            self.distribuicoes.setdefault(nome, Counter()).update(hist)
+
+    def para_dict(self):
+        return {
+            'motor': self.motor,
+            'total_s': round(time.perf_counter() - self._inicio, 6),
+            **self.info,
+            'etapas': {n: {'s': round(s, 6), 'chamadas': c} for n, (s, c) in self.etapas.items()},
+            'contadores': dict(sorted(self.contadores.items())),
+            'distribuicoes': {n: _resumo(h) for n, h in sorted(self.distribuicoes.items())},
+        }
+
+    def guardar(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(self.para_dict(), f, ensure_ascii=False, indent=1)
+
+    def resumo(self):
+        """Texto curto com as etapas por tempo, para o terminal."""
+        total = time.perf_counter() - self._inicio
+        linhas = [f"Métricas ({self.motor}): {total:.2f}s"]
+        for nome, (s, c) in sorted(self.etapas.items(), key=lambda e: -e[1][0]):
+            linhas.append(f"  {nome:<28} {s:9.3f}s {100 * s / total if total else 0:5.1f}%  x{c}")
+        return '\n'.join(linhas)
+
+
+def _percentil(ordenados, acumulado, q):
+    alvo = q * acumulado[-1]
+    for v, a in zip(ordenados, acumulado):
+        if a >= alvo:
+            return v
+    return ordenados[-1]
+
+
+def _resumo(hist):
+    valores = sorted(hist)
+    acumulado, n = [], 0
+    for v in valores:
+        n += hist[v]
+        acumulado.append(n)
+    soma = sum(v * c for v, c in hist.items())
+    return {
+        'n': n, 'soma': soma, 'min': valores[0], 'max': valores[-1], 'media': round(soma / n, 4),
+        'p50': _percentil(valores, acumulado, 0.5),
+        'p95': _percentil(valores, acumulado, 0.95),
+        'p99': _percentil(valores, acumulado, 0.99),
+        'histograma': {str(v): hist[v] for v in valores},
+    }
+
+
+@contextmanager
+def perfilar(caminho):
+    """Perfil do bloco: .html com pyinstrument (opcional), qualquer outro com cProfile
+    (.prof, para snakeviz / pstats). Sem caminho não faz nada."""
+    if not caminho:
+        yield
+        return
+    if caminho.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("Perfil .html precisa do pyinstrument: pip install pyinstrument") from None
+        perfil = Profiler()
+        perfil.start()
+        try:
+            yield
+        finally:
+            perfil.stop()
+            with open(caminho, 'w', encoding='utf-8') as f:
+                f.write(perfil.output_html())
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        perfil.dump_stats(caminho)
+        print(f"Perfil gravado em {os.path.abspath(caminho)} (python -m pstats {caminho})")
+
+
+class _MetricasNulas:
+    # Para os motores que chamam as métricas sem testar None (v4): cada contar/observar
+    # é uma chamada de método que não faz nada
+    motor = ''
+
+    def etapa(self, nome):
+        return nullcontext()
+
+    def somar_tempo(self, nome, segundos, chamadas=1):
+        pass
+
+    def contar(self, nome, n=1):
+        pass
+
+    def observar(self, nome, valor):
+        pass
+
+
+NULAS = _MetricasNulas()
@@ -0,0 +1,302 @@
+from decimal import Decimal, getcontext
+
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.correspondencia import IndiceRetiradas
+from motor_fifo.datas import dia_ordinal, dias_de_chaves, status_isento
+from motor_fifo.inventario import Inventario, Lote
+
+# Núcleo do motor colunar: o ciclo de eventos (processar_eventos) e as estruturas que
+# ele percorre, sobre listas Python simples. Não importa pandas nem numpy, para quem
+# só precisa do ciclo (motor_fifo.rapido, a linha de comandos) arrancar em poucos ms;
+# a leitura do export com pandas e a escrita dos relatórios ficam em motor_fifo.colunar,
+# que reexporta estes nomes.
+
+# Mesma precisão do Motor_Binance_v4
+getcontext().prec = 60
+
+FIAT = ('EUR', 'BRL', 'USD', 'GBP')
+OPS_DEPOSITO = ('Deposit', 'Fiat Deposit')
+OPS_LEVANTAMENTO = ('Withdraw', 'Withdrawal')
+TOLERANCIA_BT = Decimal('0.00001')
+ORIGEM_HERDADA = "Levantamento Próprio (Herdado)"
+
+# Colunas (nome, tipo) dos 3 relatórios, pela ordem dos tuplos de processar_eventos
+ESQUEMA_IRS = (
+    ('Data_Venda', 'str'), ('Ativo', 'str'), ('Moeda_Venda', 'str'), ('Valor_Venda', 'float'),
+    ('Data_Aquisicao', 'str'), ('Custo_Aquisicao_USD', 'float'), ('Origem_Externa', 'str'),
+    ('Resultado', 'float'), ('Isento_365d', 'str'),
+)
+ESQUEMA_SWAPS = (
+    ('Data', 'str'), ('Hora', 'str'), ('Saiu', 'str'), ('Entrou', 'str'), ('Custo_Herdado', 'float'),
+    ('Data_Orig', 'str'),
+)
+ESQUEMA_RECONC = (
+    ('Data', 'str'), ('Hora', 'str'), ('Moeda', 'str'), ('Qtd', 'float'), ('Tipo', 'str'), ('Status', 'str'),
+)
+COLS_IRS = [c for c, _ in ESQUEMA_IRS]
+COLS_SWAPS = [c for c, _ in ESQUEMA_SWAPS]
+COLS_RECONC = [c for c, _ in ESQUEMA_RECONC]
+
+
+class Ledger:
+    """Ledger Binance ordenado e segmentado uma única vez em colunas Python/NumPy.
+
+    O grupo g ocupa as linhas inicios[g]:inicios[g+1]; data_s/hora_s são as
+    strings do Time_Group desse grupo (uma por grupo, não por linha) e chaves[g]
+    o próprio Time_Group (datetime64; ns em int no motor_fifo.rapido). Num
+    sub-ledger (motor_fifo.paralelo) linhas[i] é a posição da linha i no ledger
+    completo; no ledger completo é None.
+    """
+
+    __slots__ = ('coin', 'op', 'val', 'inicios', 'data_s', 'hora_s', 'chaves', 'linhas')
+
+    def __init__(self, coin, op, val, inicios, data_s, hora_s, chaves, linhas=None):
+        self.coin = coin
+        self.op = op
+        self.val = val
+        self.inicios = inicios
+        self.data_s = data_s
+        self.hora_s = hora_s
+        self.chaves = chaves
+        self.linhas = linhas
+
+    def __len__(self):
+        return len(self.coin)
+
+    @property
+    def n_grupos(self):
+        return len(self.inicios) - 1
+
+    @property
+    def ultimo_grupo(self):
+        if not len(self.chaves):
+            return None
+        import pandas as pd
+        return pd.Timestamp(self.chaves[-1])
+
+
+def chaves_ns(chaves):
+    """Time_Group de cada grupo em ns (int): aceita o array datetime64 do colunar ou a
+    lista de inteiros do motor_fifo.rapido."""
+    return chaves.astype('int64').tolist() if hasattr(chaves, 'astype') else list(chaves)
+
+
+class RetiradasBT:
+    __slots__ = ('moedas', 'qtds', 'custos', 'datas', 'dias', 'indice')
+
+    def __init__(self, moedas, qtds, custos, datas):
+        self.moedas = moedas
+        self.qtds = qtds
+        self.custos = custos
+        self.datas = datas
+        # Data BT convertida uma vez aqui, não a cada venda do lote
+        self.dias = [dia_ordinal(d) for d in datas]
+        self.indice = IndiceRetiradas(moedas, qtds)
+
+    def pendentes(self):
+        """Retiradas ainda não casadas: [(moeda, qtd, custo, data)] pela ordem do ficheiro."""
+        return [(self.moedas[p], self.qtds[p], self.custos[p], self.datas[p]) for p in self.indice.livres()]
+
+
+def processar_eventos(ledger, bt=None, fiat=FIAT, inventory=None, aritmetica=DECIMAL, origens=None,
+                      metricas=None, casamentos=None, diario=None, transito=None, decompor=False, resumo=None):
+    """Percorre os grupos do ledger sobre listas simples. Devolve (irs, swaps, reconc) em tuplos.
+
+    `aritmetica` tem de ser a mesma usada para carregar o ledger e as retiradas BT.
+    origens: três listas (irs, swaps, reconc) onde se acrescenta, por cada linha de
+             relatório, o índice da linha do ledger que a gerou (modo paralelo).
+    metricas: motor_fifo.metricas.Metricas; contagens por ramo e distribuições de
+              lotes por venda/swap e de candidatos BT varridos por depósito.
+    casamentos: motor_fifo.reconciliacao.Casamentos; os depósitos usam a retirada BT
+                da reconciliação em lote em vez da primeira compatível.
+    diario: motor_fifo.lotes.DiarioLotes onde se regista cada criação e consumo de lote.
+    transito: Inventario onde ficam os lotes levantados; um depósito sem retirada BT
+              herda deles custo e data (FIFO pela quantidade) em vez de custo zero, e só
+              o que faltar fica como Origem Externa (motor_fifo.cenarios).
+    decompor: trata cada grupo por moeda, com as taxas no FIFO (motor_fifo.decomposicao).
+    resumo: motor_fifo.resumo_irs.ResumoIRS onde se soma cada linha do relatório IRS.
+    """
+    inventory = Inventario() if inventory is None else inventory
+    report_irs, report_swaps, report_transf = [], [], []
+    orig_irs, orig_swaps, orig_transf = origens if origens is not None else (None, None, None)
+    fiat = frozenset(fiat)
+    coin, op, val = ledger.coin, ledger.op, ledger.val
+    inicios = ledger.inicios
+    indice_bt = bt.indice if bt is not None else None
+    arit = aritmetica
+    zero = arit.zero
+    custo_de = None if arit is DECIMAL else arit.custo
+    dinheiro = arit.dinheiro
+    tolerancias = {}
+    dias = dias_de_chaves(ledger.chaves)
+    chaves = chaves_ns(ledger.chaves) if casamentos is not None or diario is not None else None
+    # Contagens por ramo em inteiros locais, passadas às métricas só no fim
+    n_fiat_ign = n_casado = n_externo = n_rendimento = n_taxa = n_levant = n_venda = n_swap = n_taxa_fifo = 0
+    medir = metricas is not None
+    if decompor:
+        from motor_fifo.decomposicao import decompor_grupo, negociar
+    if diario is not None:
+        from motor_fifo.lotes import LEVANTAMENTO, TROCA, VENDA
+    if resumo is not None:
+        from motor_fifo.resumo_irs import classe_detencao
+
+    for g in range(ledger.n_grupos):
+        a, b = inicios[g], inicios[g + 1]
+        data_s, hora_s, dia = ledger.data_s[g], ledger.hora_s[g], dias[g]
+
+        if decompor:
+            # Só depósitos / rendimentos passam pela secção A e só levantamentos pela B
+            grupo = decompor_grupo(coin, op, val, a, b, fiat)
+            entradas, saidas = grupo.novos_lotes(), grupo.levantamentos
+        else:
+            entradas = [i for i in range(a, b) if val[i] > 0]
+            saidas = [i for i in range(a, b) if val[i] < 0]
+
+        # --- A) ENTRADAS ---
+        for i in entradas:
+            m = coin[i]
+            if m in fiat:
+                n_fiat_ign += 1
+                continue
+            qtd_in = val[i]
+            custo_in, data_aq, dia_aq, origem, is_ext = zero, data_s, dia, "Rendimento/Binance", False
+
+            if op[i] in OPS_DEPOSITO:
+                pos = None
+                if casamentos is not None:
+                    pos = casamentos.retirar(m, qtd_in, chaves[g])
+                    if pos is not None:
+                        indice_bt.consumir(pos)
+                elif indice_bt:
+                    tol = tolerancias.get(m)
+                    if tol is None:
+                        tol = tolerancias[m] = arit.qtd_de_decimal(TOLERANCIA_BT, m)
+                    livres = indice_bt.candidatos(m, qtd_in, tolerancia_abs=tol)
+                    if medir:
+                        metricas.observar('varrimento_bt', indice_bt.ultimo_varrimento)
+                    if livres:
+                        pos = min(livres)
+                        indice_bt.consumir(pos)
+                if pos is not None:
+                    custo_in, data_aq, dia_aq = bt.custos[pos], bt.datas[pos], bt.dias[pos]
+                    origem = "BitcoinTrade (Histórico)"
+                    n_casado += 1
+                elif transito is not None and transito.get(m):
+                    origem = ORIGEM_HERDADA
+                    n_externo += 1
+                else:
+                    origem, is_ext = "Origem Externa", True
+                    n_externo += 1
+                report_transf.append((data_s, hora_s, m, arit.qtd_float(qtd_in, m), 'ENTRADA', origem))
+                if origens is not None:
+                    orig_transf.append(i)
+                if origem is ORIGEM_HERDADA:
+                    restante = qtd_in
+                    herdados = [Lote(q, c, lv.date, origem, lv.is_ext, lv.dia)
+                                for lv, q, c in transito[m].consumir(qtd_in, custo_de)]
+                    for lote in herdados:
+                        restante -= lote.qty
+                    if restante > 0:
+                        herdados.append(Lote(restante, zero, data_s, "Origem Externa", True, dia))
+                    for lote in herdados:
+                        inventory.fila(m).adicionar(lote)
+                        if diario is not None:
+                            diario.criar(chaves[g], m, lote)
+                    continue
+            else:
+                n_rendimento += 1
+
+            lote = Lote(qtd_in, custo_in, data_aq, origem, is_ext, dia_aq)
+            inventory.fila(m).adicionar(lote)
+            if diario is not None:
+                diario.criar(chaves[g], m, lote)
+
+        if decompor and grupo.negocio:
+            vendas, trocas, taxas = negociar(grupo, coin, val, inventory, arit, custo_de, fiat, data_s, hora_s, dia,
+                                             report_irs.append, report_swaps.append, diario,
+                                             chaves[g] if chaves is not None else None, metricas, resumo)
+            n_venda += vendas
+            n_swap += trocas
+            n_taxa_fifo += taxas
+
+        if not saidas:
+            continue
+
+        # Entradas fiat do grupo: calculadas uma vez, não por cada saída
+        fiat_rows = [i for i in entradas if coin[i] in fiat]
+        if fiat_rows:
+            moeda_fiat = coin[fiat_rows[0]]
+            val_fiat_total = abs(sum(val[i] for i in fiat_rows))
+
+        # --- B) SAÍDAS ---
+        for i in saidas:
+            if 'Fee' in op[i]:
+                n_taxa += 1
+                continue
+            m_sai = coin[i]
+            qtd_sai = abs(val[i])
+
+            if op[i] in OPS_LEVANTAMENTO:
+                report_transf.append((data_s, hora_s, m_sai, arit.qtd_float(qtd_sai, m_sai), 'SAÍDA',
+                                      'Para Carteira Externa'))
+                n_levant += 1
+                if origens is not None:
+                    orig_transf.append(i)
+                if inventory.get(m_sai):
+                    lote = inventory[m_sai].retirar()
+                    if diario is not None:
+                        diario.consumir(chaves[g], m_sai, lote, lote.qty, lote.cost, LEVANTAMENTO)
+                    if transito is not None:
+                        transito.fila(m_sai).adicionar(lote)
+                continue
+
+            if fiat_rows:
+                n_venda += 1
+                lotes = 0
+                for lote, vender, custo_prop in inventory.fila(m_sai).consumir(qtd_sai, custo_de):
+                    lotes += 1
+                    if diario is not None:
+                        diario.consumir(chaves[g], m_sai, lote, vender, custo_prop, VENDA)
+                    receita_prop = arit.receita(val_fiat_total, moeda_fiat, vender, qtd_sai)
+                    linha = (
+                        data_s, m_sai, moeda_fiat, dinheiro(receita_prop), lote.date,
+                        dinheiro(custo_prop), lote.origem,
+                        dinheiro(receita_prop - custo_prop),
+                        status_isento(dia, lote.dia, lote.is_ext),
+                    )
+                    report_irs.append(linha)
+                    if resumo is not None:
+                        resumo.somar(linha, classe_detencao(dia, lote.dia, lote.is_ext))
+                    if origens is not None:
+                        orig_irs.append(i)
+                if medir:
+                    metricas.observar('lotes_por_venda', lotes)
+            else:
+                n_swap += 1
+                lotes = 0
+                for j in entradas:
+                    if inventory.get(m_sai):
+                        lv = inventory[m_sai].retirar()
+                        novo = Lote(val[j], lv.cost, lv.date, lv.origem, lv.is_ext, lv.dia)
+                        inventory.fila(coin[j]).adicionar(novo)
+                        if diario is not None:
+                            diario.consumir(chaves[g], m_sai, lv, lv.qty, lv.cost, TROCA)
+                            diario.criar(chaves[g], coin[j], novo, pai=lv)
+                        report_swaps.append((data_s, hora_s, m_sai, coin[j], arit.custo_float(lv.cost), lv.date))
+                        lotes += 1
+                        if origens is not None:
+                            orig_swaps.append(i)
+                if medir:
+                    metricas.observar('lotes_por_swap', lotes)
+
+    if medir:
+        for nome, n in (('linhas', len(coin)), ('grupos', ledger.n_grupos),
+                        ('entrada.fiat_ignorada', n_fiat_ign), ('entrada.deposito', n_casado + n_externo),
+                        ('entrada.rendimento', n_rendimento), ('bt.casado', n_casado),
+                        ('bt.externo', n_externo), ('saida.taxa_ignorada', n_taxa),
+                        ('saida.levantamento', n_levant), ('saida.venda_fiat', n_venda),
+                        ('saida.swap', n_swap)):
+            metricas.contar(nome, n)
+        if decompor:
+            metricas.contar('saida.taxa_fifo', n_taxa_fifo)
+    return report_irs, report_swaps, report_transf
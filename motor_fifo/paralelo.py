@@ -0,0 +1,244 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.colunar import FIAT, OPS_LEVANTAMENTO, Ledger, RetiradasBT, processar_eventos
+from motor_fifo.estado import inventario_de_texto, inventario_para_texto
+from motor_fifo.inventario import Inventario
+from motor_fifo.metricas import Metricas
+from motor_fifo.resumo_irs import ResumoIRS
+
+# FIFO paralelo por ativo.
+#
+# O inventário de uma moeda só depende de outra através de swaps (a saída passa o
+# lote para as entradas do grupo). Vendas para fiat, depósitos e levantamentos só
+# mexem na própria moeda, e a correspondência BT também é por moeda. Logo as moedas
+# ligadas por swaps formam componentes independentes, que podem correr em processos
+# separados; no fim as linhas dos relatórios voltam à ordem global.
+#
+# Casos que têm de bater certo com o motor sequencial:
+#  - Entradas fiat nunca entram no inventário, mas dão o valor da venda ao grupo:
+#    são copiadas para cada bloco que tem linhas nesse grupo.
+#  - Um grupo com entrada fiat é venda (não swap), mesmo com várias saídas.
+#  - Saídas fiat nunca têm lotes (só o levantamento gera linha): não ligam moedas.
+#
+# Valores e lotes atravessam os processos em texto (como no snapshot): fazer pickle
+# de centenas de milhares de Decimal custava mais do que o próprio FIFO.
+
+
+def _mascaras(ledger, fiat):
+    """Código da moeda e grupo de cada linha, e as máscaras entrada / fiat / saída que passa lote."""
+    codigos, moedas = pd.factorize(pd.Series(ledger.coin, dtype=object), use_na_sentinel=False)
+    grupo = np.repeat(np.arange(ledger.n_grupos), np.diff(ledger.inicios))
+    val = ledger.val
+    entrada = np.fromiter((v > 0 for v in val), dtype=bool, count=len(val))
+    saida = np.fromiter((v < 0 for v in val), dtype=bool, count=len(val))
+    e_fiat = np.isin(np.asarray(moedas, dtype=object), list(fiat))[codigos]
+    op = pd.Series(ledger.op, dtype=object)
+    # Mesmas regras do processar_eventos: taxas e levantamentos não passam lotes
+    passa_lote = ~(op.str.contains('Fee', regex=False, na=False) | op.isin(OPS_LEVANTAMENTO)).to_numpy()
+    return codigos, list(moedas), grupo, entrada, saida & ~e_fiat & passa_lote, e_fiat
+
+
+def _raizes(n_grupos, codigos, n_moedas, grupo, entrada, origem_swap, e_fiat):
+    # Com entrada fiat o grupo é venda, não swap
+    venda = np.zeros(n_grupos, dtype=bool)
+    venda[grupo[entrada & e_fiat]] = True
+    tem_origem = np.zeros(n_grupos, dtype=bool)
+    tem_origem[grupo[origem_swap & ~venda[grupo]]] = True
+    tem_destino = np.zeros(n_grupos, dtype=bool)
+    tem_destino[grupo[entrada & ~venda[grupo]]] = True
+    swap = tem_origem & tem_destino
+
+    # Num swap cada saída liga-se a todas as entradas: ficam todas no mesmo componente
+    ligadas = np.flatnonzero((origem_swap | entrada) & swap[grupo])
+    _, primeira = np.unique(grupo[ligadas], return_index=True)
+    ref = np.repeat(codigos[ligadas[primeira]], np.diff(np.append(primeira, len(ligadas))))
+    arestas = np.unique(np.stack([codigos[ligadas], ref], axis=1), axis=0).tolist() if len(ligadas) else []
+
+    pai = list(range(n_moedas))
+
+    def raiz(c):
+        while pai[c] != c:
+            pai[c] = pai[pai[c]]
+            c = pai[c]
+        return c
+
+    for x, y in arestas:
+        rx, ry = raiz(x), raiz(y)
+        if rx != ry:
+            pai[max(rx, ry)] = min(rx, ry)
+    return np.array([raiz(c) for c in range(n_moedas)], dtype=np.int64)
+
+
+def componentes(ledger, fiat=FIAT):
+    """Moedas ligadas por swaps (union-find). Devolve {moeda: moeda representante}."""
+    codigos, moedas, grupo, entrada, origem_swap, e_fiat = _mascaras(ledger, frozenset(fiat))
+    raiz = _raizes(ledger.n_grupos, codigos, len(moedas), grupo, entrada, origem_swap, e_fiat)
+    return {m: moedas[r] for m, r in zip(moedas, raiz.tolist())}
+
+
+def planear_blocos(ledger, n_blocos, fiat=FIAT):
+    """Distribui os componentes por n_blocos (maior primeiro, para o bloco mais leve).
+
+    Devolve [(moedas, linhas)] com as linhas do ledger de cada bloco, ordenadas.
+    """
+    codigos, moedas, grupo, entrada, origem_swap, e_fiat = _mascaras(ledger, frozenset(fiat))
+    raiz = _raizes(ledger.n_grupos, codigos, len(moedas), grupo, entrada, origem_swap, e_fiat)
+    tamanho = np.bincount(raiz[codigos], minlength=len(moedas))
+
+    raizes = np.flatnonzero(tamanho)
+    n_blocos = max(1, min(n_blocos, len(raizes)))
+    carga = [0] * n_blocos
+    bloco_de_raiz = np.zeros(len(moedas), dtype=np.int64)
+    for r in sorted(raizes.tolist(), key=lambda r: (-tamanho[r], r)):
+        k = carga.index(min(carga))
+        bloco_de_raiz[r] = k
+        carga[k] += tamanho[r]
+    bloco_moeda = bloco_de_raiz[raiz]
+    bloco = bloco_moeda[codigos]
+
+    # Entradas fiat vão para todos os blocos com linhas no grupo (só dão o valor da venda)
+    blocos = []
+    fiat_in = entrada & e_fiat
+    for k in range(n_blocos):
+        proprias = (bloco == k) & ~fiat_in
+        presente = np.zeros(ledger.n_grupos, dtype=bool)
+        presente[grupo[proprias]] = True
+        linhas = np.flatnonzero(proprias | fiat_in & presente[grupo])
+        if len(linhas):
+            blocos.append(({m for m, b in zip(moedas, bloco_moeda.tolist()) if b == k}, linhas.tolist()))
+    return blocos
+
+
+def sub_ledger(ledger, linhas):
+    """Ledger só com as linhas dadas (ordenadas), mantendo os Time_Group originais."""
+    pos = np.asarray(linhas, dtype=np.int64)
+    grupo = np.searchsorted(np.asarray(ledger.inicios), pos, side='right') - 1
+    cortes = np.flatnonzero(grupo[1:] != grupo[:-1]) + 1
+    inicios = np.concatenate(([0], cortes, [len(pos)])) if len(pos) else np.array([0])
+    grupos = grupo[inicios[:-1]].tolist()
+    coin, op, val = ledger.coin, ledger.op, ledger.val
+    return Ledger(
+        [coin[i] for i in linhas],
+        [op[i] for i in linhas],
+        [val[i] for i in linhas],
+        inicios.tolist(),
+        [ledger.data_s[g] for g in grupos],
+        [ledger.hora_s[g] for g in grupos],
+        ledger.chaves[grupos],
+        list(linhas),
+    )
+
+
+def _sub_retiradas(bt, moedas):
+    """Retiradas BT ainda livres das moedas dadas + posição de cada uma no bt original."""
+    if bt is None:
+        return None, []
+    mapa = [p for p in bt.indice.livres() if bt.moedas[p] in moedas]
+    if not mapa:
+        return None, []
+    sub = RetiradasBT([bt.moedas[p] for p in mapa], [bt.qtds[p] for p in mapa],
+                      [bt.custos[p] for p in mapa], [bt.datas[p] for p in mapa])
+    return sub, mapa
+
+
+def _processar_bloco(ledger, val_texto, bt, fiat, inventario, aritmetica, medir=False, casamentos=None,
+                     resumir=False):
+    # Corre no processo do pool: devolve os relatórios, a linha de origem de cada
+    # linha de relatório, o inventário do bloco, as retiradas BT consumidas, as métricas
+    # e o resumo anual do IRS
+    ledger.val = list(map(aritmetica.de_texto, val_texto.split('\n'))) if val_texto else []
+    inventory = inventario_de_texto(inventario, aritmetica)
+    origens = ([], [], [])
+    metricas = Metricas() if medir else None
+    resumo = ResumoIRS() if resumir else None
+    relatorios = processar_eventos(ledger, bt, fiat, inventory, aritmetica, origens=origens, metricas=metricas,
+                                   casamentos=casamentos, resumo=resumo)
+    linhas = ledger.linhas
+    origens = [[linhas[i] for i in o] for o in origens]
+    consumidas = []
+    if bt is not None:
+        livres = set(bt.indice.livres())
+        consumidas = [p for p in range(len(bt.moedas)) if p not in livres]
+    return relatorios, origens, inventario_para_texto(inventory), consumidas, metricas, resumo
+
+
+def _ordenar(partes, inicios, val, n):
+    """Junta as linhas de relatório de todos os blocos pela ordem do motor sequencial.
+
+    Chave: (grupo, fase, linha) com fase 0 para as entradas (A) e 1 para as saídas (B);
+    linhas da mesma origem mantêm a ordem do bloco (argsort estável).
+    """
+    linhas_rel = [r for rel, _ in partes for r in rel]
+    origem = np.fromiter((o for _, orig in partes for o in orig), dtype=np.int64, count=len(linhas_rel))
+    if not len(origem):
+        return []
+    grupo = np.searchsorted(inicios, origem, side='right') - 1
+    fase = np.fromiter((val[o] < 0 for o in origem.tolist()), dtype=np.int64, count=len(origem))
+    ordem = np.argsort((grupo * 2 + fase) * n + origem, kind='stable')
+    return [linhas_rel[k] for k in ordem.tolist()]
+
+
+def processar_paralelo(ledger, bt=None, processos=None, fiat=FIAT, inventory=None, aritmetica=DECIMAL,
+                       executor=None, metricas=None, casamentos=None, resumo=None):
+    """Igual a processar_eventos (mesmas linhas, mesma ordem), com os componentes de
+    moedas independentes repartidos por `processos` processos.
+
+    inventory e bt são atualizados no fim como no modo sequencial, por isso o modo
+    fluxo e o snapshot continuam a funcionar. `executor` permite reutilizar o pool
+    entre blocos. As métricas de cada processo são juntadas em `metricas`, e o resumo
+    anual do IRS de cada um em `resumo`.
+    """
+    inventory = Inventario() if inventory is None else inventory
+    processos = processos or os.cpu_count() or 1
+    blocos = planear_blocos(ledger, processos, fiat)
+    if len(blocos) <= 1:
+        return processar_eventos(ledger, bt, fiat, inventory, aritmetica, metricas=metricas, casamentos=casamentos,
+                                 resumo=resumo)
+
+    tarefas, mapas = [], []
+    for moedas, linhas in blocos:
+        sub_bt, mapa = _sub_retiradas(bt, moedas)
+        sub_inv = inventario_para_texto({m: inventory[m] for m in moedas if m in inventory})
+        sub = sub_ledger(ledger, linhas)
+        val_texto, sub.val = '\n'.join(map(str, sub.val)), None
+        sub_casamentos = casamentos.restringir(mapa) if casamentos is not None else None
+        tarefas.append((sub, val_texto, sub_bt, fiat, sub_inv, aritmetica, metricas is not None, sub_casamentos,
+                        resumo is not None))
+        mapas.append(mapa)
+
+    proprio = executor is None
+    if proprio:
+        executor = ProcessPoolExecutor(max_workers=min(processos, len(tarefas)))
+    try:
+        resultados = list(executor.map(_processar_bloco, *zip(*tarefas)))
+    finally:
+        if proprio:
+            executor.shutdown()
+
+    for (_, _, sub_inv, consumidas, _, sub_resumo), mapa in zip(resultados, mapas):
+        inventory.update(inventario_de_texto(sub_inv, aritmetica))
+        for p in consumidas:
+            bt.indice.consumir(mapa[p])
+        if resumo is not None:
+            resumo.juntar(sub_resumo)
+
+    if metricas is not None:
+        for r in resultados:
+            metricas.juntar(r[4])
+        # As entradas fiat copiadas para vários blocos só contam uma vez; os grupos idem
+        copias = sum(len(linhas) for _, linhas in blocos) - len(ledger)
+        metricas.contar('linhas', -copias)
+        metricas.contar('entrada.fiat_ignorada', -copias)
+        metricas.contar('grupos', ledger.n_grupos - sum(r[4].contadores['grupos'] for r in resultados))
+        metricas.contar('paralelo.blocos', len(blocos))
+
+    inicios = np.asarray(ledger.inicios)
+    return tuple(
+        _ordenar([(r[0][k], r[1][k]) for r in resultados], inicios, ledger.val, len(ledger))
+        for k in range(3)
+    )
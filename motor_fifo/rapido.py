@@ -0,0 +1,281 @@
+import csv
+import os
+import re
+from datetime import date
+from decimal import Decimal
+
+from motor_fifo.aritmetica import div_meio_par
+from motor_fifo.datas import _EPOCA
+from motor_fifo.nucleo import (COLS_IRS, COLS_RECONC, COLS_SWAPS, FIAT, OPS_LEVANTAMENTO, Ledger, RetiradasBT,
+                               processar_eventos)
+
+# Caminho sem pandas/numpy para exports pequenos: o motor colunar com as opções por
+# omissão (Decimal, dt.round('2s'), reconciliação 'primeira'), só com o módulo csv.
+# Importar o pandas custa mais que processar umas centenas de linhas; aqui a corrida
+# inteira de um export pequeno fica abaixo dos 100 ms.
+#
+# Os ficheiros têm de sair iguais aos do colunar, por isso a leitura imita o que o
+# read_csv + parse_coluna fazem a cada coluna:
+#  - uma coluna só de números vira float64 (int64 se forem todos inteiros), com o
+#    parser do pandas (precise_xstrtod: só os 17 primeiros dígitos contam e a escala
+#    é uma multiplicação/divisão por 10**k; não é o float() do Python), e o Decimal
+#    sai do str() desse float; basta uma célula que não seja número para a coluna
+#    ficar em texto e seguir as regras do clean_val_decimal
+#  - a escrita é a do to_csv (módulo csv do Python, float com repr e vírgula)
+#
+# O sort_values do v4 é um quicksort: linhas com o mesmo UTC_Time podem sair em
+# qualquer ordem, e essa ordem não se reproduz sem o numpy. Aqui a ordenação é
+# estável, e o atalho só se usa quando a ordem dos empates não muda o resultado:
+# em cada instante repetido, as entradas que não são fiat têm de ser todas iguais
+# entre si, as fiat da mesma moeda, e o mesmo para as saídas que não são taxas.
+#
+# Em tudo o que não se sabe imitar (ficheiro grande, datas noutro formato, "inf",
+# espaços à volta de números...) correr() devolve False e o chamador segue pelo
+# motor_fifo.colunar.
+
+LIMITE = 1 << 20  # bytes de cada ficheiro de entrada
+
+# na_values por omissão do read_csv
+_NA = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                 '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+_INFINITO = frozenset(['inf', 'infinity'])
+_NUMERO = {d: re.compile(r'([-+]?)(\d*)(?:%s(\d*))?(?:[eE]([-+]?\d+))?' % re.escape(d)) for d in '.,'}
+_INTEIRO = re.compile(r'[-+]?\d{1,18}')
+_LIXO = re.compile(r'[^0-9,\.-]')
+_VALIDO = re.compile(r'-?(\d+\.?\d*|\.\d+)')
+_UTC = re.compile(r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})')
+_POT = [float(f'1e{k}') for k in range(309)]
+_ZERO = Decimal('0')
+
+
+class Recusado(Exception):
+    """O ficheiro tem algo que o caminho rápido não sabe ler como o pandas."""
+
+
+def _numero(texto, decimal):
+    # Partes (sinal, inteira, fração, expoente) se o read_csv o lê como número, senão None
+    m = _NUMERO[decimal].fullmatch(texto)
+    if m is None or not (m.group(2) or m.group(3)):
+        return None
+    return m.groups()
+
+
+def _xstrtod(texto, sinal, inteira, fracao, expoente):
+    # precise_xstrtod do parser C do pandas (float_precision por omissão)
+    fracao = fracao or ''
+    if len(inteira) + len(fracao) <= 15 and abs(int(expoente or 0) - len(fracao)) <= 22:
+        # Mantissa exata e uma só operação com 10**k exato: dá o mesmo que o float()
+        return float(texto.replace(',', '.'))
+    numero, n, expo = 0.0, 0, 0
+    for d in inteira:
+        if n < 17:
+            numero = numero * 10.0 + int(d)
+            n += 1
+        else:
+            expo += 1
+    decimais = fracao[:17 - n] if n < 17 else ''
+    for d in decimais:
+        numero = numero * 10.0 + int(d)
+    expo -= len(decimais)
+    if sinal == '-':
+        numero = -numero
+    expo += int(expoente or 0)
+    if expo > 308:
+        raise Recusado(f"número fora do float64: {sinal}{inteira}.{fracao}e{expoente}")
+    if expo > 0:
+        return numero * _POT[expo]
+    if expo < -308:
+        return numero / _POT[-308 - expo] / _POT[308] if expo >= -616 else 0.0
+    return numero / _POT[-expo]
+
+
+def _limpar(texto):
+    # clean_val_decimal sobre o texto (ver motor_fifo.valores)
+    t = _LIXO.sub('', texto)
+    if ',' in t:
+        if '.' in t:
+            t = t.replace('.', '')
+        t = t.replace(',', '.')
+    return Decimal(t) if _VALIDO.fullmatch(t) else _ZERO
+
+
+def valores(celulas, decimal='.'):
+    """Decimal de cada célula de uma coluna, como read_csv(decimal=...) + parse_coluna."""
+    partes = []
+    for c in celulas:
+        if c in _NA:
+            partes.append(None)
+            continue
+        p = _numero(c, decimal)
+        if p is None:
+            # O read_csv ainda lê como número um valor com espaços à volta ou "inf"
+            if c != c.strip() or c.lstrip('+-').lower() in _INFINITO:
+                raise Recusado(f"valor {c!r}")
+            # Coluna em texto
+            return [_ZERO if c in _NA else _limpar(c) for c in celulas]
+        partes.append(p)
+    if None not in partes and all(_INTEIRO.fullmatch(c) for c in celulas):
+        return [Decimal(int(c)) for c in celulas]
+    return [_ZERO if p is None else Decimal(repr(_xstrtod(c, *p))) for c, p in zip(celulas, partes)]
+
+
+def _texto(celulas, nome, decimal='.'):
+    # Coluna de texto que o pandas não converteria (nem NaN, nem número)
+    for c in celulas:
+        if c in _NA or _numero(c, decimal) is not None:
+            raise Recusado(f"{nome}: {c!r}")
+    return celulas
+
+
+def ler_csv(caminho, sep=','):
+    """{coluna: [células]} de um CSV com cabeçalho, sem conversões."""
+    if os.path.getsize(caminho) > LIMITE:
+        raise Recusado(f"{caminho} tem mais de {LIMITE} bytes")
+    try:
+        with open(caminho, encoding='utf-8-sig', newline='') as f:
+            linhas = [l for l in csv.reader(f, delimiter=sep) if l]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise Recusado(str(e)) from None
+    if not linhas or len(set(linhas[0])) != len(linhas[0]):
+        raise Recusado(f"{caminho}: cabeçalho vazio ou com colunas repetidas")
+    cabecalho = linhas[0]
+    if any(len(l) != len(cabecalho) for l in linhas[1:]):
+        raise Recusado(f"{caminho}: linhas com outro nº de colunas")
+    return {nome: [l[k] for l in linhas[1:]] for k, nome in enumerate(cabecalho)}
+
+
+def _segundos(texto):
+    m = _UTC.fullmatch(texto)
+    if m is None:
+        raise Recusado(f"UTC_Time {texto!r}")
+    a, mes, d, h, mi, s = map(int, m.groups())
+    if not 1678 <= a <= 2261 or h > 23 or mi > 59 or s > 59:
+        raise Recusado(f"UTC_Time {texto!r}")
+    try:
+        dia = date(a, mes, d).toordinal()
+    except ValueError:
+        raise Recusado(f"UTC_Time {texto!r}") from None
+    return (dia - _EPOCA) * 86400 + h * 3600 + mi * 60 + s
+
+
+def carregar_ledger(caminho):
+    """Ledger do export Binance (colunas em listas, chaves em ns), como o colunar com as
+    opções por omissão. Recusado se não for possível garantir o mesmo resultado."""
+    cols = ler_csv(caminho)
+    try:
+        utc, op, coin, change = cols['UTC_Time'], cols['Operation'], cols['Coin'], cols['Change']
+    except KeyError as e:
+        raise Recusado(f"coluna {e} em falta") from None
+    segundos = [_segundos(t) for t in utc]
+    op, coin, val = _texto(op, 'Operation'), _texto(coin, 'Coin'), valores(change)
+
+    ordem = sorted(range(len(segundos)), key=segundos.__getitem__)
+    coin, op, val, segundos = ([x[i] for i in ordem] for x in (coin, op, val, segundos))
+    # Empates em que a ordem importa (ver o topo do módulo), por instante: as entradas
+    # fiat só dão a moeda da venda, as outras criam lotes / linhas; das saídas contam
+    # as que geram linhas ou mexem em lotes (não as taxas nem o fiat que não é levantamento)
+    empates = {}
+    for s, m, o, v in zip(segundos, coin, op, val):
+        if v > 0:
+            papel, linha = ('fiat', m) if m in FIAT else ('entrada', (m, o, v))
+        elif v < 0 and 'Fee' not in o and (m not in FIAT or o in OPS_LEVANTAMENTO):
+            papel, linha = 'saida', (m, o, v)
+        else:
+            continue
+        empates.setdefault((s, papel), set()).add(linha)
+    if any(len(linhas) > 1 for linhas in empates.values()):
+        raise Recusado("linhas diferentes no mesmo instante (ordem do quicksort)")
+
+    # dt.round('2s'): meio para o par, em segundos (os instantes não têm fração)
+    tg = [div_meio_par(s, 2) * 2 for s in segundos]
+    inicios = [i for i in range(len(tg)) if i == 0 or tg[i] != tg[i - 1]] + [len(tg)]
+    chaves = [tg[i] for i in inicios[:-1]]
+    data_s, hora_s = [], []
+    for s in chaves:
+        dia, resto = divmod(s, 86400)
+        data_s.append(date.fromordinal(dia + _EPOCA).isoformat())
+        hora_s.append(f"{resto // 3600:02d}:{resto // 60 % 60:02d}:{resto % 60:02d}")
+    return Ledger(coin, op, val, inicios, data_s, hora_s, [s * 10 ** 9 for s in chaves])
+
+
+def carregar_retiradas_bt(caminho):
+    """Retiradas BT (Decimal), como o colunar; None se o ficheiro não existir."""
+    if not os.path.exists(caminho):
+        return None
+    cols = ler_csv(caminho, sep=';')
+    try:
+        ops, moedas, datas = cols['operação'], cols['Moeda'], cols['Data']
+        qtds, custos = valores(cols['quantidade'], ','), valores(cols['Valor (Custo FIFO)'], ',')
+    except KeyError as e:
+        raise Recusado(f"coluna {e} em falta") from None
+    for nome in ('operação', 'Moeda', 'Data'):
+        _texto(cols[nome], nome, ',')
+    linhas = [i for i, o in enumerate(ops) if re.search('Retirada|Withdraw', o, re.IGNORECASE)]
+    return RetiradasBT([moedas[i] for i in linhas], [qtds[i] for i in linhas], [custos[i] for i in linhas],
+                       [datas[i] for i in linhas])
+
+
+def _celula(v):
+    # float como o to_csv(decimal=','): repr com vírgula, NaN vazio
+    if isinstance(v, float):
+        return '' if v != v else repr(v).replace('.', ',')
+    return v
+
+
+def escrever(linhas, colunas, caminho):
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f, delimiter=';', lineterminator=os.linesep)
+        w.writerow(colunas)
+        w.writerows([_celula(v) for v in linha] for linha in linhas)
+
+
+def _sem_colunas():
+    # O que o to_csv escreve para um DataFrame vazio: '""' até ao pandas 2, uma linha
+    # vazia a partir do 3. A versão sai do nome do .dist-info ao lado do pandas que o
+    # import encontraria, sem importar o pandas (nem o importlib.metadata, ~50 ms). Sem
+    # exatamente um .dist-info legível aí (instalação editável, restos de outra versão)
+    # não se adivinha: o colunar trata do ficheiro.
+    import importlib.util
+    spec = importlib.util.find_spec('pandas')
+    if spec is None or not spec.submodule_search_locations:
+        raise Recusado("pandas não encontrado")
+    pasta = os.path.dirname(spec.submodule_search_locations[0])
+    versoes = [nome[7:-10] for nome in os.listdir(pasta) if nome.startswith('pandas-') and nome.endswith('.dist-info')]
+    maior = versoes[0].split('.')[0] if len(versoes) == 1 else ''
+    if not maior.isdigit():
+        raise Recusado(f"versão do pandas desconhecida ({', '.join(versoes) or 'sem .dist-info'})")
+    return [] if int(maior) >= 3 else ['']
+
+
+def exportar(report_irs, report_swaps, report_transf, out_irs, out_swaps, out_reconciliacao):
+    """Os 3 CSVs como o colunar.exportar (sem anexar)."""
+    # Antes de escrever o que quer que seja: se isto recusar, o colunar faz tudo
+    sem_colunas = None if report_swaps else _sem_colunas()
+    if report_irs:
+        escrever(report_irs, COLS_IRS, out_irs)
+    if report_swaps:
+        escrever(report_swaps, COLS_SWAPS, out_swaps)
+    else:
+        escrever([], sem_colunas, out_swaps)
+    if report_transf:
+        escrever(report_transf, COLS_RECONC, out_reconciliacao)
+
+
+def correr(binance_input, bt_input, out_irs, out_swaps, out_reconciliacao):
+    """Corre o motor pelo caminho rápido. False (sem escrever nada) quando o export não é
+    elegível; o chamador corre então o processar_motor_colunar."""
+    if not os.path.exists(binance_input):
+        return False
+    try:
+        ledger = carregar_ledger(binance_input)
+        bt = carregar_retiradas_bt(bt_input)
+        relatorios = processar_eventos(ledger, bt)
+        print(f"Iniciando Processamento Colunar ({len(ledger)} linhas, {ledger.n_grupos} grupos)...")
+        exportar(*relatorios, out_irs, out_swaps, out_reconciliacao)
+    except Recusado:
+        return False
+    print(f"\nSucesso! Gerados:")
+    print(f"1. {out_irs}")
+    print(f"2. {out_swaps}")
+    print(f"3. {out_reconciliacao}")
+    return True
@@ -0,0 +1,367 @@
+import math
+from bisect import bisect_right
+from collections import deque
+from decimal import Decimal
+from typing import NamedTuple
+
+import pandas as pd
+
+# Reconciliação de transferências num só lote, por moeda.
+#
+# Os motores casavam cada depósito com o primeiro levantamento compatível (o .head(1)
+# do v4 e do matchs_exchanges_v2): um depósito processado cedo podia ficar com o
+# levantamento que era de um depósito posterior, que acabava como "Origem Externa"
+# a custo zero. Aqui todos os depósitos e levantamentos de uma moeda são emparelhados
+# de uma vez:
+#
+# 1. Candidatos por ordenação + varrimento: levantamentos ordenados por quantidade e,
+#    para cada depósito, só o intervalo compatível (bisect), limitado aos
+#    `max_candidatos` com melhor pontuação.
+# 2. Pontuação de cada par (menor é melhor):
+#      quantidade  |dif| / limite   (o limite é a tolerância ou a taxa máxima admitida)
+#      tempo       dias entre levantamento e depósito / escala_dias, até 1; depósito
+#                  antes do levantamento custa mais 1 (relógios / fusos diferentes)
+# 3. Componentes ligados do grafo de candidatos (normalmente muito pequenos): até
+#    LIMITE_EXATO depósitos, atribuição ótima (algoritmo húngaro, com a opção de ficar
+#    sem par); acima disso, guloso pela pontuação com caminhos de aumento curtos para
+#    recuperar os depósitos que ficaram sem par.
+#
+# Deixar um depósito sem par custa SEM_PAR, muito acima de qualquer par: primeiro casa
+# o máximo de depósitos possível, depois minimiza a soma das pontuações.
+#
+# Só o v5 (--reconciliacao otima) e o motor_fifo.unificado usam esta reconciliação. O
+# v4 e o matchs_exchanges_v2 ficam com a primeira retirada compatível de propósito:
+# são as referências byte a byte dos outros motores (tests/test_paridade_v4.py).
+
+LIMITE_EXATO = 60
+SEM_PAR = 1e6
+_INF = 1e12
+
+
+class Correspondencia(NamedTuple):
+    deposito: int       # índice na lista de depósitos
+    retirada: int       # índice na lista de levantamentos
+    dif_qtd: object     # depósito - levantamento
+    dias: float         # dias entre o levantamento e o depósito (None se sem data)
+    pontuacao: float
+
+
+def _pontuar(qd, qr, dia_d, dia_r, tolerancia, taxa_max, escala_dias, janela_dias, so_depois, pesos):
+    """Pontuação do par, ou None se não for candidato."""
+    dif = qd - qr
+    if dif >= 0:
+        if dif >= tolerancia:
+            return None
+        limite = tolerancia
+    else:
+        # Recebido menos do que enviado: taxa de rede até taxa_max do levantamento
+        taxa = taxa_max * qr
+        if -dif >= tolerancia and -dif > taxa:
+            return None
+        limite = max(tolerancia, taxa)
+    dias = None
+    termo_t = 1.0
+    if dia_d is not None and dia_r is not None and dia_d == dia_d and dia_r == dia_r:
+        dias = float(dia_d - dia_r)
+        if janela_dias is not None and abs(dias) > janela_dias:
+            return None
+        if dias < 0:
+            if so_depois:
+                return None
+            termo_t = 1.0 + min(-dias / escala_dias, 1.0)
+        else:
+            termo_t = min(dias / escala_dias, 1.0)
+    termo_q = float(abs(dif) / limite) if limite else 0.0
+    return dif, dias, pesos[0] * termo_q + pesos[1] * termo_t
+
+
+def _dia_ordem(dia):
+    # Sem data (None / nan) ordena antes de todas
+    return dia if dia is not None and dia == dia else -math.inf
+
+
+def _hungaro(custo, n, m):
+    """Atribuição de custo mínimo (n <= m linhas x colunas); devolve a coluna de cada linha."""
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        usado = [False] * (m + 1)
+        while True:
+            usado[j0] = True
+            i0 = p[j0]
+            linha = custo[i0 - 1]
+            ui0 = u[i0]
+            delta, j1 = math.inf, 0
+            for j in range(1, m + 1):
+                if not usado[j]:
+                    cur = linha[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if usado[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    coluna = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            coluna[p[j] - 1] = j - 1
+    return coluna
+
+
+def _componentes(arestas, n_dep, n_ret):
+    # Union-find sobre depósitos e levantamentos (levantamento r vira o nó n_dep + r)
+    pai = list(range(n_dep + n_ret))
+
+    def raiz(x):
+        while pai[x] != x:
+            pai[x] = pai[pai[x]]
+            x = pai[x]
+        return x
+
+    for d, r, _ in arestas:
+        a, b = raiz(d), raiz(n_dep + r)
+        if a != b:
+            pai[a] = b
+    grupos = {}
+    for aresta in arestas:
+        grupos.setdefault(raiz(aresta[0]), []).append(aresta)
+    return list(grupos.values())
+
+
+def _guloso(arestas, profundidade=8):
+    """Pares por pontuação crescente; depois caminhos de aumento curtos para os
+    depósitos que ficaram sem par (quem lhes tirou o levantamento troca por outro livre)."""
+    vizinhos = {}
+    for d, r, s in sorted(arestas, key=lambda a: (a[2], a[1], a[0])):
+        vizinhos.setdefault(d, []).append(r)
+    par_d, par_r = {}, {}
+    for d, r, s in sorted(arestas, key=lambda a: (a[2], a[1], a[0])):
+        if d not in par_d and r not in par_r:
+            par_d[d], par_r[r] = r, d
+
+    def aumentar(d, visitados, nivel):
+        for r in vizinhos[d]:
+            if r in visitados:
+                continue
+            visitados.add(r)
+            dono = par_r.get(r)
+            if dono is None or (nivel and aumentar(dono, visitados, nivel - 1)):
+                par_d[d], par_r[r] = r, d
+                return True
+        return False
+
+    for d in vizinhos:
+        if d not in par_d:
+            aumentar(d, set(), profundidade)
+    return list(par_d.items())
+
+
+def _resolver(arestas):
+    """Pares (d, r) de um componente: ótimo (húngaro) se couber, senão guloso."""
+    deps = sorted({d for d, _, _ in arestas})
+    rets = sorted({r for _, r, _ in arestas})
+    if len(deps) > LIMITE_EXATO or len(rets) > 4 * LIMITE_EXATO:
+        return _guloso(arestas)
+
+    pos_d = {d: k for k, d in enumerate(deps)}
+    pos_r = {r: k for k, r in enumerate(rets)}
+    n, m = len(deps), len(rets)
+    # Colunas: levantamentos + uma coluna "sem par" por depósito
+    custo = [[_INF] * m + [SEM_PAR] * n for _ in range(n)]
+    for d, r, s in arestas:
+        # Desempate determinístico: o levantamento mais antigo no ficheiro, como o v4
+        custo[pos_d[d]][pos_r[r]] = s + 1e-9 * pos_r[r]
+    coluna = _hungaro(custo, n, m + n)
+    return [(deps[k], rets[j]) for k, j in enumerate(coluna) if 0 <= j < m and custo[k][j] < _INF]
+
+
+def reconciliar(depositos, retiradas, tolerancia=Decimal('0.00001'), taxa_max=0, escala_dias=7.0,
+                janela_dias=None, so_depois=False, max_candidatos=8, pesos=(1.0, 1.0)):
+    """Emparelha depósitos e levantamentos; devolve [Correspondencia] por ordem dos depósitos.
+
+    depositos/retiradas: sequências de (moeda, qtd, dia[, corretora]); dia é o número
+                         do dia (datas.dia_ordinal, pode ter fração ou ser None). Pares
+                         da mesma corretora (quando indicada) nunca casam.
+    tolerancia: diferença absoluta admitida (o 0.00001 do v4, exclusivo).
+    taxa_max:   fração do levantamento que pode faltar no depósito (taxa de rede;
+                0.01 é o ±1% do matchs_exchanges_v2).
+    janela_dias: exclui pares mais afastados do que isto; so_depois exclui depósitos
+                 anteriores ao levantamento.
+    max_candidatos: levantamentos por depósito que entram na atribuição (os de melhor
+                 pontuação; entre quantidades iguais, os mais próximos no tempo).
+    """
+    taxa_max = Decimal(str(taxa_max))
+    # moeda -> (quantidades distintas ordenadas, por quantidade: (dias ordenados, índices))
+    por_moeda = {}
+    for r, ret in enumerate(retiradas):
+        por_moeda.setdefault(ret[0], {}).setdefault(ret[1], []).append((_dia_ordem(ret[2]), r))
+    indice = {}
+    for m, blocos in por_moeda.items():
+        valores = sorted(blocos)
+        ordenados = [sorted(blocos[q]) for q in valores]
+        indice[m] = (valores, [([d for d, _ in b], [r for _, r in b]) for b in ordenados])
+
+    arestas = []
+    for d, dep in enumerate(depositos):
+        m, qd, dia_d = dep[0], dep[1], dep[2]
+        corretora = dep[3] if len(dep) > 3 else None
+        entrada = indice.get(m)
+        if entrada is None or qd <= 0:
+            continue
+        valores, blocos = entrada
+        # qr compatível: qd - tol < qr e qr - qd <= max(tol, taxa_max * qr)
+        alto = qd + tolerancia if not taxa_max else max(qd + tolerancia, qd / (1 - taxa_max))
+        ordem_d = _dia_ordem(dia_d)
+        candidatos = []
+        for k in range(bisect_right(valores, qd - tolerancia), bisect_right(valores, alto)):
+            # Muitos levantamentos da mesma quantidade: só os mais próximos no tempo
+            dias, rs = blocos[k]
+            i = bisect_right(dias, ordem_d)
+            for r in rs[max(0, i - max_candidatos):i + max_candidatos // 2]:
+                ret = retiradas[r]
+                if corretora is not None and len(ret) > 3 and ret[3] == corretora:
+                    continue
+                par = _pontuar(qd, ret[1], dia_d, ret[2], tolerancia, taxa_max, escala_dias,
+                               janela_dias, so_depois, pesos)
+                if par is not None:
+                    candidatos.append((par[2], r))
+        if len(candidatos) > max_candidatos:
+            candidatos.sort()
+            candidatos = candidatos[:max_candidatos]
+        arestas.extend((d, r, s) for s, r in candidatos)
+
+    pares = []
+    for componente in _componentes(arestas, len(depositos), len(retiradas)):
+        pares.extend(_resolver(componente))
+
+    resultado = []
+    for d, r in sorted(pares):
+        dep, ret = depositos[d], retiradas[r]
+        dif, dias, s = _pontuar(dep[1], ret[1], dep[2], ret[2], tolerancia, taxa_max, escala_dias,
+                                janela_dias, so_depois, pesos)
+        resultado.append(Correspondencia(d, r, dif, dias, round(s, 6)))
+    return resultado
+
+
+class Casamentos:
+    """Resultado da reconciliação para o motor: (moeda, qtd, Time_Group) -> posições BT.
+
+    Depósitos iguais no mesmo Time_Group são indistinguíveis, por isso partilham a
+    fila de posições pela ordem em que aparecem.
+    """
+
+    def __init__(self, tabela=None):
+        self._mapa = {}
+        self.tabela = tabela or []
+
+    def __len__(self):
+        return sum(len(f) for f in self._mapa.values())
+
+    def adicionar(self, moeda, qtd, chave, pos):
+        self._mapa.setdefault((moeda, qtd, chave), deque()).append(pos)
+
+    def retirar(self, moeda, qtd, chave):
+        fila = self._mapa.get((moeda, qtd, chave))
+        return fila.popleft() if fila else None
+
+    def restringir(self, mapa):
+        """Só as posições presentes em mapa (posições de um sub-conjunto das retiradas),
+        renumeradas para o sub-conjunto (motor_fifo.paralelo)."""
+        novo = {p: k for k, p in enumerate(mapa)}
+        sub = Casamentos()
+        for chave, fila in self._mapa.items():
+            for p in fila:
+                if p in novo:
+                    sub.adicionar(*chave, novo[p])
+        return sub
+
+
+def depositos_do_export(caminho, janela='2s', depois_de=None, aritmetica=None, fiat=None):
+    """Depósitos do export Binance: [(moeda, qtd, chave ns do Time_Group, dia)]."""
+    from motor_fifo.agrupamento import chaves_por_linha
+    from motor_fifo.aritmetica import DECIMAL
+    from motor_fifo.colunar import FIAT, OPS_DEPOSITO
+    from motor_fifo.datas import dias_de_chaves
+
+    aritmetica = aritmetica or DECIMAL
+    fiat = FIAT if fiat is None else fiat
+    df = pd.read_csv(caminho, usecols=['UTC_Time', 'Operation', 'Coin', 'Change'],
+                     dtype={'UTC_Time': str, 'Operation': str, 'Coin': str})
+    # Os grupos por lacuna dependem das linhas vizinhas: as chaves saem do ledger todo
+    tg = chaves_por_linha(pd.to_datetime(df['UTC_Time']), df['Operation'], janela)
+    deps = (df['Operation'].isin(OPS_DEPOSITO) & ~df['Coin'].isin(fiat)).to_numpy()
+    df, tg = df[deps], tg[deps]
+    mask = tg.notna()
+    if depois_de is not None:
+        mask &= tg > depois_de
+    df, tg = df[mask], tg[mask]
+    qtds = aritmetica.parse(df['Change'], df['Coin']).tolist()
+    chaves = tg.to_numpy(dtype='datetime64[ns]')
+    dias = dias_de_chaves(chaves)
+    return [(m, q, c, d) for m, q, c, d in zip(df['Coin'].tolist(), qtds, chaves.astype('int64').tolist(), dias)
+            if q > 0]
+
+
+def casar_depositos_bt(caminho, bt, janela='2s', depois_de=None, aritmetica=None, **opcoes):
+    """Reconciliação ótima dos depósitos do export com as retiradas BT ainda livres."""
+    deps = depositos_do_export(caminho, janela, depois_de, aritmetica)
+    livres = bt.indice.livres()
+    tolerancia = opcoes.pop('tolerancia', None)
+    if tolerancia is None:
+        from motor_fifo.colunar import TOLERANCIA_BT
+        tolerancia = TOLERANCIA_BT
+    if aritmetica is not None and aritmetica.nome != 'decimal':
+        # Ponto fixo: a tolerância vai para as unidades de cada moeda no próprio par
+        tolerancias = {m: aritmetica.qtd_de_decimal(tolerancia, m) for m in set(bt.moedas)}
+    else:
+        tolerancias = None
+    casamentos = Casamentos()
+    por_moeda = {}
+    for k, (m, q, c, d) in enumerate(deps):
+        por_moeda.setdefault(m, ([], []))[0].append(k)
+    for p in livres:
+        por_moeda.setdefault(bt.moedas[p], ([], []))[1].append(p)
+    for m, (ks, ps) in por_moeda.items():
+        if not ks or not ps:
+            continue
+        tol = tolerancias[m] if tolerancias else tolerancia
+        tabela = reconciliar([(deps[k][0], deps[k][1], deps[k][3]) for k in ks],
+                             [(bt.moedas[p], bt.qtds[p], bt.dias[p]) for p in ps],
+                             tolerancia=tol, **opcoes)
+        for c in tabela:
+            m_, q, chave, _ = deps[ks[c.deposito]]
+            casamentos.adicionar(m_, q, chave, ps[c.retirada])
+            casamentos.tabela.append((deps[ks[c.deposito]], ps[c.retirada], c))
+    return casamentos
+
+
+def exportar_correspondencias(casamentos, bt, caminho, aritmetica=None):
+    """Tabela de correspondências (um par por linha) em CSV ';', como os relatórios."""
+    from motor_fifo.aritmetica import DECIMAL
+    aritmetica = aritmetica or DECIMAL
+    linhas = []
+    for (m, q, chave, _), p, c in casamentos.tabela:
+        linhas.append((
+            str(pd.Timestamp(chave))[:19], m, aritmetica.qtd_float(q, m), bt.datas[p],
+            aritmetica.qtd_float(bt.qtds[p], m), aritmetica.qtd_float(c.dif_qtd, m), c.dias, c.pontuacao,
+        ))
+    linhas.sort()
+    pd.DataFrame(linhas, columns=['Data_Deposito', 'Moeda', 'Qtd_Deposito', 'Data_Retirada', 'Qtd_Retirada',
+                                  'Dif_Qtd', 'Dias', 'Pontuacao']).to_csv(caminho, sep=';', index=False, decimal=',')
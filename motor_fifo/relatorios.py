@@ -0,0 +1,199 @@
+import os
+import re
+import shutil
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from motor_fifo.nucleo import ESQUEMA_IRS, ESQUEMA_RECONC, ESQUEMA_SWAPS
+
+# Os 3 relatórios do motor em colunas tipadas, e a saída colunar (Parquet / Arrow IPC)
+# particionada por ano fiscal:
+#
+#     <pasta>/irs/ano=2021/parte-00000.parquet
+#     <pasta>/swaps/ano=2021/parte-00000.parquet
+#     <pasta>/reconciliacao/ano=2021/parte-00000.parquet
+#
+# Os valores ficam em float64 (não em texto com vírgula), e as agregações por
+# ano/ativo leem só as partições e colunas de que precisam. Os CSVs ';' do v4
+# passam a ser uma exportação derivada desses ficheiros (exportar_csv), idêntica
+# byte a byte à escrita direta.
+#
+# pyarrow é opcional: só é importado quando se pede a saída colunar.
+#
+# Os esquemas (ESQUEMA_*) estão no motor_fifo.nucleo, que não importa pandas.
+
+# A primeira coluna de cada relatório é a data que define o ano fiscal
+RELATORIOS = (('irs', ESQUEMA_IRS), ('swaps', ESQUEMA_SWAPS), ('reconciliacao', ESQUEMA_RECONC))
+FORMATOS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+_PARTE = re.compile(r'parte-(\d+)\.(parquet|arrow)')
+
+
+class BufferRelatorio:
+    """Linhas de um relatório acumuladas por coluna: float64 em array('d'), texto em listas."""
+
+    __slots__ = ('esquema', 'colunas')
+
+    def __init__(self, esquema):
+        self.esquema = esquema
+        self.colunas = [array('d') if tipo == 'float' else [] for _, tipo in esquema]
+
+    def __len__(self):
+        return len(self.colunas[0])
+
+    def adicionar(self, linha):
+        """Uma linha, como tuplo na ordem do esquema."""
+        for coluna, valor in zip(self.colunas, linha):
+            coluna.append(valor)
+
+    def estender(self, linhas):
+        """Várias linhas (tuplos na ordem do esquema), transpostas de uma vez."""
+        if linhas:
+            for coluna, valores in zip(self.colunas, zip(*linhas)):
+                coluna.extend(valores)
+
+    def para_dataframe(self):
+        return pd.DataFrame({
+            nome: np.array(coluna, dtype=np.float64) if tipo == 'float' else coluna
+            for (nome, tipo), coluna in zip(self.esquema, self.colunas)
+        })
+
+
+def _buffer(linhas, esquema):
+    if isinstance(linhas, BufferRelatorio):
+        return linhas
+    b = BufferRelatorio(esquema)
+    b.estender(linhas)
+    return b
+
+
+def centimos(df, colunas=('Valor_Venda', 'Custo_Aquisicao_USD', 'Resultado')):
+    """Colunas de valores em cêntimos int64, a partir do valor já arredondado de cada linha.
+
+    round(x * 100) coluna a coluna (np.rint arredonda metades para par, como o round),
+    para os totais serem a soma exata das linhas do relatório.
+    """
+    colunas = list(colunas)
+    return pd.DataFrame(np.rint(df[colunas].to_numpy(dtype='float64') * 100).astype('int64'), columns=colunas,
+                        index=df.index)
+
+
+def escrever_csv(tabelas, out_irs, out_swaps, out_reconciliacao):
+    """Os 3 CSVs no formato do v4 a partir de DataFrames (ou None).
+
+    Como no v4: IRS e reconciliação só são escritos se tiverem linhas; o de swaps
+    é sempre criado (um DataFrame vazio dá '""' no pandas).
+    """
+    df_irs, df_swaps, df_reconc = tabelas
+    if df_irs is not None and len(df_irs):
+        df_irs.to_csv(out_irs, sep=';', index=False, decimal=',')
+    if df_swaps is None or not len(df_swaps):
+        df_swaps = pd.DataFrame()
+    df_swaps.to_csv(out_swaps, sep=';', index=False, decimal=',')
+    if df_reconc is not None and len(df_reconc):
+        df_reconc.to_csv(out_reconciliacao, sep=';', index=False, decimal=',')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("A saída colunar (Parquet/Arrow) precisa do pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+class EscritorColunar:
+    """Grava os relatórios como dataset particionado por ano (mesma interface do
+    EscritorRelatorios: escrever(irs, swaps, reconc) por bloco, fechar() no fim).
+
+    Cada chamada acrescenta um ficheiro parte-NNNNN por ano tocado, por isso o modo
+    fluxo e o incremental (anexar=True) só escrevem as linhas novas. Sem anexar, os
+    datasets irs/swaps/reconciliacao que já existam na pasta são apagados.
+    """
+
+    def __init__(self, pasta, formato='parquet', anexar=False):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato colunar desconhecido: {formato} (válidos: {', '.join(FORMATOS)})")
+        self._pa = _pyarrow()
+        self.pasta = pasta
+        self.formato = formato
+        if not anexar:
+            for nome, _ in RELATORIOS:
+                shutil.rmtree(os.path.join(pasta, nome), ignore_errors=True)
+        os.makedirs(pasta, exist_ok=True)
+
+    def _tabela(self, buffer):
+        pa = self._pa
+        return pa.table({
+            nome: pa.array(np.array(coluna, dtype=np.float64)) if tipo == 'float'
+            else pa.array(coluna, type=pa.string(), from_pandas=True)
+            for (nome, tipo), coluna in zip(buffer.esquema, buffer.colunas)
+        })
+
+    def _gravar(self, tabela, destino):
+        if self.formato == 'parquet':
+            self._pa.parquet.write_table(tabela, destino)
+        else:
+            self._pa.feather.write_feather(tabela, destino, compression='uncompressed')
+
+    def escrever(self, report_irs, report_swaps, report_transf):
+        for (nome, esquema), linhas in zip(RELATORIOS, (report_irs, report_swaps, report_transf)):
+            buffer = _buffer(linhas, esquema)
+            if not len(buffer):
+                continue
+            tabela = self._tabela(buffer)
+            # Linhas por ordem cronológica: cada ano é um troço contínuo
+            anos = np.array([str(d)[:4] for d in buffer.colunas[0]])
+            cortes = np.flatnonzero(anos[1:] != anos[:-1]) + 1
+            for a, b in zip([0, *cortes.tolist()], [*cortes.tolist(), len(anos)]):
+                particao = os.path.join(self.pasta, nome, f'ano={anos[a]}')
+                os.makedirs(particao, exist_ok=True)
+                n = len([f for f in os.listdir(particao) if _PARTE.fullmatch(f)])
+                destino = os.path.join(particao, f'parte-{n:05d}{FORMATOS[self.formato]}')
+                self._gravar(tabela.slice(a, b - a), destino)
+
+    def fechar(self):
+        pass
+
+
+def _partes(pasta, nome):
+    # Pela ordem em que foram escritas: ano, depois número da parte
+    raiz = os.path.join(pasta, nome)
+    if not os.path.isdir(raiz):
+        return []
+    anos = sorted((d for d in os.listdir(raiz) if d.startswith('ano=')), key=lambda d: d[4:])
+    partes = []
+    for d in anos:
+        ficheiros = [f for f in os.listdir(os.path.join(raiz, d)) if _PARTE.fullmatch(f)]
+        for f in sorted(ficheiros, key=lambda f: int(_PARTE.fullmatch(f).group(1))):
+            partes.append(os.path.join(raiz, d, f))
+    return partes
+
+
+def ler_relatorio(pasta, nome, colunas=None, anos=None):
+    """DataFrame de um relatório do dataset (None se não houver linhas).
+
+    anos/colunas limitam a leitura às partições e colunas pedidas.
+    """
+    pa = _pyarrow()
+    partes = _partes(pasta, nome)
+    if anos is not None:
+        anos = {str(a) for a in anos}
+        partes = [p for p in partes if os.path.basename(os.path.dirname(p))[4:] in anos]
+    tabelas = [
+        pa.parquet.read_table(p, columns=colunas) if p.endswith('.parquet')
+        else pa.feather.read_table(p, columns=colunas)
+        for p in partes
+    ]
+    if not tabelas:
+        return None
+    return pa.concat_tables(tabelas).to_pandas()
+
+
+def exportar_csv(pasta, out_irs, out_swaps, out_reconciliacao):
+    """Os CSVs ';' do v4, derivados do dataset colunar."""
+    escrever_csv([ler_relatorio(pasta, nome) for nome, _ in RELATORIOS], out_irs, out_swaps, out_reconciliacao)
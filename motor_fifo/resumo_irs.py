@@ -0,0 +1,106 @@
+import csv
+import os
+
+# Resumo anual para o anexo do IRS: Valor_Venda, Custo_Aquisicao_USD, Resultado e nº
+# de linhas por (ano fiscal, ativo, Moeda_Venda, classe de detenção), acumulados pelo
+# motor à medida que gera cada linha do 1_Vendas_IRS_Formatado.csv. Dispensa reler o
+# relatório por lote e interpretar as strings do Isento_365d ("561 dias (ISENTO)").
+#
+# Classes de detenção, com as regras do status_isento (motor_fifo.datas):
+#  - ISENTO      mais de 365 dias
+#  - TRIBUTÁVEL  até 365 dias
+#  - TBD         data de aquisição desconhecida ou Origem Externa
+#
+# Os valores somam-se em cêntimos inteiros, a partir do valor já arredondado de cada
+# linha (como no comparar_com_decimal): os totais são exatamente a soma das linhas do
+# relatório, seja qual for o backend numérico, e o CSV relido (modo incremental)
+# volta aos mesmos inteiros.
+
+ISENTO, TRIBUTAVEL, TBD = 'ISENTO', 'TRIBUTÁVEL', 'TBD'
+CLASSES = (ISENTO, TRIBUTAVEL, TBD)
+DIMENSOES = ('ano', 'ativo', 'moeda', 'classe')
+
+COLS_RESUMO = ['Ano', 'Ativo', 'Moeda_Venda', 'Detencao', 'Linhas', 'Valor_Venda', 'Custo_Aquisicao_USD',
+               'Resultado']
+
+
+def classe_detencao(dia_venda, dia_aq, is_ext):
+    if dia_aq is None or is_ext or dia_aq != dia_aq:
+        return TBD
+    return ISENTO if dia_venda - dia_aq > 365 else TRIBUTAVEL
+
+
+def _acumular(celulas, chave, valores):
+    c = celulas.get(chave)
+    if c is None:
+        celulas[chave] = list(valores)
+    else:
+        for k, v in enumerate(valores):
+            c[k] += v
+
+
+class ResumoIRS:
+    """Cubo {(ano, ativo, moeda_venda, classe): [linhas, venda, custo, resultado]} em cêntimos."""
+
+    __slots__ = ('celulas',)
+
+    def __init__(self):
+        self.celulas = {}
+
+    def __len__(self):
+        return len(self.celulas)
+
+    def somar(self, linha, classe):
+        """Uma linha do relatório IRS (tuplo na ordem do ESQUEMA_IRS) e a sua classe."""
+        chave = (linha[0][:4], linha[1], linha[2], classe)
+        c = self.celulas.get(chave)
+        if c is None:
+            c = self.celulas[chave] = [0, 0, 0, 0]
+        c[0] += 1
+        c[1] += round(linha[3] * 100)
+        c[2] += round(linha[5] * 100)
+        c[3] += round(linha[7] * 100)
+
+    def juntar(self, outro):
+        """Acrescenta o resumo de outro processo (modo paralelo) ou de outra corrida."""
+        for chave, valores in outro.celulas.items():
+            _acumular(self.celulas, chave, valores)
+
+    def agregar(self, *dimensoes):
+        """Totais em cêntimos por algumas das dimensões ('ano', 'ativo', 'moeda', 'classe').
+
+        agregar('ano', 'classe') -> {(ano, classe): [linhas, venda, custo, resultado]}.
+        """
+        pos = [DIMENSOES.index(d) for d in dimensoes]
+        totais = {}
+        for chave, valores in self.celulas.items():
+            _acumular(totais, tuple(chave[p] for p in pos), valores)
+        return totais
+
+    def linhas(self):
+        """Linhas do CSV, ordenadas por ano, ativo, moeda e classe."""
+        ordem = {c: k for k, c in enumerate(CLASSES)}
+        return [
+            (ano, ativo, moeda, classe, n, venda / 100, custo / 100, resultado / 100)
+            for (ano, ativo, moeda, classe), (n, venda, custo, resultado) in
+            sorted(self.celulas.items(), key=lambda x: (*map(str, x[0][:3]), ordem[x[0][3]]))
+        ]
+
+    def gravar(self, caminho):
+        import pandas as pd
+        pd.DataFrame(self.linhas(), columns=COLS_RESUMO).to_csv(caminho, sep=';', index=False, decimal=',')
+
+    @classmethod
+    def ler(cls, caminho):
+        """Resumo gravado por gravar(); vazio se o ficheiro não existir."""
+        resumo = cls()
+        if not os.path.exists(caminho):
+            return resumo
+        with open(caminho, encoding='utf-8', newline='') as f:
+            leitor = csv.reader(f, delimiter=';')
+            if next(leitor, None) != COLS_RESUMO:
+                raise ValueError(f"{caminho} não é um resumo anual do IRS")
+            for ano, ativo, moeda, classe, n, *valores in leitor:
+                resumo.celulas[(ano, ativo, moeda, classe)] = [
+                    int(n), *(round(float(v.replace(',', '.')) * 100) for v in valores)]
+        return resumo
@@ -0,0 +1,170 @@
+import random
+import time
+from calendar import timegm
+
+# Gerador de exports sintéticos (Binance + BitcoinTrade) para o benchmark.
+#
+# Binance: mesmo esquema do export real (UTC_Time, Account, Operation, Coin, Change),
+# com as operações que os motores tratam: swaps (Transaction Spend/Buy/Fee), vendas
+# para fiat (Transaction Sold/Revenue/Fee), rendimentos Earn, depósitos, levantamentos
+# e compras com fiat. Os saldos por moeda são acompanhados para as vendas consumirem
+# vários lotes, como num histórico real com muitos rendimentos pequenos. Num swap a
+# quantidade recebida segue um preço fixo por moeda (PRECOS, ±2%), para os saldos
+# ficarem na ordem de grandeza de um histórico real em vez de crescerem a cada troca.
+#
+# BitcoinTrade: 'Retirada para carteira externa' a casar com parte dos depósitos
+# (quantidade igual ou com diferença abaixo da tolerância do motor), mais compras
+# que o filtro das retiradas tem de ignorar.
+#
+# As datas ficam dentro de [inicio, fim]: o intervalo médio entre eventos é refeito a
+# cada evento com o tempo e as linhas que faltam, ao ritmo de linhas por evento visto
+# até ali (no início, o esperado para a mistura: LINHAS_POR_EVENTO). Vendas e swaps
+# sem saldo viram rendimentos de uma linha, por isso o ritmo real fica abaixo do
+# esperado. Cada salto fica limitado para sobrarem 3s por cada evento que ainda falta
+# (com folga para o dobro): o último evento não passa do fim nem cai em cima de outro.
+
+MISTURA_PADRAO = {
+    'swap': 0.25,
+    'venda': 0.15,
+    'earn': 0.30,
+    'deposito': 0.12,
+    'levantamento': 0.08,
+    'compra': 0.10,
+}
+# Preço de referência (EUR) de cada moeda
+PRECOS = {'BTC': 30000, 'ETH': 2000, 'BNB': 300, 'ADA': 0.4, 'XRP': 0.5, 'DOT': 6, 'SOL': 50, 'XEM': 0.03,
+          'LTC': 80, 'DOGE': 0.08, 'MATIC': 0.8, 'USDT': 1}
+MOEDAS = tuple(PRECOS)
+FIAT = ('EUR', 'BRL', 'USD')
+# Linhas Binance de cada tipo de evento, em média (taxas opcionais incluídas)
+LINHAS_POR_EVENTO = {'swap': 2.5, 'venda': 2.7, 'earn': 1, 'deposito': 1, 'levantamento': 1, 'compra': 2.5}
+
+# Muda quando o gerador passa a produzir outros dados para a mesma semente: os
+# exports guardados pelo benchmark_motores deixam de servir
+VERSAO = 4
+
+_CAB_BINANCE = 'User_ID,UTC_Time,Account,Operation,Coin,Change,Remark\n'
+_CAB_BT = ('operação;Data;hora;Moeda;quantidade;Valor (Custo FIFO);'
+           'Ativo_Contraparte;Valor_Recebido_Contraparte;Fees\n')
+
+
+def ler_mistura(texto):
+    """'swap=0.3,venda=0.2' -> dict; os tipos omitidos ficam com o peso padrão."""
+    mistura = dict(MISTURA_PADRAO)
+    for parte in filter(None, (p.strip() for p in texto.split(','))):
+        tipo, _, peso = parte.partition('=')
+        if tipo not in MISTURA_PADRAO:
+            raise ValueError(f"Tipo de evento desconhecido: {tipo} (válidos: {', '.join(MISTURA_PADRAO)})")
+        mistura[tipo] = float(peso)
+    return mistura
+
+
+def _qtd(x):
+    return f'{x:.8f}'.rstrip('0').rstrip('.') or '0'
+
+
+def _br(x, casas=8):
+    # Número no formato do relatório BT (vírgula decimal)
+    return f'{x:.{casas}f}'.rstrip('0').rstrip('.').replace('.', ',')
+
+
+def gerar(linhas, binance_destino, bt_destino=None, mistura=None, semente=1,
+          inicio='2019-11-01', fim='2025-12-31', fracao_bt=0.5):
+    """Escreve um export Binance com ~`linhas` linhas (e o relatório BT, se bt_destino).
+
+    Devolve (linhas Binance, linhas BT) efetivamente escritas.
+    """
+    r = random.Random(semente)
+    mistura = mistura or MISTURA_PADRAO
+    tipos = [t for t, p in mistura.items() if p > 0]
+    pesos = [mistura[t] for t in tipos]
+    t0 = timegm(time.strptime(inicio, '%Y-%m-%d'))
+    t1 = timegm(time.strptime(fim, '%Y-%m-%d')) + 86399
+    por_evento = sum(LINHAS_POR_EVENTO[t] * p for t, p in zip(tipos, pesos)) / sum(pesos)
+    saldo = dict.fromkeys(MOEDAS, 0.0)
+
+    n_bin = n_bt = 0
+    fb = open(binance_destino, 'w', encoding='utf-8', newline='')
+    ft = open(bt_destino, 'w', encoding='utf-8', newline='') if bt_destino else None
+    try:
+        fb.write(_CAB_BINANCE)
+        if ft:
+            ft.write(_CAB_BT)
+        buf, t, eventos = [], float(t0), 0
+        while n_bin + len(buf) < linhas:
+            # Intervalo médio (3s fixos + exponencial) para os eventos que faltam cobrirem o resto do período
+            feitas = n_bin + len(buf)
+            ritmo = feitas / eventos if eventos else por_evento
+            faltam = max(1.0, (linhas - feitas) / ritmo)
+            passo = max(1.0, (t1 - t) / faltam - 3)
+            folga = max(0.0, t1 - t - 3 - 6 * faltam)
+            t = min(t + 3 + min(r.expovariate(1 / passo), folga), t1)
+            eventos += 1
+            ts = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t))
+            tipo = r.choices(tipos, pesos)[0]
+            m = r.choice(MOEDAS)
+
+            # Sem saldo não há o que vender/trocar/levantar: vira rendimento
+            if tipo in ('swap', 'venda', 'levantamento') and saldo[m] <= 1e-6:
+                tipo = 'earn'
+
+            if tipo == 'earn':
+                q = round(r.uniform(1e-6, 0.05), 8)
+                saldo[m] += q
+                buf.append(f'1,{ts},Spot,Simple Earn Flexible Interest,{m},{_qtd(q)},\n')
+            elif tipo == 'deposito':
+                q = round(r.uniform(0.01, 20), r.choice((2, 4, 8)))
+                saldo[m] += q
+                buf.append(f'1,{ts},Spot,Deposit,{m},{_qtd(q)},\n')
+                if ft and r.random() < fracao_bt:
+                    dif = r.choice((0, 0, 0.000001))
+                    data_bt = time.strftime('%Y-%m-%d', time.gmtime(t - r.uniform(3600, 86400 * 400)))
+                    ft.write(f'Retirada para carteira externa;{data_bt};10:00:00;{m};{_br(q + dif)};'
+                             f'{_br(r.uniform(5, 5000), 2)};Carteira Externa;0;{_br(0.0005)}\n')
+                    n_bt += 1
+            elif tipo == 'compra':
+                f = r.choice(FIAT)
+                q = round(r.uniform(0.001, 5), 8)
+                saldo[m] += q
+                buf.append(f'1,{ts},Spot,Buy,{f},{_qtd(-round(r.uniform(10, 2000), 2))},\n')
+                buf.append(f'1,{ts},Spot,Buy,{m},{_qtd(q)},\n')
+                if q >= 0.00001 and r.random() < 0.5:
+                    buf.append(f'1,{ts},Spot,Fee,{m},{_qtd(-round(q * 0.001, 8))},\n')
+                if ft and r.random() < 0.05:
+                    ft.write(f'Compra;{ts[:10]};{ts[11:]};{m};{_br(q)};{_br(r.uniform(10, 2000), 2)};'
+                             f'BRL;0;0\n')
+                    n_bt += 1
+            elif tipo == 'venda':
+                f = r.choice(FIAT)
+                q = round(saldo[m] * r.uniform(0.05, 0.6), 8)
+                saldo[m] -= q
+                buf.append(f'1,{ts},Spot,Transaction Sold,{m},{_qtd(-q)},\n')
+                buf.append(f'1,{ts},Spot,Transaction Revenue,{f},{_qtd(round(r.uniform(5, 5000), 2))},\n')
+                if r.random() < 0.7:
+                    buf.append(f'1,{ts},Spot,Transaction Fee,{f},{_qtd(-0.01)},\n')
+            elif tipo == 'swap':
+                m2 = r.choice([x for x in MOEDAS if x != m])
+                q = round(saldo[m] * r.uniform(0.05, 0.6), 8)
+                q2 = round(q * PRECOS[m] / PRECOS[m2] * r.uniform(0.98, 1.02), 8)
+                saldo[m] -= q
+                saldo[m2] += q2
+                buf.append(f'1,{ts},Spot,Transaction Spend,{m},{_qtd(-q)},\n')
+                buf.append(f'1,{ts},Spot,Transaction Buy,{m2},{_qtd(q2)},\n')
+                if q2 >= 0.00001 and r.random() < 0.5:
+                    buf.append(f'1,{ts},Spot,Transaction Fee,{m2},{_qtd(-round(q2 * 0.001, 8))},\n')
+            else:  # levantamento
+                q = round(saldo[m] * r.uniform(0.1, 1), 8)
+                saldo[m] -= q
+                buf.append(f'1,{ts},Spot,Withdraw,{m},{_qtd(-q)},\n')
+
+            if len(buf) >= 10000:
+                n_bin += len(buf)
+                fb.writelines(buf)
+                buf = []
+        n_bin += len(buf)
+        fb.writelines(buf)
+    finally:
+        fb.close()
+        if ft:
+            ft.close()
+    return n_bin, n_bt
@@ -0,0 +1,349 @@
+import heapq
+import os
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+from motor_fifo.adaptadores import operacoes
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.colunar import FIAT, TOLERANCIA_BT, EscritorRelatorios
+from motor_fifo.datas import _EPOCA, dia_ordinal, status_isento
+from motor_fifo.inventario import Inventario, Lote
+
+# Motor único para várias corretoras (Binance, BitcoinTrade, Nexo).
+#
+# Cada export passa pelo seu adaptador (motor_fifo.adaptadores), que gera operações
+# no esquema comum já por ordem cronológica; os fluxos são fundidos (heapq.merge,
+# k-way) e percorridos uma vez sobre um inventário FIFO global. Substitui correr um
+# motor por corretora e juntar os relatórios à mão no Excel.
+#
+# Regras por operação iguais às do v4 (vendas para fiat percorrem o FIFO, swaps
+# passam um lote por entrada, taxas ignoradas), com uma diferença: um levantamento
+# consome a quantidade levantada e os lotes ficam "em trânsito". Se um depósito
+# noutra corretora casar com ele (mesma moeda, diferença abaixo da tolerância, o
+# levantamento primeiro), os lotes voltam à fila pela data de aquisição original,
+# com o custo herdado. O que sobra em trânsito no fim saiu para fora.
+#
+# Levantamentos sem lotes suficientes que tragam o custo já calculado (retiradas do
+# relatório BT) completam o trânsito com esse custo, como a tabela bt_retiradas do v4.
+#
+# Que levantamento casa com que depósito é decidido antes da passagem, para todas as
+# transferências de uma vez (motor_fifo.reconciliacao, reconciliacao='otima'); com
+# 'primeira' cada depósito fica com o levantamento pendente mais antigo que sirva.
+
+
+class Transferencia:
+    __slots__ = ('corretora', 'moeda', 'qtd', 'data', 'lotes', 'linha')
+
+    def __init__(self, corretora, moeda, qtd, data, lotes, linha):
+        self.corretora = corretora
+        self.moeda = moeda
+        self.qtd = qtd
+        self.data = data
+        self.lotes = lotes
+        self.linha = linha      # linha do relatório de reconciliação a atualizar quando casar
+
+
+class Pendentes:
+    """Levantamentos ainda sem depósito, por moeda e ordenados por quantidade.
+
+    Como o IndiceRetiradas, cada depósito é uma pesquisa por intervalo (bisect); entre
+    os candidatos ganha o levantamento mais antigo de outra corretora.
+    """
+
+    def __init__(self):
+        self._por_moeda = {}
+        self._seq = 0
+
+    def __len__(self):
+        return sum(len(qtds) for qtds, _ in self._por_moeda.values())
+
+    def __iter__(self):
+        itens = [item for _, lista in self._por_moeda.values() for item in lista]
+        return (t for _, t in sorted(itens, key=lambda x: x[0]))
+
+    def adicionar(self, t):
+        qtds, itens = self._por_moeda.setdefault(t.moeda, ([], []))
+        k = bisect_right(qtds, t.qtd)
+        qtds.insert(k, t.qtd)
+        itens.insert(k, (self._seq, t))
+        self._seq += 1
+
+    def casar(self, moeda, qtd, corretora, tolerancia):
+        entrada = self._por_moeda.get(moeda)
+        if not entrada:
+            return None
+        qtds, itens = entrada
+        melhor = None
+        for k in range(bisect_right(qtds, qtd - tolerancia), bisect_left(qtds, qtd + tolerancia)):
+            if itens[k][1].corretora != corretora and (melhor is None or itens[k][0] < itens[melhor][0]):
+                melhor = k
+        if melhor is None:
+            return None
+        del qtds[melhor]
+        return itens.pop(melhor)[1]
+
+
+class Ligacoes:
+    """Pares já decididos pela reconciliação: id do depósito -> id do levantamento.
+
+    Mesma interface que Pendentes, mas os ids são (operação, perna) na ordem da fusão.
+    """
+
+    def __init__(self, pares, tabela=None):
+        self._deposito = dict(pares)
+        self._ligados = set(self._deposito.values())
+        self._transito = {}
+        self._fora = []
+        self.tabela = tabela or []
+
+    def __len__(self):
+        return len(self._fora) + len(self._transito)
+
+    def __iter__(self):
+        return iter(self._fora + list(self._transito.values()))
+
+    def adicionar(self, t, ident):
+        if ident in self._ligados:
+            self._transito[ident] = t
+        else:
+            self._fora.append(t)
+
+    def casar(self, ident):
+        ret = self._deposito.get(ident)
+        return self._transito.pop(ret, None) if ret is not None else None
+
+
+def ligar_transferencias(ops, fiat=FIAT, tolerancia=TOLERANCIA_BT, **opcoes):
+    """Reconciliação em lote dos depósitos e levantamentos de todas as corretoras.
+
+    Só casam pares de corretoras diferentes com o levantamento antes do depósito.
+    Devolve Ligacoes; ops é a lista já fundida.
+    """
+    from motor_fifo.reconciliacao import reconciliar
+
+    depositos, retiradas, id_dep, id_ret = [], [], [], []
+    for k, op in enumerate(ops):
+        for l, p in enumerate(op.pernas):
+            if p.moeda in fiat or p.tipo not in ('deposito', 'levantamento'):
+                continue
+            dia = op.chave / 86_400e9 + _EPOCA
+            if p.tipo == 'deposito' and p.qtd > 0:
+                depositos.append((p.moeda, p.qtd, dia, op.corretora))
+                id_dep.append((k, l))
+            elif p.tipo == 'levantamento' and p.qtd < 0:
+                retiradas.append((p.moeda, -p.qtd, dia, op.corretora))
+                id_ret.append((k, l))
+    tabela = reconciliar(depositos, retiradas, tolerancia=tolerancia, so_depois=True, **opcoes)
+    # No mesmo instante o levantamento tem de vir antes na fusão para já estar em trânsito
+    tabela = [c for c in tabela if id_ret[c.retirada] < id_dep[c.deposito]]
+    pares = [(id_dep[c.deposito], id_ret[c.retirada], c) for c in tabela]
+    return Ligacoes({d: r for d, r, _ in pares},
+                    [(ops[d[0]], ops[d[0]].pernas[d[1]], ops[r[0]], ops[r[0]].pernas[r[1]], c) for d, r, c in pares])
+
+
+def juntar(fluxos):
+    """Fusão k-way de fluxos de operações já ordenados. Empates seguem a ordem dos fluxos."""
+    return heapq.merge(*fluxos, key=attrgetter('chave'))
+
+
+def lotes_do_deposito(lotes, qtd, data_s, dia):
+    """Lotes em trânsito de um levantamento acertados à quantidade depositada.
+
+    A diferença (taxa de rede) sai dos lotes mais recentes, sem perder custo: um lote
+    que fique a zero passa o custo ao anterior. O que o levantamento não cobriu com
+    lotes entra com custo zero como Origem Externa, como no núcleo (ORIGEM_HERDADA).
+    """
+    lotes = list(lotes)
+    excesso = sum(l.qty for l in lotes) - qtd
+    while excesso > 0 and lotes:
+        ultimo = lotes[-1]
+        if ultimo.qty > excesso:
+            ultimo.qty -= excesso
+            break
+        excesso -= ultimo.qty
+        lotes.pop()
+        if lotes:
+            lotes[-1].cost += ultimo.cost
+    if excesso < 0:
+        lotes.append(Lote(-excesso, DECIMAL.zero, data_s, "Origem Externa", True, dia))
+    return lotes
+
+
+def processar_operacoes(fluxo, fiat=FIAT, inventory=None, tolerancia=TOLERANCIA_BT, ligacoes=None):
+    """FIFO global sobre as operações fundidas. Devolve (irs, swaps, reconc, pendentes).
+
+    ligacoes: resultado de ligar_transferencias() sobre as mesmas operações; sem ele,
+              cada depósito casa com o levantamento pendente mais antigo compatível.
+    """
+    inventory = Inventario() if inventory is None else inventory
+    report_irs, report_swaps, report_transf = [], [], []
+    pendentes = Pendentes() if ligacoes is None else ligacoes
+    fiat = frozenset(fiat)
+    zero = DECIMAL.zero
+    dinheiro = DECIMAL.dinheiro
+
+    for k, op in enumerate(fluxo):
+        data_s, hora_s, corretora = op.data, op.hora, op.corretora
+        dia = dia_ordinal(data_s)
+        entradas = [p for p in op.pernas if p.qtd > 0]
+        saidas = [(l, p) for l, p in enumerate(op.pernas) if p.qtd < 0]
+
+        # --- A) ENTRADAS ---
+        for l, p in enumerate(op.pernas):
+            if p.qtd <= 0:
+                continue
+            m = p.moeda
+            if m in fiat:
+                continue
+            if p.tipo == 'deposito':
+                if ligacoes is not None:
+                    t = ligacoes.casar((k, l))
+                else:
+                    t = pendentes.casar(m, p.qtd, corretora, tolerancia)
+                if t is not None:
+                    fila = inventory.fila(m)
+                    for lote in lotes_do_deposito(t.lotes, p.qtd, data_s, dia):
+                        fila.inserir_por_data(lote)
+                    saida = report_transf[t.linha]
+                    report_transf[t.linha] = saida[:5] + (f"{t.corretora} -> {corretora} ({data_s})",)
+                    report_transf.append((data_s, hora_s, m, float(p.qtd), 'ENTRADA',
+                                          f"{t.corretora} -> {corretora} ({t.data})"))
+                    continue
+                lote = Lote(p.qtd, zero, data_s, "Origem Externa", True, dia)
+                report_transf.append((data_s, hora_s, m, float(p.qtd), 'ENTRADA', f"Origem Externa -> {corretora}"))
+            elif p.custo is not None:
+                lote = Lote(p.qtd, p.custo, data_s, f"Compra/{corretora}", False, dia)
+            else:
+                lote = Lote(p.qtd, zero, data_s, f"Rendimento/{corretora}", False, dia)
+            inventory.fila(m).adicionar(lote)
+
+        if not saidas:
+            continue
+
+        fiat_rows = [p for p in entradas if p.moeda in fiat]
+        if fiat_rows:
+            moeda_fiat = fiat_rows[0].moeda
+            val_fiat_total = abs(sum(p.qtd for p in fiat_rows))
+
+        # --- B) SAÍDAS ---
+        for l, p in saidas:
+            if p.tipo == 'taxa':
+                continue
+            m_sai = p.moeda
+            qtd_sai = -p.qtd
+
+            if p.tipo == 'levantamento':
+                lotes, restante = [], qtd_sai
+                if inventory.get(m_sai):
+                    for lote, vender, custo in inventory[m_sai].consumir(qtd_sai):
+                        lotes.append(Lote(vender, custo, lote.date, lote.origem, lote.is_ext, lote.dia))
+                        restante -= vender
+                if restante > 0 and p.custo is not None:
+                    data_aq = p.data_custo or data_s
+                    lotes.append(Lote(restante, p.custo * (restante / qtd_sai), data_aq,
+                                      f"{corretora} (Histórico)", False, dia_ordinal(data_aq)))
+                t = Transferencia(corretora, m_sai, qtd_sai, data_s, lotes, len(report_transf))
+                if ligacoes is not None:
+                    ligacoes.adicionar(t, (k, l))
+                else:
+                    pendentes.adicionar(t)
+                report_transf.append((data_s, hora_s, m_sai, float(qtd_sai), 'SAÍDA',
+                                      f"{corretora} -> Carteira Externa"))
+                continue
+
+            if fiat_rows:
+                for lote, vender, custo_prop in inventory.fila(m_sai).consumir(qtd_sai):
+                    receita_prop = val_fiat_total * (vender / qtd_sai)
+                    report_irs.append((
+                        data_s, m_sai, moeda_fiat, dinheiro(receita_prop), lote.date,
+                        dinheiro(custo_prop), lote.origem,
+                        dinheiro(receita_prop - custo_prop),
+                        status_isento(dia, lote.dia, lote.is_ext),
+                    ))
+            else:
+                for j in entradas:
+                    if inventory.get(m_sai):
+                        lv = inventory[m_sai].retirar()
+                        inventory.fila(j.moeda).adicionar(Lote(j.qtd, lv.cost, lv.date, lv.origem, lv.is_ext, lv.dia))
+                        report_swaps.append((data_s, hora_s, m_sai, j.moeda, float(lv.cost), lv.date))
+
+    return report_irs, report_swaps, report_transf, pendentes
+
+
+def exportar_ligacoes(ligacoes, caminho):
+    """Tabela de pares levantamento -> depósito em CSV ';'."""
+    import pandas as pd
+    linhas = []
+    for dep, p_dep, ret, p_ret, c in ligacoes.tabela:
+        linhas.append((f"{dep.data} {dep.hora}", dep.corretora, f"{ret.data} {ret.hora}", ret.corretora,
+                       p_dep.moeda, float(p_dep.qtd), float(-p_ret.qtd), float(c.dif_qtd),
+                       round(c.dias, 4), c.pontuacao))
+    pd.DataFrame(linhas, columns=['Data_Deposito', 'Destino', 'Data_Retirada', 'Origem', 'Moeda', 'Qtd_Deposito',
+                                  'Qtd_Retirada', 'Dif_Qtd', 'Dias', 'Pontuacao']).to_csv(
+        caminho, sep=';', index=False, decimal=',')
+
+
+def processar_motor_unificado(fontes,
+                              out_irs='1_Vendas_IRS_Unificado.csv',
+                              out_swaps='2_Historico_Swaps_Unificado.csv',
+                              out_reconciliacao='3_Reconciliacao_Unificada.csv',
+                              saida_colunar=None, formato='parquet', csv=True,
+                              tolerancia=TOLERANCIA_BT, inventario=None, reconciliacao='otima', taxa_max=0,
+                              correspondencias=None):
+    """Corre o motor sobre vários exports.
+
+    fontes: [(corretora, caminho)] ou [(corretora, caminho, opções do adaptador)]; em
+            empates de instante a ordem da lista decide (levantamentos antes de depósitos).
+    inventario: CSV com o resumo do inventário final (Moeda;Quantidade;Custo_Total).
+    reconciliacao: 'otima' (pares decididos em lote, motor_fifo.reconciliacao) ou
+                   'primeira'; taxa_max é a fração que pode faltar no depósito.
+    correspondencias: CSV com a tabela de pares (só com 'otima').
+    Devolve o inventário final.
+    """
+    fluxos = []
+    for fonte in fontes:
+        corretora, caminho, opcoes = (*fonte, {})[:3]
+        if not os.path.exists(caminho):
+            print(f"Erro: Arquivo {caminho} não encontrado.")
+            return None
+        fluxos.append(operacoes(corretora, caminho, **opcoes))
+
+    print(f"Iniciando Processamento Unificado ({', '.join(f[0] for f in fontes)})...")
+    inventory = Inventario()
+    fluxo, ligacoes = juntar(fluxos), None
+    if reconciliacao == 'otima':
+        fluxo = list(fluxo)
+        ligacoes = ligar_transferencias(fluxo, tolerancia=tolerancia, taxa_max=taxa_max)
+        if correspondencias:
+            exportar_ligacoes(ligacoes, correspondencias)
+    elif reconciliacao != 'primeira':
+        raise ValueError(f"Reconciliação desconhecida: {reconciliacao} (válidas: primeira, otima)")
+    report_irs, report_swaps, report_transf, pendentes = processar_operacoes(
+        fluxo, inventory=inventory, tolerancia=tolerancia, ligacoes=ligacoes)
+
+    if saida_colunar:
+        from motor_fifo.relatorios import EscritorColunar
+        escritor = EscritorColunar(saida_colunar, formato)
+    else:
+        escritor = EscritorRelatorios(out_irs, out_swaps, out_reconciliacao)
+    escritor.escrever(report_irs, report_swaps, report_transf)
+    escritor.fechar()
+    if saida_colunar and csv:
+        from motor_fifo.relatorios import exportar_csv
+        exportar_csv(saida_colunar, out_irs, out_swaps, out_reconciliacao)
+    if inventario:
+        from motor_fifo.estado import exportar_resumo_inventario
+        exportar_resumo_inventario(inventory, inventario)
+
+    casadas = sum(1 for r in report_transf if r[4] == 'ENTRADA' and not r[5].startswith('Origem Externa'))
+    print(f"\nSucesso! {len(report_irs)} linhas IRS, {len(report_swaps)} swaps, "
+          f"{casadas} transferências entre corretoras, {len(pendentes)} levantamentos para fora.")
+    if saida_colunar:
+        print(f"- {saida_colunar}/ (irs, swaps, reconciliacao em {formato}, por ano)")
+    if csv or not saida_colunar:
+        print(f"1. {out_irs}")
+        print(f"2. {out_swaps}")
+        print(f"3. {out_reconciliacao}")
+    if inventario:
+        print(f"4. {inventario} (inventário final)")
+    return inventory
@@ -0,0 +1,235 @@
+import re
+from decimal import Decimal, ROUND_HALF_EVEN, localcontext
+
+import numpy as np
+import pandas as pd
+
+# Mesmas regras do clean_val_decimal (Motor_Binance_v3), aplicadas à coluna inteira
+# de uma vez:
+# - remove tudo o que não seja dígito, vírgula, ponto ou sinal
+# - com vírgula E ponto: ponto é separador de milhares, vírgula é decimal
+# - só com vírgula: vírgula é decimal
+# O texto é tratado como matriz de code points (numpy), por isso as regras correm
+# em C sobre a coluna toda; só células "sujas" (espaços, símbolos) passam pelo regex.
+_LIXO = re.compile(r'[^0-9,\.-]')
+_VIRG, _PONTO, _MENOS, _ZERO, _NOVE = 44, 46, 45, 48, 57
+_MAX_DIGITOS_INT64 = 18
+
+
+class ValoresInvalidos(ValueError):
+    """Células que não foi possível converter em modo estrito."""
+
+    def __init__(self, celulas):
+        self.celulas = celulas  # {indice: valor original}
+        amostra = ', '.join(f'{k}={v!r}' for k, v in list(celulas.items())[:10])
+        super().__init__(f"{len(celulas)} valor(es) inválido(s): {amostra}")
+
+
+def _matriz(textos):
+    u = np.asarray(textos, dtype='U')
+    if u.dtype.itemsize == 0:
+        u = u.astype('U1')
+    largura = u.dtype.itemsize // 4
+    return u.view(np.uint32).reshape(len(u), largura).copy()
+
+
+def _texto(m):
+    return m.view(f'U{m.shape[1]}').reshape(len(m))
+
+
+def _remover(m, remover):
+    # Compacta cada linha empurrando os caracteres removidos para o fim (como padding)
+    ordem = np.argsort(remover, axis=1, kind='stable')
+    m = np.take_along_axis(m, ordem, axis=1)
+    m[np.take_along_axis(remover, ordem, axis=1)] = 0
+    return m
+
+
+def normalizar(col):
+    """Normaliza a coluna para texto com ponto decimal.
+
+    Devolve (matriz de code points normalizada, máscara de nulos, máscara de células
+    que já eram números, texto desses números).
+    """
+    col = pd.Series(col)
+    n = len(col)
+    nulos = col.isna().to_numpy(dtype=bool)
+    numericos = np.zeros(n, dtype=bool)
+    brutos = col.to_numpy(dtype=object)
+
+    if pd.api.types.is_numeric_dtype(col.dtype):
+        # Já numérico (read_csv sem vírgulas): str() do valor, como em clean_val_decimal.
+        # O texto normal segue pela matriz; só notação científica/nan/inf (com letras)
+        # fica marcado como número para ir direto ao Decimal.
+        textos = col.astype(object).where(~nulos, '').astype(str).to_numpy(dtype=object)
+        m = _matriz(textos)
+        numericos = (m >= ord('A')).any(axis=1) & ~nulos
+        m[numericos] = 0
+        return m, nulos, numericos, textos
+
+    if pd.api.types.infer_dtype(col, skipna=True) in ('string', 'empty'):
+        textos = np.where(nulos, '', brutos)
+    else:
+        textos = np.array([v if isinstance(v, str) else '' for v in brutos], dtype=object)
+        # Números que já vinham como float/int dentro de uma coluna object
+        for i in np.flatnonzero(~nulos):
+            v = brutos[i]
+            if isinstance(v, (float, int, np.number)) and not isinstance(v, bool):
+                numericos[i] = True
+                textos[i] = str(v)
+
+    m = _matriz(np.where(numericos, '', textos))
+
+    digito = (m >= _ZERO) & (m <= _NOVE)
+    permitido = digito | (m == _VIRG) | (m == _PONTO) | (m == _MENOS) | (m == 0)
+    sujas = ~permitido.all(axis=1)
+    if sujas.any():
+        m[sujas] = _remover(m[sujas], ~permitido[sujas])
+
+    virg = m == _VIRG
+    tem_virg = virg.any(axis=1)
+    milhares = tem_virg & (m == _PONTO).any(axis=1)
+    if milhares.any():
+        m[milhares] = _remover(m[milhares], m[milhares] == _PONTO)
+        virg = m == _VIRG
+    m[virg] = _PONTO
+    return m, nulos, numericos, textos
+
+
+def _validos(m):
+    # -?(\d+\.?\d*|\.\d+): sinal só na 1.ª posição, no máximo um ponto, pelo menos um dígito
+    digito = (m >= _ZERO) & (m <= _NOVE)
+    menos = m == _MENOS
+    sinal_ok = ~menos[:, 1:].any(axis=1)
+    return sinal_ok & ((m == _PONTO).sum(axis=1) <= 1) & digito.any(axis=1)
+
+
+def parse_coluna(col, tipo='decimal', casas=8, estrito=False):
+    """Converte uma coluna de valores Binance/BitcoinTrade de uma só vez.
+
+    tipo='decimal'  -> objetos Decimal (equivalente a apply(clean_val_decimal))
+    tipo='float'    -> float64 (equivalente a apply(clean_val) do Backup/motor Binace_v1)
+    tipo='escalado' -> inteiro exato em unidades de 10**-casas (int64; object com int
+                       Python se algum valor passar de 18 dígitos). Arredondamento
+                       HALF_EVEN quando a célula tem mais casas que o pedido.
+
+    Células nulas valem 0. Células não convertíveis valem 0, ou, com estrito=True,
+    levantam ValoresInvalidos com o índice e o valor original de cada uma.
+    No modo estrito e escalado, perda de casas decimais também é reportada.
+    """
+    if tipo not in ('decimal', 'float', 'escalado'):
+        raise ValueError(f"tipo desconhecido: {tipo}")
+
+    col = pd.Series(col)
+    if tipo == 'float' and pd.api.types.is_numeric_dtype(col.dtype):
+        return col.astype('float64').fillna(0.0)
+
+    if tipo == 'escalado' and not estrito and pd.api.types.is_float_dtype(col.dtype):
+        return _escalar_float(col, casas)
+
+    m, nulos, numericos, textos = normalizar(col)
+    validos = (_validos(m) & ~numericos) if m.shape[1] else np.zeros(len(col), dtype=bool)
+    invalidos = ~validos & ~nulos & ~numericos
+    if estrito and invalidos.any():
+        raise ValoresInvalidos({col.index[i]: col.iat[i] for i in np.flatnonzero(invalidos)})
+
+    if tipo == 'escalado':
+        return _escalar(col, m, validos, numericos, textos, casas, estrito)
+
+    normal = _texto(m)
+    if tipo == 'float':
+        out = np.zeros(len(col), dtype='float64')
+        # float() do Python (arredondamento correto, igual ao clean_val do v1)
+        out[validos] = np.fromiter(map(float, normal[validos].tolist()), dtype='float64')
+        for i in np.flatnonzero(numericos):
+            out[i] = float(textos[i])
+        return pd.Series(out, index=col.index)
+
+    zero = Decimal('0')
+    out = [Decimal(t) if ok else zero for t, ok in zip(normal.tolist(), validos.tolist())]
+    for i in np.flatnonzero(numericos):
+        out[i] = Decimal(textos[i])
+    return pd.Series(out, index=col.index, dtype=object)
+
+
+def _escalar_float(col, casas):
+    # Coluna float64 (export Binance normal): x * 10**casas arredondado dá o inteiro
+    # exato de Decimal(str(x)) sempre que o resultado está longe de um empate e cabe
+    # folgado na mantissa; os restantes (raros) seguem pelo Decimal.
+    x = col.to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore', over='ignore'):
+        y = x * 10.0 ** casas
+        r = np.rint(y)
+        frac = np.abs(y - r)
+    seguro = np.isfinite(y) & (np.abs(y) < 2.0 ** 43) & (np.abs(frac - 0.5) > 0.01)
+    out = np.where(seguro, r, 0).astype(np.int64)
+
+    lentos = np.flatnonzero(~seguro & ~np.isnan(x))
+    if len(lentos):
+        vals = {}
+        for i in lentos:
+            exato = Decimal(str(x[i]))
+            # Arredondar depois do scaleb: o quantize a `casas` falha com mais de prec dígitos (1e127)
+            vals[i] = int(exato.scaleb(casas).to_integral_value(rounding=ROUND_HALF_EVEN)) if exato.is_finite() else 0
+        if any(abs(v) >= 2 ** 63 for v in vals.values()):
+            out = out.astype(object)
+        for i, v in vals.items():
+            out[i] = v
+    return pd.Series(out, index=col.index, dtype=out.dtype)
+
+
+def _escalar(col, m, validos, numericos, textos, casas, estrito):
+    n, largura = m.shape
+    digito = (m >= _ZERO) & (m <= _NOVE) & validos[:, None]
+    ponto = m == _PONTO
+    pos_ponto = np.where(ponto.any(axis=1), ponto.argmax(axis=1), (m != 0).sum(axis=1))
+
+    # Expoente de cada dígito: parte inteira conta os dígitos à direita até ao ponto,
+    # parte fracionária desce a partir de casas-1
+    colunas = np.arange(largura)[None, :]
+    inteiro = digito & (colunas < pos_ponto[:, None])
+    expo = np.where(
+        inteiro,
+        (np.cumsum(inteiro[:, ::-1], axis=1)[:, ::-1] - 1) + casas,
+        casas - (colunas - pos_ponto[:, None]),
+    )
+    expo = np.where(digito, expo, -1)
+
+    # Dígitos além de `casas` ou mais de 18 dígitos no total (19 já podem passar de
+    # 2**63 - 1 e dar a volta no int64) seguem pelo Decimal
+    excesso = (digito & (expo < 0)).any(axis=1) | (expo >= _MAX_DIGITOS_INT64).any(axis=1)
+    usar = digito & (expo >= 0) & ~excesso[:, None]
+    pot = np.power(np.int64(10), np.clip(expo, 0, _MAX_DIGITOS_INT64), dtype=np.int64)
+    out = ((m.astype(np.int64) - _ZERO) * pot * usar).sum(axis=1)
+    out[m[:, 0] == _MENOS] *= -1
+
+    lentos = np.flatnonzero((excesso & validos) | numericos)
+    if len(lentos):
+        normal = _texto(m)
+        grandes = False
+        vals = {}
+        perdas = {}
+        for i in lentos:
+            exato = Decimal(textos[i] if numericos[i] else normal[i])
+            if not exato.is_finite():
+                perdas[col.index[i]] = col.iat[i]
+                vals[i] = 0
+                continue
+            # scaleb antes de arredondar (o quantize falha acima de 28 dígitos), com
+            # precisão que chegue para o scaleb não arredondar números longos
+            with localcontext() as ctx:
+                ctx.prec = max(ctx.prec, len(exato.as_tuple().digits))
+                escalado = exato.scaleb(casas)
+            q = escalado.to_integral_value(rounding=ROUND_HALF_EVEN)
+            if q != escalado:
+                perdas[col.index[i]] = col.iat[i]
+            vals[i] = int(q)
+            grandes = grandes or abs(vals[i]) >= 2 ** 63
+        if estrito and perdas:
+            raise ValoresInvalidos(perdas)
+        if grandes:
+            out = out.astype(object)
+        for i, v in vals.items():
+            out[i] = v
+
+    return pd.Series(out, index=col.index, dtype=out.dtype)
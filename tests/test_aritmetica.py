@@ -0,0 +1,21 @@
+import pandas as pd
+
+from motor_fifo.aritmetica import AritmeticaPontoFixo, comparar_com_decimal
+from motor_fifo.relatorios import centimos
+from motor_fifo.sintetico import gerar
+
+
+def test_ponto_fixo_da_os_totais_irs_do_decimal(tmp_path, capsys):
+    binance, bt = tmp_path / 'binance.csv', tmp_path / 'bt.csv'
+    gerar(3000, binance, bt, semente=7)
+    assert comparar_com_decimal(str(binance), str(bt), AritmeticaPontoFixo())
+    assert 'TOTAL' in capsys.readouterr().out
+
+
+def test_centimos_igual_ao_round_linha_a_linha():
+    df = pd.DataFrame({'Valor_Venda': [0.125, 2.675, -1.005, 1e9 + 0.07],
+                       'Custo_Aquisicao_USD': [0.0, 0.5, 0.015, 3.3],
+                       'Resultado': [0.125, 2.175, -1.02, -0.005]})
+    esperado = df.apply(lambda c: [round(x * 100) for x in c])
+    assert centimos(df).values.tolist() == esperado.values.tolist()
+    assert list(centimos(df, ['Resultado']).columns) == ['Resultado']
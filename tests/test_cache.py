@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+import pytest
+
+from motor_fifo import cache
+from motor_fifo.cache import abrir_ledger
+from motor_fifo.valores import parse_coluna
+
+CABECALHO = 'User_ID,UTC_Time,Account,Operation,Coin,Change,Remark\n'
+LINHAS = [
+    '1,2021-03-01 10:00:00,Spot,Deposit,BTC,0.5,\n',
+    '1,2021-01-01 10:00:00,Spot,Deposit,ETH,"1.234,5",\n',
+    '1,2021-02-01 10:00:00,Spot,Withdraw,BTC,-0.00000001,\n',
+]
+
+
+def _export(caminho, linhas):
+    caminho.write_text(CABECALHO + ''.join(linhas), encoding='utf-8')
+    return str(caminho)
+
+
+def _construcoes(monkeypatch):
+    chamadas = []
+    original = cache._construir
+    monkeypatch.setattr(cache, '_construir', lambda *a: (chamadas.append(a[0]), original(*a)))
+    return chamadas
+
+
+def test_entrada_reaproveitada_com_o_mesmo_conteudo(tmp_path, monkeypatch):
+    chamadas = _construcoes(monkeypatch)
+    export = _export(tmp_path / 'binance.csv', LINHAS)
+    pasta = str(tmp_path / 'cache')
+    primeira = abrir_ledger(export, pasta)
+    segunda = abrir_ledger(export, pasta)
+    assert len(chamadas) == 1
+    assert primeira.pasta == segunda.pasta
+
+    # Mesmo conteúdo noutro ficheiro: a chave é o conteúdo, não o nome
+    copia = _export(tmp_path / 'copia.csv', LINHAS)
+    assert abrir_ledger(copia, pasta).pasta == primeira.pasta
+    assert len(chamadas) == 1
+
+
+def test_export_alterado_gera_outra_entrada(tmp_path, monkeypatch):
+    chamadas = _construcoes(monkeypatch)
+    export = tmp_path / 'binance.csv'
+    pasta = str(tmp_path / 'cache')
+    antiga = abrir_ledger(_export(export, LINHAS), pasta)
+    nova = abrir_ledger(_export(export, LINHAS + ['1,2021-04-01 10:00:00,Spot,Deposit,ADA,7,\n']), pasta)
+    assert len(chamadas) == 2
+    assert nova.pasta != antiga.pasta
+    assert (len(antiga), len(nova)) == (3, 4)
+    assert sorted(os.listdir(pasta)) == sorted([os.path.basename(antiga.pasta), os.path.basename(nova.pasta)])
+
+
+def test_conteudo_igual_ao_dos_motores(tmp_path):
+    export = _export(tmp_path / 'binance.csv', LINHAS)
+    df = pd.read_csv(export)
+    df['UTC_Time'] = pd.to_datetime(df['UTC_Time'])
+    df = df.sort_values('UTC_Time')
+    norm = abrir_ledger(export, str(tmp_path / 'cache'))
+    assert norm.decimais() == parse_coluna(df['Change']).tolist()
+    assert [str(v) for v in norm.decimais()] == ['1234.5', '-1E-8', '0.5']
+    assert norm.valor_f8.tolist() == pytest.approx([1234.5, -1e-8, 0.5])
+    assert norm.datas().tolist() == df['UTC_Time'].tolist()
+    assert norm.moedas[norm.moeda].tolist() == df['Coin'].tolist()
@@ -0,0 +1,66 @@
+import os
+from decimal import Decimal
+
+from motor_fifo.cenarios import Cenario, correr_cenario
+from motor_fifo.colunar import carregar_ledger, carregar_retiradas_bt, processar_motor_colunar
+from motor_fifo.inventario import FilaPrioridade, Lote
+from motor_fifo.sintetico import gerar
+
+CAB_BINANCE = 'User_ID,UTC_Time,Account,Operation,Coin,Change,Remark\n'
+CAB_BT = 'operação;Data;hora;Moeda;quantidade;Valor (Custo FIFO);Ativo_Contraparte;Valor_Recebido_Contraparte;Fees\n'
+
+
+def test_cenario_fifo_igual_ao_v5(tmp_path):
+    binance, bt = str(tmp_path / 'binance.csv'), str(tmp_path / 'bt.csv')
+    gerar(2000, binance, bt, semente=5)
+    irs = str(tmp_path / 'irs.csv')
+    processar_motor_colunar(binance, bt, out_irs=irs, out_swaps=os.devnull, out_reconciliacao=os.devnull)
+    correr_cenario(Cenario('fifo'), carregar_ledger(binance), carregar_retiradas_bt(bt), saida=str(tmp_path))
+    with open(irs, 'rb') as a, open(tmp_path / 'fifo_Vendas_IRS.csv', 'rb') as b:
+        assert a.read() == b.read()
+
+
+def _lotes_vendidos(tmp_path, cenario):
+    # Três lotes BTC de custos 100, 300 e 200 (depósitos casados com retiradas BT),
+    # depois duas vendas de 1 BTC: a ordem das datas de aquisição é a da política
+    (tmp_path / 'binance.csv').write_text(CAB_BINANCE + ''.join(f'1,{t},Spot,{op},{m},{q},\n' for t, op, m, q in [
+        ('2022-01-01 10:00:00', 'Deposit', 'BTC', '1'),
+        ('2022-01-02 10:00:00', 'Deposit', 'BTC', '1.1'),
+        ('2022-01-03 10:00:00', 'Deposit', 'BTC', '1.2'),
+        ('2022-06-01 10:00:00', 'Transaction Sold', 'BTC', '-1'),
+        ('2022-06-01 10:00:00', 'Transaction Revenue', 'EUR', '500'),
+        ('2022-07-01 10:00:00', 'Transaction Sold', 'BTC', '-1'),
+        ('2022-07-01 10:00:00', 'Transaction Revenue', 'EUR', '500'),
+    ]), encoding='utf-8')
+    (tmp_path / 'bt.csv').write_text(CAB_BT + ''.join(
+        f'Retirada para carteira externa;{d};10:00:00;BTC;{q};{c};Carteira Externa;0;0\n'
+        for d, q, c in [('2021-01-01', '1', '100'), ('2021-02-01', '1,1', '330'), ('2021-03-01', '1,2', '240')]
+    ), encoding='utf-8')
+    saida = tmp_path / cenario.politica
+    saida.mkdir()
+    correr_cenario(cenario, carregar_ledger(str(tmp_path / 'binance.csv')),
+                   carregar_retiradas_bt(str(tmp_path / 'bt.csv')), saida=str(saida))
+    linhas = (saida / f'{cenario.nome}_Vendas_IRS.csv').read_text(encoding='utf-8').splitlines()[1:]
+    return [(campos[4], campos[5]) for campos in (linha.split(';') for linha in linhas)]
+
+
+def test_ordem_de_consumo_por_politica(tmp_path):
+    assert _lotes_vendidos(tmp_path, Cenario('fifo')) == [('2021-01-01', '100,0'), ('2021-02-01', '300,0')]
+    # LIFO: o último a entrar; a sobra de 0.2 do lote de 2021-03-01 ainda é a mais recente
+    assert _lotes_vendidos(tmp_path, Cenario('lifo', 'lifo')) == [
+        ('2021-03-01', '200,0'), ('2021-03-01', '40,0'), ('2021-02-01', '240,0')]
+    # HIFO: custo unitário 300 (2021-02-01), depois 200 (2021-03-01), depois 100
+    assert _lotes_vendidos(tmp_path, Cenario('hifo', 'hifo')) == [
+        ('2021-02-01', '300,0'), ('2021-02-01', '30,0'), ('2021-03-01', '180,0')]
+    designados = {('BTC', '2021-03-01'): 0, ('BTC', '2021-01-01'): 1}
+    assert _lotes_vendidos(tmp_path, Cenario('especifica', 'especifica', designados=designados)) == [
+        ('2021-03-01', '200,0'), ('2021-03-01', '40,0'), ('2021-01-01', '80,0')]
+
+
+def test_fila_lifo_nao_depende_de_quantas_vezes_a_chave_e_chamada():
+    fila = FilaPrioridade(lifo=True)
+    for k in range(3):
+        fila.adicionar(Lote(Decimal(1), Decimal(k), f'2021-0{k + 1}-01'))
+    fila.reduzir_primeiro(Decimal('0.5'), Decimal(0))
+    assert [l.date for l in fila] == ['2021-03-01', '2021-02-01', '2021-01-01']
+    assert fila.retirar().date == '2021-03-01'
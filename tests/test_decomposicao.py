@@ -0,0 +1,33 @@
+from decimal import Decimal
+
+from motor_fifo.aritmetica import DECIMAL
+from motor_fifo.decomposicao import decompor_grupo, negociar
+from motor_fifo.inventario import Inventario, Lote
+from motor_fifo.nucleo import FIAT
+
+D = Decimal
+FIATS = frozenset(FIAT)
+
+
+def _negociar(coin, op, val, inventory=None):
+    irs, swaps = [], []
+    g = decompor_grupo(coin, op, val, 0, len(coin), FIATS)
+    contagens = negociar(g, coin, val, inventory or Inventario(), DECIMAL, None, FIATS, '2023-01-02', '10:00:00',
+                         738522, irs.append, swaps.append)
+    return irs, swaps, contagens
+
+
+def test_taxa_fiat_num_grupo_sem_saida_cripto():
+    # Pernas fiat de uma venda que o limite de 2s separou das saídas
+    irs, swaps, contagens = _negociar(['EUR', 'EUR'], ['Transaction Revenue', 'Transaction Fee'],
+                                      [D('10'), D('-0.1')])
+    assert (irs, swaps, contagens) == ([], [], (0, 0, 1))
+
+
+def test_taxa_fiat_abate_a_venda_na_mesma_moeda_e_ignora_outra():
+    inventory = Inventario()
+    inventory.fila('BTC').adicionar(Lote(D('1'), D('100'), '2022-01-01', 'x', False, 738156))
+    irs, _, _ = _negociar(['BTC', 'EUR', 'EUR', 'USD'],
+                          ['Transaction Sold', 'Transaction Revenue', 'Transaction Fee', 'Transaction Fee'],
+                          [D('-1'), D('500'), D('-2'), D('-3')], inventory)
+    assert [(r[3], r[5], r[7]) for r in irs] == [(498.0, 100.0, 398.0)]
@@ -0,0 +1,48 @@
+import pytest
+
+from motor_fifo.ingestao import ingerir
+from motor_fifo.sintetico import gerar
+
+
+@pytest.fixture
+def export(tmp_path):
+    # Export ordenado com uma linha repetida de propósito (dois juros iguais no mesmo segundo)
+    gerar(600, tmp_path / 'original.csv', semente=9)
+    cabecalho, *linhas = (tmp_path / 'original.csv').read_text(encoding='utf-8').splitlines(keepends=True)
+    repetida = 250
+    linhas.insert(repetida, linhas[repetida])
+    return cabecalho, linhas, repetida
+
+
+def _gravar(pasta, nome, cabecalho, linhas):
+    pasta.mkdir(exist_ok=True)
+    (pasta / nome).write_text(cabecalho + ''.join(linhas), encoding='utf-8')
+
+
+@pytest.mark.parametrize('processos', [1, 2])
+def test_partes_sobrepostas_voltam_a_dar_o_export(tmp_path, export, processos):
+    cabecalho, linhas, repetida = export
+    partes = tmp_path / 'partes'
+    # a: até à primeira cópia da linha repetida; b: sobrepõe-se a "a" e tem as duas
+    # cópias; c: só a zona da repetida, dentro de "b"
+    _gravar(partes, 'a.csv', cabecalho, linhas[:repetida + 1])
+    _gravar(partes, 'b.csv', cabecalho, linhas[repetida - 100:])
+    _gravar(partes, 'c.csv', cabecalho, linhas[repetida - 5:repetida + 5])
+    destino = tmp_path / 'junto.csv'
+    df = ingerir(str(partes), str(destino), processos=processos)
+    assert len(df) == len(linhas)
+    assert destino.read_text(encoding='utf-8') == cabecalho + ''.join(linhas)
+
+
+def test_mesma_linha_com_change_noutro_formato_fica_uma_vez(tmp_path, export):
+    cabecalho, linhas, _ = export
+    partes = tmp_path / 'partes'
+    _gravar(partes, 'a.csv', cabecalho, linhas[:400])
+    # O segundo download traz o Change com zeros à direita: é a mesma linha
+    b = [l.replace(l.split(',')[5], l.split(',')[5] + '000') if '.' in l.split(',')[5] else l for l in linhas[300:]]
+    assert b != linhas[300:]
+    _gravar(partes, 'b.csv', cabecalho, b)
+    df = ingerir(str(partes), processos=1)
+    assert len(df) == len(linhas)
+    # Nos empates ganha o primeiro ficheiro por nome: as linhas da sobreposição vêm de a.csv
+    assert df['Change'].tolist()[:400] == [l.split(',')[5] for l in linhas[:400]]
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+from motor_fifo.colunar import carregar_ledger, carregar_retiradas_bt, processar_eventos
+from motor_fifo.inventario import Inventario
+from motor_fifo.lotes import DiarioLotes, IndiceLotes
+from motor_fifo.sintetico import gerar
+
+CABECALHO = 'User_ID,UTC_Time,Account,Operation,Coin,Change,Remark\n'
+
+
+def _correr(binance, bt, ate=None, diario=None):
+    inventory = Inventario()
+    processar_eventos(carregar_ledger(binance, ate=ate), carregar_retiradas_bt(bt), inventory=inventory,
+                      diario=diario)
+    if diario is not None:
+        diario.gravar()
+    return inventory
+
+
+def _abertos(inventory):
+    totais = {}
+    for moeda, fila in inventory.items():
+        lotes = [l for l in fila if l.qty > 0]
+        if lotes:
+            totais[moeda] = (float(sum(l.qty for l in lotes)), float(sum(l.cost for l in lotes)))
+    return totais
+
+
+@pytest.fixture(scope='module')
+def corrida(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp('lotes')
+    binance, bt = str(pasta / 'binance.csv'), str(pasta / 'bt.csv')
+    gerar(3000, binance, bt, semente=3)
+    _correr(binance, bt, diario=DiarioLotes(str(pasta / 'diario')))
+    return binance, bt, IndiceLotes(str(pasta / 'diario'))
+
+
+def test_carteira_num_instante_igual_a_corrida_ate_ai(corrida):
+    binance, bt, indice = corrida
+    chaves = carregar_ledger(binance).chaves
+    for k in (len(chaves) // 4, len(chaves) // 2, len(chaves) - 1):
+        quando = pd.Timestamp(chaves[k])
+        esperado = _abertos(_correr(binance, bt, ate=quando))
+        carteira = indice.carteira(quando)
+        obtido = {m: (q, c) for m, q, c in carteira.itertuples(index=False)}
+        assert obtido.keys() == esperado.keys()
+        for moeda, (qtd, custo) in esperado.items():
+            assert obtido[moeda] == pytest.approx((qtd, custo), rel=1e-9, abs=1e-6), moeda
+
+
+def test_lote_fora_do_diario(corrida):
+    indice = corrida[2]
+    n_lotes = len(indice._inicio_lote) - 1
+    for lote in (-1, n_lotes, 999999):
+        with pytest.raises(ValueError, match=f"Lote {lote} não existe"):
+            indice.linhagem(lote)
+        with pytest.raises(ValueError):
+            indice.eventos_do_lote(lote)
+
+
+def test_linhagem_por_uma_cadeia_de_swaps(tmp_path):
+    binance = tmp_path / 'binance.csv'
+    binance.write_text(CABECALHO + ''.join(f'1,{t},Spot,{op},{m},{q},\n' for t, op, m, q in [
+        ('2021-01-01 10:00:00', 'Deposit', 'BTC', '1'),
+        ('2021-02-01 10:00:00', 'Transaction Spend', 'BTC', '-1'),
+        ('2021-02-01 10:00:00', 'Transaction Buy', 'ETH', '10'),
+        ('2021-03-01 10:00:00', 'Transaction Spend', 'ETH', '-10'),
+        ('2021-03-01 10:00:00', 'Transaction Buy', 'ADA', '1000'),
+        ('2021-04-01 10:00:00', 'Transaction Spend', 'ETH', '-10'),
+        ('2021-04-01 10:00:00', 'Transaction Buy', 'ADA', '1000'),
+    ]), encoding='utf-8')
+    _correr(str(binance), str(tmp_path / 'sem_bt.csv'), diario=DiarioLotes(str(tmp_path / 'diario')))
+    indice = IndiceLotes(str(tmp_path / 'diario'))
+
+    # Como no v4, a perna recebida num swap também entra como rendimento (lotes 1, 3, 5):
+    # o primeiro swap de ETH gasta o lote 1 e só o segundo o lote 2 herdado do BTC
+    linhagem = indice.linhagem(6)
+    assert linhagem['Lote'].tolist() == [0, 0, 2, 2, 6]
+    assert linhagem['Moeda'].tolist() == ['BTC', 'BTC', 'ETH', 'ETH', 'ADA']
+    assert linhagem['Tipo'].tolist() == ['criacao', 'troca', 'heranca', 'troca', 'heranca']
+    assert linhagem['Pai'].tolist() == [-1, -1, 0, -1, 2]
+    assert set(linhagem['Data_Aquisicao']) == {'2021-01-01'}
+    assert indice.descendentes(0) == [2, 6]
+    assert indice.carteira('2021-02-15')['Moeda'].tolist() == ['ETH']
@@ -0,0 +1,103 @@
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+import Motor_Binance_v4
+from motor_fifo.colunar import processar_motor_colunar
+from motor_fifo.sintetico import gerar
+
+# O v5 tem de dar os mesmos 3 CSVs do v4, byte a byte, em cada modo de execução
+
+BINANCE = 'Binance_Novembro2019-Dezembro2025.csv'
+BT = 'Relatorio_FIFO_Completo_Contraparte.csv'
+SAIDAS = ('1_Vendas_IRS_Formatado.csv', '2_Historico_Swaps_Audit.csv', '3_Reconciliacao_Transferencias.csv')
+
+
+@contextmanager
+def _em(pasta):
+    antes = os.getcwd()
+    os.chdir(pasta)
+    try:
+        yield
+    finally:
+        os.chdir(antes)
+
+
+def _copia(origem, destino):
+    for nome in (BINANCE, BT):
+        shutil.copy(os.path.join(origem, nome), os.path.join(destino, nome))
+    return destino
+
+
+def _saidas(pasta):
+    saidas = {}
+    for nome in SAIDAS:
+        with open(os.path.join(pasta, nome), 'rb') as f:
+            saidas[nome] = f.read()
+    return saidas
+
+
+def _v5(dados, pasta, **opcoes):
+    with _em(_copia(dados, pasta)):
+        processar_motor_colunar(**opcoes)
+    return _saidas(pasta)
+
+
+@pytest.fixture(scope='module')
+def dados(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp('dados')
+    gerar(2500, pasta / BINANCE, pasta / BT, semente=11)
+    return pasta
+
+
+@pytest.fixture(scope='module')
+def saidas_v4(dados, tmp_path_factory):
+    pasta = _copia(dados, tmp_path_factory.mktemp('v4'))
+    with _em(pasta):
+        Motor_Binance_v4.processar_motor_v7_final()
+    saidas = _saidas(pasta)
+    assert saidas['1_Vendas_IRS_Formatado.csv'].count(b'\n') > 100
+    return saidas
+
+
+def test_v5_igual_ao_v4(dados, saidas_v4, tmp_path):
+    assert _v5(dados, tmp_path) == saidas_v4
+
+
+def _partir(dados, pasta):
+    # Primeira metade do export, cortada entre dois grupos (mais de 2s entre as linhas)
+    with open(os.path.join(dados, BINANCE), encoding='utf-8') as f:
+        cabecalho, *linhas = f.readlines()
+    instante = [datetime.fromisoformat(linha.split(',')[1]) for linha in linhas]
+    meio = len(linhas) // 2
+    while (instante[meio] - instante[meio - 1]).total_seconds() <= 2:
+        meio += 1
+    with open(os.path.join(pasta, BINANCE), 'w', encoding='utf-8') as f:
+        f.writelines([cabecalho] + linhas[:meio])
+
+
+def test_v5_retomado_do_snapshot_igual_ao_v4(dados, saidas_v4, tmp_path):
+    _copia(dados, tmp_path)
+    _partir(dados, tmp_path)
+    estado = str(tmp_path / 'estado.json')
+    with _em(tmp_path):
+        processar_motor_colunar(estado=estado)
+    primeira = _saidas(tmp_path)
+    assert primeira != saidas_v4
+    shutil.copy(os.path.join(dados, BINANCE), os.path.join(tmp_path, BINANCE))
+    with _em(tmp_path):
+        processar_motor_colunar(estado=estado)
+    assert _saidas(tmp_path) == saidas_v4
+
+
+# Com estes tamanhos há grupos partidos entre dois blocos (3 com 300, 3 com 700)
+@pytest.mark.parametrize('bloco', [300, 700])
+def test_v5_em_blocos_igual_ao_v4(dados, saidas_v4, tmp_path, bloco):
+    assert _v5(dados, tmp_path, bloco=bloco) == saidas_v4
+
+
+def test_v5_em_paralelo_igual_ao_v4(dados, saidas_v4, tmp_path):
+    assert _v5(dados, tmp_path, processos=2) == saidas_v4
@@ -0,0 +1,82 @@
+import os
+import random
+
+import pytest
+
+from motor_fifo import rapido
+from motor_fifo.colunar import processar_motor_colunar
+from motor_fifo.sintetico import MISTURA_PADRAO, gerar
+
+SAIDAS = ('irs.csv', 'swaps.csv', 'reconc.csv')
+
+
+def _exports(pasta, linhas, semente, mistura=None, alterar=None):
+    binance, bt = pasta / 'binance.csv', pasta / 'bt.csv'
+    gerar(linhas, binance, bt, mistura=mistura, semente=semente)
+    if alterar:
+        cabecalho, *resto = binance.read_text(encoding='utf-8').splitlines(keepends=True)
+        binance.write_text(cabecalho + ''.join(alterar(resto, random.Random(semente))), encoding='utf-8')
+    return str(binance), str(bt)
+
+
+def _baralhar(linhas, r):
+    r.shuffle(linhas)
+    return linhas
+
+
+def _change(linhas, r, formato):
+    # Reescreve parte dos Change noutro formato que o read_csv aceita
+    novas = []
+    for linha in linhas:
+        campos = linha.split(',')
+        if r.random() < 0.3:
+            campos[5] = formato(float(campos[5]))
+        novas.append(','.join(campos))
+    return novas
+
+
+def _correr(pasta, binance, bt):
+    saidas = {}
+    for modo in ('rapido', 'colunar'):
+        destino = pasta / modo
+        destino.mkdir()
+        nomes = [str(destino / n) for n in SAIDAS]
+        if modo == 'rapido':
+            assert rapido.correr(binance, bt, *nomes)
+        else:
+            processar_motor_colunar(binance, bt, *nomes)
+        saidas[modo] = {n: (destino / n).read_bytes() if (destino / n).exists() else None for n in SAIDAS}
+    return saidas
+
+
+@pytest.mark.parametrize('linhas, semente, mistura, alterar', [
+    (50, 1, None, None),
+    (400, 2, None, None),
+    # Empates de UTC_Time fora de ordem
+    (400, 3, None, _baralhar),
+    # Sem swaps: 2_Historico_Swaps_Audit.csv de um DataFrame vazio
+    (300, 4, dict(MISTURA_PADRAO, swap=0), None),
+    # Notação científica e zeros à direita (coluna continua numérica)
+    (400, 5, None, lambda l, r: _change(l, r, lambda x: f'{x:.6e}')),
+    (400, 6, None, lambda l, r: _change(l, r, lambda x: f'{x:.12f}')),
+    # Vírgula decimal entre aspas: a coluna passa a texto (regras do clean_val_decimal)
+    (400, 7, None, lambda l, r: _change(l, r, lambda x: '"' + f'{x:.8f}'.replace('.', ',') + '"')),
+])
+def test_caminho_rapido_igual_ao_colunar(tmp_path, linhas, semente, mistura, alterar):
+    binance, bt = _exports(tmp_path, linhas, semente, mistura, alterar)
+    saidas = _correr(tmp_path, binance, bt)
+    assert saidas['rapido'] == saidas['colunar']
+    assert saidas['rapido']['irs.csv'] or saidas['rapido']['reconc.csv']
+
+
+@pytest.mark.parametrize('dist_info', [
+    [], ['pandas-2.2.3.dist-info', 'pandas-3.0.0.dist-info'], ['pandas-x.dist-info']])
+def test_versao_do_pandas_incerta_segue_pelo_colunar(tmp_path, monkeypatch, dist_info):
+    # Instalação editável (sem .dist-info ao lado), restos de outra versão ou nome ilegível
+    binance, bt = _exports(tmp_path, 300, 4, dict(MISTURA_PADRAO, swap=0))
+    listdir = os.listdir
+    monkeypatch.setattr(rapido.os, 'listdir', lambda pasta: [
+        n for n in listdir(pasta) if not (n.startswith('pandas-') and n.endswith('.dist-info'))] + dist_info)
+    nomes = [str(tmp_path / n) for n in SAIDAS]
+    assert rapido.correr(binance, bt, *nomes) is False
+    assert not any((tmp_path / n).exists() for n in SAIDAS)
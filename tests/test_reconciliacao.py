@@ -0,0 +1,47 @@
+import os
+from decimal import Decimal
+
+from motor_fifo.colunar import processar_motor_colunar
+from motor_fifo.correspondencia import IndiceRetiradas
+from motor_fifo.reconciliacao import reconciliar
+
+D = Decimal
+# Duas retiradas BTC; o primeiro depósito casa com as duas (tolerância 0.00001), o
+# segundo só com a primeira do ficheiro
+RETIRADAS = [('BTC', D('1.0'), 100), ('BTC', D('1.000005'), 101)]
+DEPOSITOS = [('BTC', D('1.000003'), 102), ('BTC', D('0.999995'), 103)]
+
+
+def test_primeira_compativel_deixa_um_deposito_sem_par():
+    indice = IndiceRetiradas([m for m, _, _ in RETIRADAS], [q for _, q, _ in RETIRADAS])
+    casados = [indice.casar(m, q, tolerancia_abs=D('0.00001')) for m, q, _ in DEPOSITOS]
+    assert casados == [0, None]
+
+
+def test_reconciliacao_otima_casa_os_dois():
+    pares = reconciliar(DEPOSITOS, RETIRADAS)
+    assert [(c.deposito, c.retirada) for c in pares] == [(0, 1), (1, 0)]
+    assert [c.dif_qtd for c in pares] == [D('-0.000002'), D('-0.000005')]
+
+
+def test_motor_com_reconciliacao_otima_herda_os_dois_custos(tmp_path):
+    binance = tmp_path / 'binance.csv'
+    binance.write_text(
+        'User_ID,UTC_Time,Account,Operation,Coin,Change,Remark\n'
+        '1,2022-01-01 10:00:00,Spot,Deposit,BTC,1.000003,\n'
+        '1,2022-01-02 10:00:00,Spot,Deposit,BTC,0.999995,\n', encoding='utf-8')
+    bt = tmp_path / 'bt.csv'
+    bt.write_text(
+        'operação;Data;hora;Moeda;quantidade;Valor (Custo FIFO);Ativo_Contraparte;Valor_Recebido_Contraparte;Fees\n'
+        'Retirada para carteira externa;2021-12-30;10:00:00;BTC;1;100;Carteira Externa;0;0\n'
+        'Retirada para carteira externa;2021-12-31;10:00:00;BTC;1,000005;200;Carteira Externa;0;0\n',
+        encoding='utf-8')
+    origens = {}
+    for modo in ('primeira', 'otima'):
+        reconc = tmp_path / f'reconc_{modo}.csv'
+        processar_motor_colunar(str(binance), str(bt), out_irs=os.devnull, out_swaps=os.devnull,
+                                out_reconciliacao=str(reconc), reconciliacao=modo)
+        linhas = reconc.read_text(encoding='utf-8').splitlines()[1:]
+        origens[modo] = [linha.rsplit(';', 1)[1] for linha in linhas]
+    assert origens['primeira'] == ['BitcoinTrade (Histórico)', 'Origem Externa']
+    assert origens['otima'] == ['BitcoinTrade (Histórico)', 'BitcoinTrade (Histórico)']
@@ -0,0 +1,24 @@
+import csv
+from collections import Counter
+
+import pytest
+
+from motor_fifo.sintetico import gerar
+
+
+@pytest.mark.parametrize('linhas, inicio, fim', [
+    (50, '2019-11-01', '2025-12-31'),
+    (200, '2019-11-01', '2025-12-31'),
+    (20000, '2019-11-01', '2025-12-31'),
+    (5000, '2024-01-01', '2024-01-31'),
+])
+def test_datas_dentro_do_periodo(tmp_path, linhas, inicio, fim):
+    destino = tmp_path / 'binance.csv'
+    n, _ = gerar(linhas, destino, inicio=inicio, fim=fim)
+    with open(destino, encoding='utf-8', newline='') as f:
+        datas = [linha['UTC_Time'] for linha in csv.DictReader(f)]
+    assert len(datas) == n >= linhas
+    assert datas == sorted(datas)
+    assert inicio <= datas[0][:10] and datas[-1][:10] <= fim
+    # Eventos pelo menos 3s afastados: no mesmo segundo só as linhas de um evento (até 3)
+    assert max(Counter(datas).values()) <= 3
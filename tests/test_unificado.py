@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+import pytest
+
+from motor_fifo.adaptadores import Operacao, Perna
+from motor_fifo.inventario import Lote
+from motor_fifo.unificado import ligar_transferencias, lotes_do_deposito, processar_operacoes
+
+D = Decimal
+
+
+def _op(dia, corretora, *pernas):
+    return Operacao(int(dia * 86_400e9), corretora, f'2022-01-{dia - 18990:02d}', '10:00:00', pernas)
+
+
+def _levantamento_maior_que_o_inventario():
+    # 0.5 ETH em carteira, 2 ETH levantados e depositados na Nexo, depois vendidos
+    return [
+        _op(19000, 'binance', Perna('ETH', D('0.5'), 'rendimento')),
+        _op(19001, 'binance', Perna('ETH', D('-2'), 'levantamento')),
+        _op(19002, 'nexo', Perna('ETH', D('2'), 'deposito')),
+        _op(19003, 'nexo', Perna('ETH', D('-2'), 'troca'), Perna('EUR', D('3000'), 'troca')),
+    ]
+
+
+@pytest.mark.parametrize('otima', [False, True])
+def test_deposito_ligado_sem_lotes_suficientes_entra_como_origem_externa(otima):
+    ops = _levantamento_maior_que_o_inventario()
+    irs, _, _, _ = processar_operacoes(ops, ligacoes=ligar_transferencias(ops) if otima else None)
+    assert [(r[3], r[6]) for r in irs] == [(750.0, 'Rendimento/binance'), (2250.0, 'Origem Externa')]
+
+
+def test_diferenca_sai_dos_lotes_mais_recentes_sem_perder_custo():
+    lotes = [Lote(D('0.5'), D('10'), '2022-01-01', 'x', False, 1),
+             Lote(D('0.000002'), D('3'), '2022-01-02', 'x', False, 2)]
+    acertados = lotes_do_deposito(lotes, D('0.499999'), '2022-01-03', 3)
+    assert [(l.qty, l.cost) for l in acertados] == [(D('0.499999'), D('13'))]
+
+
+def test_deposito_maior_que_o_levantado_acrescenta_lote_externo():
+    lotes = [Lote(D('1'), D('10'), '2022-01-01', 'x', False, 1)]
+    acertados = lotes_do_deposito(lotes, D('1.000004'), '2022-01-03', 3)
+    assert [(l.qty, l.cost, l.origem, l.is_ext) for l in acertados] == [
+        (D('1'), D('10'), 'x', False), (D('0.000004'), D('0'), 'Origem Externa', True)]
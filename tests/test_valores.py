@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from motor_fifo.valores import ValoresInvalidos, parse_coluna
+
+
+def _escalado(valores, **kw):
+    return parse_coluna(pd.Series(valores), 'escalado', casas=8, **kw).tolist()
+
+
+def test_escalado_na_fronteira_do_int64():
+    # 19 dígitos depois de escalar: 2**63 - 1, 2**63 e 10**19 - 5e7 não podem dar a volta
+    assert _escalado(['92233720368,54775807', '92233720368,54775808', '99999999999,5', '1']) == [
+        2 ** 63 - 1, 2 ** 63, 9999999999950000000, 100000000]
+    assert _escalado(['-92233720368,54775809']) == [-(2 ** 63) - 1]
+
+
+def test_escalado_com_18_digitos_fica_int64():
+    s = parse_coluna(pd.Series(['9999999999,99999999', '-1.234,5']), 'escalado', casas=8)
+    assert s.dtype == 'int64'
+    assert s.tolist() == [999999999999999999, -123450000000]
+
+
+def test_escalado_longo_e_exato():
+    # Mais dígitos do que a precisão do contexto Decimal (28)
+    assert _escalado(['12345678901234567890123456789,5']) == [1234567890123456789012345678950000000]
+
+
+def test_escalado_estrito_reporta_casas_a_mais():
+    with pytest.raises(ValoresInvalidos) as e:
+        _escalado(['92233720368,547758081', '1'], estrito=True)
+    assert list(e.value.celulas) == [0]